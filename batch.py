@@ -0,0 +1,154 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+from dotenv import load_dotenv
+
+# Load .env before the agents read their configuration from the environment
+load_dotenv()
+
+from google.adk.runners import Runner
+
+from scrabble_agent.agent import scrabble_agent
+from scrabble_agent.sub_agents.chatbot_agent.agent import chatbot_output
+from scrabble_agent.telemetry import setup_tracing, start_metrics_server
+from scrabble_agent.tools import prefetch_user, report_outbox
+from sqlite_session_service import SqliteSessionService
+from utils import add_user_query_to_history, call_agent_async, create_session_with_history
+
+APP_NAME = "ScrabbleAI"
+
+# Number of submissions processed at the same time, configurable from .env
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+
+
+async def ingest_submission(runner, submission):
+    """Run one user's messages through a new session.
+
+    The user's role and name are taken from the users' Database, a
+    submission of an unknown user is rejected.
+
+    Args:
+        runner: The runner of the root agent
+        submission: One user's submission, e.g.
+            {"user_id": "u1", "messages": ["I can't work on 05/06/2025, I'm sick"]}
+            with optional "user_gender", and "user_shifts" used if none are stored
+
+    Returns:
+        The output record of the submission
+    """
+    user_id = submission["user_id"]
+    user_records = await prefetch_user(user_id)
+    if user_records["user_role"] is None:
+        return {"user_id": user_id, "status": "not_found", "error": "User not found"}
+    user_name = user_records["user_name"] or ""
+    session = await create_session_with_history(
+        runner.session_service,
+        APP_NAME,
+        user_id,
+        {
+            "user_id": user_id,
+            "user_name": user_name,
+            "user_role": user_records["user_role"],
+            "user_gender": submission.get("user_gender", ""),
+            "user_shifts": user_records["user_shifts"] or submission.get("user_shifts", []),
+        },
+    )
+
+    for message in submission.get("messages", []):
+        add_user_query_to_history(runner.session_service, APP_NAME, user_id, session.id, message)
+        await call_agent_async(runner, user_id, session.id, message, display=False, stream=False)
+
+    session = await runner.session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session.id)
+    output = session.state.get("chatbot_output_schema")
+    # The last reply may be a question to the user rather than the constraints
+    try:
+        output, _ = chatbot_output.validate(output, session.state)
+        status = "success"
+    except (TypeError, ValueError):
+        status = "incomplete"
+    return {
+        "user_id": user_id,
+        "session_id": session.id,
+        "status": status,
+        "chatbot_output_schema": output,
+    }
+
+
+async def ingest(runner, lines, output, concurrency=BATCH_CONCURRENCY):
+    """Ingest the submissions in lines, at most `concurrency` at a time.
+
+    Lines are read only as workers free up, so a stream of any size is
+    processed in bounded memory. Records are written as submissions
+    complete, so their order follows completion, not the input.
+
+    Args:
+        runner: The runner of the root agent
+        lines: An iterable of JSONL lines
+        output: A text stream the output records are written to
+        concurrency: The number of submissions processed at the same time
+
+    Returns:
+        A dictionary of the number of records by status
+    """
+    queue = asyncio.Queue(maxsize=concurrency)
+    counts = {}
+
+    def write(record):
+        counts[record["status"]] = counts.get(record["status"], 0) + 1
+        output.write(json.dumps(record) + "\n")
+        output.flush()
+
+    async def worker():
+        while (item := await queue.get()) is not None:
+            line_number, line = item
+            try:
+                record = await ingest_submission(runner, json.loads(line))
+            except Exception as e:
+                record = {"line": line_number, "status": "error", "error": str(e)}
+            write(record)
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    for line_number, line in enumerate(lines, start=1):
+        if line.strip():
+            await queue.put((line_number, line))
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+    return counts
+
+
+async def main_async(args):
+    session_service = SqliteSessionService(os.getenv("SESSION_DB_PATH", "scrabble_sessions.db"))
+    runner = Runner(agent=scrabble_agent, app_name=APP_NAME, session_service=session_service)
+
+    input_stream = open(args.input, encoding="utf-8") if args.input != "-" else sys.stdin
+    output_stream = open(args.output, "a", encoding="utf-8") if args.output != "-" else sys.stdout
+    try:
+        counts = await ingest(runner, input_stream, output_stream, args.concurrency)
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if output_stream is not sys.stdout:
+            output_stream.close()
+        # Reports not delivered yet stay in the outbox for the next run
+        await report_outbox.stop()
+        # Write any buffered session changes before exiting
+        await session_service.close()
+    print(f"Ingested submissions: {counts}", file=sys.stderr)
+
+
+def main():
+    # e.g. python batch.py submissions.jsonl --output constraints.jsonl --concurrency 32
+    parser = argparse.ArgumentParser(description="Ingest a JSONL stream of user constraint submissions.")
+    parser.add_argument("input", nargs="?", default="-", help="The submissions JSONL file, - for stdin")
+    parser.add_argument("--output", default="-", help="The output JSONL file, - for stdout")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Submissions processed at once")
+    setup_tracing()
+    start_metrics_server()
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+"""Offline benchmarks of the ScrabbleAI hot paths.
+
+Run with `python -m benchmarks --output results.json`, and compare a later run
+with `python -m benchmarks --baseline results.json`.
+"""
@@ -0,0 +1,31 @@
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import warnings
+
+# Keep the benchmark databases away from the real ones, before the project reads its settings
+_data_directory = tempfile.mkdtemp(prefix="scrabble_bench_")
+os.environ["SESSION_DB_PATH"] = os.path.join(_data_directory, "sessions.db")
+os.environ["USERS_DB_PATH"] = os.path.join(_data_directory, "users.db")
+os.environ["MODEL_BACKEND"] = "live"
+os.environ.setdefault("SECURITY_MODE", "serial")
+
+warnings.filterwarnings("ignore")
+logging.basicConfig(level=logging.ERROR)
+
+from .runner import main  # noqa: E402
+
+parser = argparse.ArgumentParser(description="Benchmark the ScrabbleAI orchestration hot paths offline")
+parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+parser.add_argument("--baseline", help="Compare against the JSON results of an earlier run and fail on regressions")
+parser.add_argument("--tolerance", type=float, default=0.25, help="The relative change that counts as a regression")
+parser.add_argument("--full", action="store_true", help="Run more turns and the month-end solver scale")
+parser.add_argument(
+    "--workers", help="Run the cluster scaling benchmark with these worker counts, e.g. 1,2,4 (--full runs 1,2,4,8)"
+)
+args = parser.parse_args()
+worker_counts = [int(count) for count in args.workers.split(",")] if args.workers else None
+
+sys.exit(main(args.output, args.baseline, args.tolerance, args.full, worker_counts))
@@ -0,0 +1,132 @@
+import os
+import statistics
+import tempfile
+import time
+import uuid
+
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+
+from .stand_in import use_stand_in_models
+
+APP_NAME = "ScrabbleAI"
+
+
+def _percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def _timings(prefix, seconds):
+    milliseconds = [value * 1000 for value in seconds]
+    return {
+        f"{prefix}_mean_ms": round(statistics.mean(milliseconds), 3),
+        f"{prefix}_p50_ms": round(_percentile(milliseconds, 0.5), 3),
+        f"{prefix}_p95_ms": round(_percentile(milliseconds, 0.95), 3),
+    }
+
+
+async def bench_turn_latency(turns=50, model_latency=0.0):
+    """Per-turn latency and time to first text of call_agent_async, with stand-in models."""
+    from scrabble_agent.agent import scrabble_agent
+    from sqlite_session_service import SqliteSessionService
+    from utils import add_user_query_to_history, call_agent_async, create_session_with_history, event_text
+
+    use_stand_in_models(scrabble_agent, model_latency)
+    with tempfile.TemporaryDirectory() as directory:
+        session_service = SqliteSessionService(os.path.join(directory, "sessions.db"))
+        runner = Runner(agent=scrabble_agent, app_name=APP_NAME, session_service=session_service)
+        session = await create_session_with_history(
+            session_service,
+            APP_NAME,
+            "bench_user",
+            {"user_id": "bench_user", "user_name": "Test User", "user_role": "system_user", "user_gender": "", "user_shifts": []},
+        )
+
+        seconds = []
+        first_token_seconds = []
+        for turn in range(turns):
+            # Distinct queries, so the response cache does not answer them
+            query = f"I can't work on the {turn % 28 + 1}th of next month, I have a doctor's appointment number {turn}"
+            first_token = []
+
+            async def on_event(event, response):
+                if not first_token and event_text(event):
+                    first_token.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            add_user_query_to_history(session_service, APP_NAME, "bench_user", session.id, query)
+            await call_agent_async(runner, "bench_user", session.id, query, on_event=on_event, display=False)
+            seconds.append(time.perf_counter() - started)
+            first_token_seconds.extend(first_token)
+        await session_service.close()
+
+    return {
+        "turns": turns,
+        "model_latency_ms": model_latency * 1000,
+        **_timings("turn", seconds),
+        **_timings("first_token", first_token_seconds),
+    }
+
+
+def bench_history_updates(sizes=(10, 100, 1000, 10000), appends=200):
+    """Cost of update_interaction_history and of rendering {interaction_history}, as the history grows."""
+    from utils import InteractionHistory, _interaction_histories, update_interaction_history
+
+    results = {}
+    for size in sizes:
+        key = (APP_NAME, "bench_user", f"history_{size}")
+        # The registry holds weak references, the benchmark keeps the history alive
+        history = _interaction_histories[key] = InteractionHistory(
+            [{"action": "user_query", "query": f"query number {i}", "timestamp": "2026-01-01 10:00:00"} for i in range(size)]
+        )
+        started = time.perf_counter()
+        for i in range(appends):
+            update_interaction_history(None, *key, {"action": "user_query", "query": f"new query {i}"})
+        append_seconds = (time.perf_counter() - started) / appends
+
+        started = time.perf_counter()
+        for i in range(appends):
+            update_interaction_history(None, *key, {"action": "user_query", "query": f"rendered query {i}"})
+            str(history)
+        render_seconds = (time.perf_counter() - started) / appends - append_seconds
+        del _interaction_histories[key]
+
+        results[f"append_{size}_us"] = round(append_seconds * 1e6, 3)
+        results[f"append_and_render_{size}_us"] = round((append_seconds + max(render_seconds, 0.0)) * 1e6, 3)
+    return results
+
+
+async def _session_rates(session_service, sessions):
+    session_ids = []
+    started = time.perf_counter()
+    for i in range(sessions):
+        session = await session_service.create_session(
+            app_name=APP_NAME, user_id=f"user_{i % 50}", state={"user_name": f"User {i}", "user_shifts": []}
+        )
+        session_ids.append((f"user_{i % 50}", session.id))
+    create_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for user_id, session_id in session_ids:
+        await session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+    get_seconds = time.perf_counter() - started
+    return sessions / create_seconds, sessions / get_seconds
+
+
+async def bench_sessions(sessions=500):
+    """Session create/get throughput of the in-memory and SQLite session services."""
+    from sqlite_session_service import SqliteSessionService
+
+    results = {}
+    create_rate, get_rate = await _session_rates(InMemorySessionService(), sessions)
+    results["memory_create_per_s"] = round(create_rate, 1)
+    results["memory_get_per_s"] = round(get_rate, 1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        session_service = SqliteSessionService(os.path.join(directory, f"{uuid.uuid4()}.db"))
+        create_rate, get_rate = await _session_rates(session_service, sessions)
+        await session_service.close()
+    results["sqlite_create_per_s"] = round(create_rate, 1)
+    results["sqlite_get_per_s"] = round(get_rate, 1)
+    return results
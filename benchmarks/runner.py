@@ -0,0 +1,102 @@
+import asyncio
+import json
+import platform
+import sys
+from datetime import datetime
+
+from .orchestration import bench_history_updates, bench_sessions, bench_turn_latency
+from .scaling import FULL_WORKER_COUNTS, bench_cluster_scaling
+from .scheduling import FULL_GRID, GRID, bench_solver_scaling
+from .startup import bench_startup
+
+# Metric name suffixes and whether a higher value is better
+HIGHER_IS_BETTER = ("_per_s",)
+LOWER_IS_BETTER = ("_ms", "_us", "_s")
+
+
+def run_benchmarks(full=False, worker_counts=None):
+    """Run every benchmark and return the results dictionary.
+
+    The cluster scaling benchmark starts a cluster per worker count, it runs
+    with the full benchmarks or when worker counts are given.
+    """
+    results = {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "full": full,
+        }
+    }
+    print("Running the cold start benchmark...")
+    results["startup"] = bench_startup(runs=5 if full else 3)
+    print("Running the turn latency benchmark...")
+    results["turn_latency"] = asyncio.run(bench_turn_latency(turns=200 if full else 50))
+    print("Running the interaction history benchmark...")
+    results["interaction_history"] = bench_history_updates()
+    print("Running the session service benchmark...")
+    results["sessions"] = asyncio.run(bench_sessions(sessions=2000 if full else 500))
+    print("Running the solver scaling benchmark...")
+    results["scheduling"] = bench_solver_scaling(FULL_GRID if full else GRID)
+    if worker_counts or full:
+        print("Running the cluster scaling benchmark...")
+        results["cluster_scaling"] = bench_cluster_scaling(worker_counts or FULL_WORKER_COUNTS)
+    return results
+
+
+def _direction(metric):
+    if metric.endswith(HIGHER_IS_BETTER):
+        return 1
+    if metric.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare_results(results, baseline, tolerance=0.25):
+    """Compare results against a baseline.
+
+    Args:
+        results: The results of run_benchmarks()
+        baseline: Results of an earlier run
+        tolerance: The relative change a metric may get worse by
+
+    Returns:
+        A list of regressions, as (group, metric, baseline value, value, relative change)
+    """
+    regressions = []
+    for group, metrics in results.items():
+        if group == "meta":
+            continue
+        for metric, value in metrics.items():
+            direction = _direction(metric)
+            previous = baseline.get(group, {}).get(metric)
+            if not direction or not previous or not isinstance(previous, (int, float)):
+                continue
+            # Positive when the metric got worse
+            change = (previous - value) / previous if direction > 0 else (value - previous) / previous
+            if change > tolerance:
+                regressions.append((group, metric, previous, value, change))
+    return regressions
+
+
+def main(output=None, baseline=None, tolerance=0.25, full=False, worker_counts=None):
+    """Run the benchmarks, write the results and fail on regressions against the baseline."""
+    results = run_benchmarks(full, worker_counts)
+    text = json.dumps(results, indent=2)
+    if output:
+        with open(output, "w") as file:
+            file.write(text + "\n")
+        print(f"Wrote the results to {output}")
+    else:
+        print(text)
+
+    if baseline:
+        with open(baseline) as file:
+            regressions = compare_results(results, json.load(file), tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} REGRESSION(S) over {tolerance:.0%} against {baseline}:", file=sys.stderr)
+            for group, metric, previous, value, change in regressions:
+                print(f"  {group}.{metric}: {previous} -> {value} ({change:+.0%} worse)", file=sys.stderr)
+            return 1
+        print(f"No regressions over {tolerance:.0%} against {baseline}")
+    return 0
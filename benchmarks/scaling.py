@@ -0,0 +1,136 @@
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from cluster import free_port
+from scrabble_agent.tools.user_records import UserRecords
+
+from .orchestration import _timings
+
+# Worker counts of the cluster scaling benchmark
+WORKER_COUNTS = (1, 2, 4)
+FULL_WORKER_COUNTS = (1, 2, 4, 8)
+
+
+async def _wait_for_cluster(client, url, workers, process, timeout=300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The cluster exited with code {process.returncode}")
+        try:
+            status = (await client.get(f"{url}/cluster")).json()
+            if len(status["ring"]) == workers:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError(f"The cluster of {workers} workers did not start in {timeout}s")
+
+
+async def _run_load(url, workers, users, turns, process):
+    async with httpx.AsyncClient(timeout=120) as client:
+        await _wait_for_cluster(client, url, workers, process)
+
+        async def create(user):
+            response = await client.post(
+                f"{url}/sessions",
+                json={"user_id": f"load_user_{user}"},
+            )
+            response.raise_for_status()
+            return response.json()["session_id"]
+
+        session_ids = await asyncio.gather(*(create(user) for user in range(users)))
+
+        async def turn(user, session_id, number):
+            # Distinct queries, so the response cache does not answer them
+            query = f"I can't work on the {number % 28 + 1}th of next month, user {user} turn {number}"
+            started = time.perf_counter()
+            response = await client.post(
+                f"{url}/sessions/{session_id}/messages", json={"user_id": f"load_user_{user}", "message": query}
+            )
+            response.raise_for_status()
+            return time.perf_counter() - started
+
+        async def user_turns(user, session_id, first, count):
+            # The turns of a session run one after the other, like a user waiting for each answer
+            return [await turn(user, session_id, number) for number in range(first, first + count)]
+
+        # One turn per user first, so every worker has built its sub-agents
+        await asyncio.gather(*(user_turns(user, session_id, 0, 1) for user, session_id in enumerate(session_ids)))
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(
+            *(user_turns(user, session_id, 1, turns) for user, session_id in enumerate(session_ids))
+        )
+        elapsed = time.perf_counter() - started
+    return users * turns / elapsed, [seconds for user_latencies in latencies for seconds in user_latencies]
+
+
+async def _register_users(db_path, users):
+    """Store the load users, sessions are only created for users in the Database."""
+    records = UserRecords(db_path)
+    try:
+        for user in range(users):
+            await records.save(f"load_user_{user}", user_role="system_user", user_name=f"Load User {user}")
+    finally:
+        records.close()
+
+
+def _cluster_throughput(workers, users, turns, model_latency):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    port = free_port()
+    users_db = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+    asyncio.run(_register_users(users_db, users))
+    env = {**os.environ, "STAND_IN_MODEL_LATENCY": str(model_latency), "USERS_DB_PATH": users_db}
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "cluster.py",
+            "--workers",
+            str(workers),
+            "--app",
+            "benchmarks.stand_in_app:app",
+            "--port",
+            str(port),
+            "--worker-base-port",
+            "0",
+        ],
+        cwd=root,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        return asyncio.run(_run_load(f"http://127.0.0.1:{port}", workers, users, turns, process))
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        os.unlink(users_db)
+
+
+def bench_cluster_scaling(worker_counts=WORKER_COUNTS, users=32, turns=5, model_latency=0.0):
+    """Turn throughput of the cluster as workers are added, through the router, with stand-in models.
+
+    Each user's turns run one after the other, the users run concurrently.
+    The efficiency of n workers is their throughput over n times the
+    throughput of one worker, 1.0 for linear scaling. It can only hold up to
+    the number of cores.
+    """
+    results = {"cores": os.cpu_count(), "users": users, "turns_per_user": turns}
+    per_worker = None
+    for workers in worker_counts:
+        throughput, seconds = _cluster_throughput(workers, users, turns, model_latency)
+        # Relative to the smallest cluster, per worker
+        per_worker = per_worker or throughput / workers
+        results[f"workers_{workers}_turns_per_s"] = round(throughput, 2)
+        results[f"workers_{workers}_efficiency"] = round(throughput / (workers * per_worker), 3)
+        results.update(_timings(f"workers_{workers}_turn", seconds))
+    return results
@@ -0,0 +1,52 @@
+import random
+import time
+from datetime import date, timedelta
+
+CATEGORIES = ["guarding", "cleaning", "maintenance", "escorting", "kitchen", "patrol", "driving", "office", "gate", "medic"]
+
+# (users, days) combinations, the full grid adds the month-end scale
+GRID = [(100, 30), (500, 30), (1000, 60)]
+FULL_GRID = GRID + [(5000, 60)]
+
+
+def make_roster(users, days, start=date(2026, 6, 1), seed=1):
+    """A reproducible roster with bad days, good days and category preferences."""
+    rng = random.Random(seed)
+    roster = []
+    for i in range(users):
+        bad_days = [
+            {"date": (start + timedelta(days=rng.randrange(days))).strftime("%d/%m/%Y"), "reason": "sick day"}
+            for _ in range(3)
+        ]
+        good_days = [(start + timedelta(days=rng.randrange(days))).strftime("%d/%m/%Y") for _ in range(2)]
+        roster.append(
+            {
+                "user_id": f"u{i}",
+                "constraints": {"good_days": good_days, "bad_days": bad_days, "other": []},
+                "preferences": {category: rng.choice(["prefer", "neutral", "dislike", "avoid"]) for category in CATEGORIES},
+            }
+        )
+    # Staff about a sixth of the users every day
+    headcount = max(1, users // (6 * len(CATEGORIES)))
+    requirements = [{"duty_title": category.title(), "category": category, "headcount": headcount} for category in CATEGORIES]
+    return roster, requirements, start
+
+
+def bench_solver_scaling(grid=GRID, time_budget=2.0):
+    """Solve and validate time of the shift solver over users x days."""
+    from scrabble_agent.scheduling import solve_assignments, validate_assignments
+
+    results = {}
+    for users, days in grid:
+        roster, requirements, start = make_roster(users, days)
+        started = time.perf_counter()
+        solution = solve_assignments(roster, requirements, start, days, time_budget=time_budget)
+        solve_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        validate_assignments(roster, requirements, solution["assignments"], start, days)
+        validate_seconds = time.perf_counter() - started
+
+        results[f"solve_{users}x{days}_s"] = round(solve_seconds, 4)
+        results[f"validate_{users}x{days}_s"] = round(validate_seconds, 4)
+    return results
@@ -0,0 +1,77 @@
+import asyncio
+import json
+from typing import AsyncGenerator
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import types
+
+# The chatbot output the stand-in chatbot answers with
+STAND_IN_CHATBOT_OUTPUT = {
+    "fullname": "Test User",
+    "good_days": ["01/06/2026"],
+    "bad_days": [{"date": "02/06/2026", "reason": "sick day"}],
+    "other": ["I am allergic to cleaning materials"],
+}
+
+# Characters per chunk of a streamed response
+STREAM_CHUNK_CHARS = 16
+
+
+class StandInLlm(BaseLlm):
+    """An offline model with a fixed script, for benchmarking the orchestration.
+
+    The root agent transfers every new user message to the chatbot agent,
+    which answers with a fixed chatbot_output_schema. Every other agent
+    answers with a short text. `latency` seconds pass before every response,
+    which is streamed in chunks when asked to.
+    """
+
+    agent_name: str = ""
+    latency: float = 0.0
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        last = llm_request.contents[-1] if llm_request.contents else None
+        user_turn = last is not None and last.role == "user" and any(part.text for part in last.parts or [])
+
+        if self.agent_name == "scrabble_agent" and user_turn and "transfer_to_agent" in llm_request.tools_dict:
+            part = types.Part(
+                function_call=types.FunctionCall(name="transfer_to_agent", args={"agent_name": "chatbot_agent"})
+            )
+        elif self.agent_name == "chatbot_agent":
+            part = types.Part(text=json.dumps(STAND_IN_CHATBOT_OUTPUT))
+        else:
+            part = types.Part(text="OK")
+
+        if stream and part.text:
+            # Stream the text in chunks, then the whole response, like the Gemini models do
+            for start in range(0, len(part.text), STREAM_CHUNK_CHARS):
+                chunk = types.Part(text=part.text[start : start + STREAM_CHUNK_CHARS])
+                yield LlmResponse(content=types.Content(role="model", parts=[chunk]), partial=True)
+        yield LlmResponse(content=types.Content(role="model", parts=[part]))
+
+
+def use_stand_in_models(root_agent, latency=0.0):
+    """Replace the model of every agent in the tree with a StandInLlm.
+
+    The stand-ins keep the model names, the built-in tools check them. Lazy
+    sub-agents get theirs when they are built.
+    """
+    from scrabble_agent.lazy_agent import LazyAgent
+
+    def use_stand_in(agent):
+        model = agent.model if isinstance(agent.model, str) else agent.model.model
+        agent.model = StandInLlm(model=model, agent_name=agent.name, latency=latency)
+
+    agents = [root_agent]
+    while agents:
+        agent = agents.pop()
+        if isinstance(agent, LazyAgent):
+            agent.prepare(use_stand_in)
+            continue
+        if hasattr(agent, "model"):
+            use_stand_in(agent)
+        agents.extend(agent.sub_agents)
@@ -0,0 +1,9 @@
+import os
+
+from scrabble_agent.agent import scrabble_agent
+from server import app  # noqa: F401
+
+from .stand_in import use_stand_in_models
+
+# The server app with stand-in models, for the cluster workers of the scaling benchmark
+use_stand_in_models(scrabble_agent, float(os.getenv("STAND_IN_MODEL_LATENCY", "0")))
@@ -0,0 +1,61 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Runs in a new interpreter, so nothing is imported or built yet
+COLD_START_SCRIPT = """
+import asyncio, json, sys, time, warnings
+warnings.filterwarnings("ignore")
+started = time.perf_counter()
+from scrabble_agent.agent import scrabble_agent
+imported = time.perf_counter()
+
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from benchmarks.stand_in import use_stand_in_models
+from utils import call_agent_async, create_session_with_history
+
+async def first_turn():
+    use_stand_in_models(scrabble_agent)
+    session_service = InMemorySessionService()
+    runner = Runner(agent=scrabble_agent, app_name="ScrabbleAI", session_service=session_service)
+    session = await create_session_with_history(
+        session_service,
+        "ScrabbleAI",
+        "bench_user",
+        {"user_id": "bench_user", "user_name": "Test User", "user_role": "system_user", "user_gender": "", "user_shifts": []},
+    )
+    turn_started = time.perf_counter()
+    await call_agent_async(runner, "bench_user", session.id, "I can't work on the 5th, I have an exam", display=False)
+    return time.perf_counter() - turn_started
+
+first_turn_seconds = asyncio.run(first_turn())
+print(json.dumps({
+    "import": imported - started,
+    "first_turn": first_turn_seconds,
+    "sub_agents": len(scrabble_agent.sub_agents),
+    "sub_agents_built": sum(getattr(agent, "built", True) for agent in scrabble_agent.sub_agents),
+}))
+"""
+
+
+def _cold_start():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c", COLD_START_SCRIPT], cwd=root, env=os.environ, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def bench_startup(runs=3):
+    """Import time of the agent tree and the latency of the first turn, in new processes."""
+    samples = [_cold_start() for _ in range(runs)]
+    return {
+        "runs": runs,
+        "sub_agents_built_after_first_turn": samples[-1]["sub_agents_built"],
+        "import_s": round(statistics.median(sample["import"] for sample in samples), 4),
+        "first_turn_s": round(statistics.median(sample["first_turn"] for sample in samples), 4),
+        "cold_start_s": round(statistics.median(sample["import"] + sample["first_turn"] for sample in samples), 4),
+    }
@@ -0,0 +1,440 @@
+import argparse
+import asyncio
+import bisect
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+
+# Load .env before reading the cluster settings, the workers inherit it too
+load_dotenv()
+
+import httpx
+import uvicorn
+import websockets
+from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
+
+from ring_epoch import RING_EPOCH_HEADER
+
+# Worker processes, each runs CLUSTER_APP on its own port
+CLUSTER_WORKERS = int(os.getenv("CLUSTER_WORKERS", str(os.cpu_count() or 1)))
+CLUSTER_APP = os.getenv("CLUSTER_APP", "server:app")
+# The port of the first worker, the others follow it, 0 picks free ports
+CLUSTER_WORKER_BASE_PORT = int(os.getenv("CLUSTER_WORKER_BASE_PORT", "8100"))
+# Points of each worker on the hash ring, more points spread the users more evenly
+CLUSTER_RING_REPLICAS = int(os.getenv("CLUSTER_RING_REPLICAS", "64"))
+# Seconds between health checks, and failed checks before a worker is restarted
+CLUSTER_HEALTH_INTERVAL = float(os.getenv("CLUSTER_HEALTH_INTERVAL", "1"))
+CLUSTER_HEALTH_FAILURES = int(os.getenv("CLUSTER_HEALTH_FAILURES", "3"))
+# Seconds a new worker may take to import the agents and answer its first health check
+CLUSTER_STARTUP_TIMEOUT = float(os.getenv("CLUSTER_STARTUP_TIMEOUT", "120"))
+# Where the workers write their Prometheus metrics, emptied when the cluster starts and stops, a temporary directory if unset
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Headers that belong to one connection and are not forwarded
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "upgrade", "host", "content-length"}
+
+
+class HashRing:
+    """Consistent hashing of keys onto nodes.
+
+    Every node is placed on the ring `replicas` times. Adding or removing a
+    node only moves the keys between it and its neighbours, the other keys
+    keep their node. The epoch counts the changes of the ring.
+    """
+
+    def __init__(self, replicas=CLUSTER_RING_REPLICAS):
+        self.replicas = replicas
+        self._hashes = []
+        self._nodes = []
+        self.epoch = 0
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+    @property
+    def nodes(self):
+        return sorted(set(self._nodes))
+
+    def __contains__(self, node):
+        return node in self._nodes
+
+    def add(self, node):
+        if node in self._nodes:
+            return
+        for replica in range(self.replicas):
+            point = self._hash(f"{node}#{replica}")
+            index = bisect.bisect(self._hashes, point)
+            self._hashes.insert(index, point)
+            self._nodes.insert(index, node)
+        self.epoch += 1
+
+    def remove(self, node):
+        if node not in self._nodes:
+            return
+        kept = [(point, kept_node) for point, kept_node in zip(self._hashes, self._nodes) if kept_node != node]
+        self._hashes = [point for point, _ in kept]
+        self._nodes = [kept_node for _, kept_node in kept]
+        self.epoch += 1
+
+    def node_for(self, key, skip=()):
+        """The node of a key, or the next one on the ring after the nodes to skip, None if there is none."""
+        start = bisect.bisect(self._hashes, self._hash(key))
+        for offset in range(len(self._hashes)):
+            node = self._nodes[(start + offset) % len(self._hashes)]
+            if node not in skip:
+                return node
+        return None
+
+
+def free_port():
+    """A port nothing listens on now."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+class Worker:
+    """One server process of the cluster."""
+
+    def __init__(self, index, port, app, metrics_dir):
+        self.name = f"worker-{index}"
+        self.index = index
+        self.port = port
+        self.app = app
+        self.metrics_dir = metrics_dir
+        self.url = f"http://127.0.0.1:{port}"
+        self.process = None
+        self.started = None
+        self.ready = False
+        self.restarts = 0
+
+    async def start(self):
+        self.ready = False
+        self.started = time.monotonic()
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            "uvicorn",
+            self.app,
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(self.port),
+            "--log-level",
+            "warning",
+            env={
+                **os.environ,
+                "CLUSTER_WORKER": str(self.index),
+                "SESSION_DURABLE_TURNS": "1",
+                "PROMETHEUS_MULTIPROC_DIR": self.metrics_dir,
+            },
+        )
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def stop(self, timeout=10):
+        if not self.running:
+            return
+        # SIGTERM lets the server flush its buffered session writes
+        self.process.terminate()
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.process.kill()
+            await self.process.wait()
+
+
+class Cluster:
+    """Worker processes behind one router, sessions placed by user id.
+
+    Every request that names a user (a user_id query parameter or JSON body
+    field) goes to the user's worker on the hash ring, so the turns of a
+    session stay in order in one process, with its caches. The other
+    requests are spread over the workers in turn.
+
+    The workers share the session, user and outbox databases, and flush the
+    session writes of every turn before answering it. A turn holds its
+    session's lease in the session database, so a worker taking a session
+    over waits for a turn still running on the previous one. A worker that
+    exits or fails health_failures checks in a row leaves the ring, its users
+    move to the next workers, which read their sessions from the database,
+    and it is restarted and rejoins the ring once healthy. A request that
+    can't reach its worker goes to the user's next worker, without changing
+    the ring. The workers write their Prometheus metrics to one directory,
+    so /metrics of any worker covers all of them.
+
+    The router only forwards bytes, the agent turns run in the workers, so
+    throughput grows with the workers up to the number of cores.
+    """
+
+    def __init__(
+        self,
+        workers=CLUSTER_WORKERS,
+        app=CLUSTER_APP,
+        base_port=CLUSTER_WORKER_BASE_PORT,
+        health_interval=CLUSTER_HEALTH_INTERVAL,
+        health_failures=CLUSTER_HEALTH_FAILURES,
+        startup_timeout=CLUSTER_STARTUP_TIMEOUT,
+        metrics_dir=PROMETHEUS_MULTIPROC_DIR,
+    ):
+        self.metrics_dir = metrics_dir or os.path.join(tempfile.gettempdir(), f"scrabble_metrics_{os.getpid()}")
+        self.workers = {}
+        for index in range(workers):
+            worker = Worker(index, base_port + index if base_port else free_port(), app, self.metrics_dir)
+            self.workers[worker.name] = worker
+        self.health_interval = health_interval
+        self.health_failures = health_failures
+        self.startup_timeout = startup_timeout
+        self.ring = HashRing()
+        self._turns = itertools.count()
+        self._client = None
+        self._monitors = []
+
+    async def start(self):
+        # The files of an earlier run would be added to this run's metrics
+        shutil.rmtree(self.metrics_dir, ignore_errors=True)
+        os.makedirs(self.metrics_dir)
+        self._client = httpx.AsyncClient(timeout=None)
+        await asyncio.gather(*(worker.start() for worker in self.workers.values()))
+        self._monitors = [asyncio.create_task(self._monitor(worker)) for worker in self.workers.values()]
+        # Serve once every worker is ready, or with the ones that are after the startup timeout
+        deadline = time.monotonic() + self.startup_timeout
+        while not all(worker.ready for worker in self.workers.values()) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        print(f"{len(self.ring.nodes)} of {len(self.workers)} workers are ready")
+
+    async def stop(self):
+        for monitor in self._monitors:
+            monitor.cancel()
+        await asyncio.gather(*self._monitors, return_exceptions=True)
+        await asyncio.gather(*(worker.stop() for worker in self.workers.values()))
+        if self._client is not None:
+            await self._client.aclose()
+        shutil.rmtree(self.metrics_dir, ignore_errors=True)
+
+    async def _healthy(self, worker):
+        try:
+            response = await self._client.get(f"{worker.url}/health", timeout=self.health_interval * 2)
+            return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    async def _monitor(self, worker):
+        failures = 0
+        while True:
+            await asyncio.sleep(self.health_interval)
+            if not worker.running:
+                self.ring.remove(worker.name)
+                print(f"{worker.name} exited with code {worker.process.returncode}, restarting it")
+                worker.restarts += 1
+                failures = 0
+                await worker.start()
+                continue
+
+            if await self._healthy(worker):
+                failures = 0
+                if not worker.ready:
+                    worker.ready = True
+                    print(f"{worker.name} is ready on port {worker.port}")
+                self.ring.add(worker.name)
+                continue
+
+            # A worker still importing the agents is given startup_timeout seconds
+            if not worker.ready:
+                if time.monotonic() - worker.started > self.startup_timeout:
+                    print(f"ERROR: {worker.name} did not start in {self.startup_timeout:.0f}s, restarting it")
+                    worker.process.kill()
+                continue
+            # A single missed check may be a long turn holding the event loop, the worker keeps its users
+            failures += 1
+            if failures >= self.health_failures:
+                self.ring.remove(worker.name)
+                print(f"ERROR: {worker.name} failed {failures} health checks, restarting it")
+                worker.process.kill()
+
+    def worker_for(self, user_id=None, skip=()):
+        """The worker of a user, or the next worker in turn without a user, leaving out the workers to skip."""
+        if user_id:
+            name = self.ring.node_for(str(user_id), skip)
+        else:
+            nodes = [node for node in self.ring.nodes if node not in skip]
+            name = nodes[next(self._turns) % len(nodes)] if nodes else None
+        return self.workers.get(name)
+
+    def _down(self, worker):
+        """Take a worker that exited off the ring, until it restarted and passed a health check."""
+        self.ring.remove(worker.name)
+
+    def status(self):
+        return {
+            "epoch": self.ring.epoch,
+            "ring": self.ring.nodes,
+            "workers": [
+                {
+                    "name": worker.name,
+                    "port": worker.port,
+                    "pid": worker.process.pid if worker.process else None,
+                    "running": worker.running,
+                    "ready": worker.ready,
+                    "in_ring": worker.name in self.ring,
+                    "restarts": worker.restarts,
+                }
+                for worker in self.workers.values()
+            ],
+        }
+
+    async def forward(self, request: Request, path: str):
+        body = await request.body()
+        user_id = request.query_params.get("user_id") or _body_user_id(body)
+        headers = {name: value for name, value in request.headers.items() if name.lower() not in HOP_HEADERS}
+        tried = set()
+        for _ in range(len(self.workers)):
+            worker = self.worker_for(user_id, tried)
+            if worker is None:
+                break
+            tried.add(worker.name)
+            if not worker.running:
+                self._down(worker)
+                continue
+            headers[RING_EPOCH_HEADER] = str(self.ring.epoch)
+            try:
+                response = await self._client.request(
+                    request.method, f"{worker.url}/{path}", params=request.query_params, content=body, headers=headers
+                )
+            except httpx.ConnectError:
+                # The request never reached the worker, it is safe to send it to the next one,
+                # the health checks decide whether the worker leaves the ring
+                continue
+            except httpx.HTTPError as e:
+                # The worker may have run the turn, so it is not sent again, but a
+                # worker that died takes no more requests and the client's retry
+                # goes to the user's next worker
+                try:
+                    await asyncio.wait_for(worker.process.wait(), self.health_interval)
+                    self._down(worker)
+                except asyncio.TimeoutError:
+                    pass
+                return Response(f"Worker {worker.name} failed: {type(e).__name__} {e}", status_code=502)
+            return Response(
+                response.content,
+                status_code=response.status_code,
+                headers={name: value for name, value in response.headers.items() if name.lower() not in HOP_HEADERS},
+            )
+        return Response("No worker is available", status_code=503)
+
+    async def forward_websocket(self, websocket: WebSocket, path: str):
+        await websocket.accept()
+        user_id = websocket.query_params.get("user_id")
+        query = f"?{websocket.url.query}" if websocket.url.query else ""
+        tried = set()
+        for _ in range(len(self.workers)):
+            worker = self.worker_for(user_id, tried)
+            if worker is None:
+                break
+            tried.add(worker.name)
+            if not worker.running:
+                self._down(worker)
+                continue
+            url = f"ws://127.0.0.1:{worker.port}/{path}{query}"
+            try:
+                upstream = await websockets.connect(url, additional_headers={RING_EPOCH_HEADER: str(self.ring.epoch)})
+            except OSError:
+                continue
+            async with upstream:
+                await _pipe_websocket(websocket, upstream)
+            return
+        await websocket.close(code=1013, reason="No worker is available")
+
+
+def _body_user_id(body):
+    if not body:
+        return None
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    return data.get("user_id") if isinstance(data, dict) else None
+
+
+async def _pipe_websocket(websocket, upstream):
+    async def to_worker():
+        try:
+            while True:
+                await upstream.send(await websocket.receive_text())
+        except WebSocketDisconnect:
+            await upstream.close()
+
+    async def to_client():
+        try:
+            async for message in upstream:
+                await websocket.send_text(message)
+        except websockets.ConnectionClosedError:
+            pass
+        await websocket.close(code=upstream.close_code or 1000, reason=upstream.close_reason or "")
+
+    tasks = [asyncio.create_task(to_worker()), asyncio.create_task(to_client())]
+    _, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+
+cluster = Cluster()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await cluster.start()
+    yield
+    await cluster.stop()
+
+
+app = FastAPI(title="ScrabbleAI cluster", lifespan=lifespan)
+
+
+@app.get("/cluster")
+async def cluster_status():
+    """The workers, their state and the ones on the hash ring."""
+    return cluster.status()
+
+
+@app.websocket("/{path:path}")
+async def forward_websocket(websocket: WebSocket, path: str):
+    await cluster.forward_websocket(websocket, path)
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+async def forward(request: Request, path: str):
+    return await cluster.forward(request, path)
+
+
+def main():
+    # e.g. python cluster.py --workers 4 --port 8000
+    parser = argparse.ArgumentParser(description="Run the ScrabbleAI server as several worker processes behind one router.")
+    parser.add_argument("--workers", type=int, default=CLUSTER_WORKERS, help="The number of worker processes")
+    parser.add_argument("--app", default=CLUSTER_APP, help="The ASGI app every worker runs, as module:attribute")
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"), help="The router's host")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")), help="The router's port")
+    parser.add_argument(
+        "--worker-base-port", type=int, default=CLUSTER_WORKER_BASE_PORT, help="The first worker's port, 0 for free ports"
+    )
+    args = parser.parse_args()
+
+    global cluster
+    cluster = Cluster(workers=args.workers, app=args.app, base_port=args.worker_base_port)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,22 @@
 import asyncio
+import os
+import sys
 from dotenv import load_dotenv
+
+# Load .env before the agents read their configuration from the environment
+load_dotenv()
+
 from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
 
 from scrabble_agent.agent import scrabble_agent
-from utils import add_user_query_to_history, call_agent_async
-
-load_dotenv()
+from scrabble_agent.telemetry import setup_tracing, start_metrics_server
+from scrabble_agent.tools import prefetch_user, report_outbox, user_records_cache
+from sqlite_session_service import SqliteSessionService
+from utils import add_user_query_to_history, call_agent_async, create_session_with_history
 
-# Initialize In-Memory Session Service
-session_service = InMemorySessionService()
+# Initialize the SQLite Session Service, sessions survive restarts
+# To move existing sessions from an InMemorySessionService, use sqlite_session_service.migrate_from_memory
+session_service = SqliteSessionService(os.getenv("SESSION_DB_PATH", "scrabble_sessions.db"))
 
 # Define Initial State for the Session
 initial_state = {
@@ -18,19 +25,56 @@ initial_state = {
 }
 
 
+_prompt_session = None
+
+
+async def read_input(prompt):
+    """Read a line from the console without blocking the event loop.
+
+    On a terminal prompt_toolkit's async prompt is used, and whatever background
+    tasks print while the user types appears above the prompt. Otherwise the
+    line is read in a thread. Returns None at the end of the input.
+    """
+    try:
+        if sys.stdin.isatty():
+            from prompt_toolkit import PromptSession
+            from prompt_toolkit.patch_stdout import patch_stdout
+
+            global _prompt_session
+            if _prompt_session is None:
+                _prompt_session = PromptSession()
+            with patch_stdout():
+                return await _prompt_session.prompt_async(prompt)
+        return await asyncio.to_thread(input, prompt)
+    except (EOFError, KeyboardInterrupt):
+        return None
+
+
 async def main_async():
     
     APP_NAME = "ScrabbleAI"
     USER_ID = "scrabble_user_123"
 
+    # Read the user's role, name, shifts and constraints from the Database concurrently,
+    # later lookups in the session are served from the cache
+    user_records = await prefetch_user(USER_ID)
+    state = {
+        **initial_state,
+        "user_id": USER_ID,
+        "user_name": user_records["user_name"] or initial_state["user_name"],
+        "user_role": user_records["user_role"] or "system_user",
+        "user_shifts": user_records["user_shifts"] or initial_state["user_shifts"],
+    }
+
     # Create a new session with initial state
-    new_session = session_service.create_session(
-        app_name=APP_NAME,
-        user_id=USER_ID,
-        state=initial_state,
+    new_session = await create_session_with_history(
+        session_service, APP_NAME, USER_ID, state
     )
     SESSION_ID = new_session.id
     print(f"Created new session: {SESSION_ID}")
+    # The console user may be new, store the name so user_duties_tool can find the user
+    if user_records["user_name"] is None:
+        await user_records_cache.save(USER_ID, user_name=state["user_name"])
 
     # Create a runner with the main scrabble agent
     runner = Runner(
@@ -39,16 +83,19 @@ async def main_async():
         session_service=session_service,
     )
 
+    # Deliver queued reports in the background while the conversation runs
+    report_outbox.start()
+
     # Interactive Conversation Loop
     print("\nWelcome to ScrabbleAI Chat!")
     print("Type 'exit' or 'quit' to end the conversation.\n")
 
     while True:
-        # Get user input
-        user_input = input(f"{initial_state['user_name']}: ")
+        # Get user input, the event loop keeps running background tasks meanwhile
+        user_input = await read_input(f"{initial_state['user_name']}: ")
 
         # Check if user wants to exit
-        if any(word in user_input.lower() for word in ["exit", "quit"]):
+        if user_input is None or any(word in user_input.lower() for word in ["exit", "quit"]):
             print("Ending conversation. Goodbye!")
             break
 
@@ -60,8 +107,16 @@ async def main_async():
         # Process the user query through the agent
         await call_agent_async(runner, USER_ID, SESSION_ID, user_input)
 
+    # Reports not delivered yet stay in the outbox for the next run
+    await report_outbox.stop()
+    # Write any buffered session changes before exiting
+    await session_service.close()
+
 
 def main():
+    # Export spans and serve /metrics when TRACES_EXPORTER and METRICS_PORT are set
+    setup_tracing()
+    start_metrics_server()
     asyncio.run(main_async())
 
 
@@ -0,0 +1,24 @@
+# Sent by the cluster router with every forwarded request, the ring's version since the router started
+RING_EPOCH_HEADER = "x-ring-epoch"
+
+
+class RingEpochMiddleware:
+    """Calls `on_change` when the router's ring changed since the last request.
+
+    Users that moved to this worker may have been served by another one
+    meanwhile, so whatever the worker cached about them is stale.
+    """
+
+    def __init__(self, app, on_change):
+        self.app = app
+        self.on_change = on_change
+        self.epoch = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket"):
+            epoch = dict(scope["headers"]).get(RING_EPOCH_HEADER.encode())
+            if epoch is not None and epoch != self.epoch:
+                if self.epoch is not None:
+                    self.on_change()
+                self.epoch = epoch
+        await self.app(scope, receive, send)
@@ -1,19 +1,61 @@
 from google.adk.agents import Agent
 from pydantic import BaseModel, Field
 
-from .sub_agents.categorizer_agent.agent import categorizer_agent
-from .sub_agents.chatbot_agent.agent import chatbot_agent
-from .sub_agents.critic_agent.agent import critic_agent
-from .sub_agents.judge_agent.agent import judge_agent
-from .sub_agents.manager_agent.agent import manager_agent
-from .sub_agents.reporter_agent.agent import reporter_agent
-from .sub_agents.security_agent.agent import security_agent
-from .sub_agents.supreme_agent.agent import supreme_agent
+from .sub_agents.security_agent.agent import security_agent, security_precheck_callback
+from .sub_agents.chatbot_agent import info as chatbot_info
+from .sub_agents.judge_agent import info as judge_info
+from .sub_agents.categorizer_agent import info as categorizer_info
+from .sub_agents.manager_agent import info as manager_info
+from .sub_agents.critic_agent import info as critic_info
+from .sub_agents.reporter_agent import info as reporter_info
+from .sub_agents.supreme_agent import info as supreme_info
+from .lazy_agent import LazyAgent
+from .response_cache import response_cache
+from .tools import user_duties_tool
+from .model_backend import agent_model
+
+# The sub-agents are imported and built the first time the root transfers to them,
+# the security agent is built with the root, its pre-filter checks every message
+chatbot_agent = LazyAgent(
+   name=chatbot_info.NAME,
+   description=chatbot_info.DESCRIPTION,
+   module="scrabble_agent.sub_agents.chatbot_agent.agent",
+)
+judge_agent = LazyAgent(
+   name=judge_info.NAME,
+   description=judge_info.DESCRIPTION,
+   module="scrabble_agent.sub_agents.judge_agent.agent",
+)
+categorizer_agent = LazyAgent(
+   name=categorizer_info.NAME,
+   description=categorizer_info.DESCRIPTION,
+   module="scrabble_agent.sub_agents.categorizer_agent.agent",
+)
+manager_agent = LazyAgent(
+   name=manager_info.NAME,
+   description=manager_info.DESCRIPTION,
+   module="scrabble_agent.sub_agents.manager_agent.agent",
+)
+critic_agent = LazyAgent(
+   name=critic_info.NAME,
+   description=critic_info.DESCRIPTION,
+   module="scrabble_agent.sub_agents.critic_agent.agent",
+)
+reporter_agent = LazyAgent(
+   name=reporter_info.NAME,
+   description=reporter_info.DESCRIPTION,
+   module="scrabble_agent.sub_agents.reporter_agent.agent",
+)
+supreme_agent = LazyAgent(
+   name=supreme_info.NAME,
+   description=supreme_info.DESCRIPTION,
+   module="scrabble_agent.sub_agents.supreme_agent.agent",
+)
 
 # ---- Define the Agent ----
 scrabble_agent = Agent(
    name="scrabble_agent",
-   model="gemini-2.0-flash", # https://cloud.google.com/vertex-ai/generative-ai/docs/models/gemini/2-0-flash
+   model=agent_model("scrabble_agent"),
    description="Handle and Manage user's constraints to assign different types of duties",
    instruction="""
       You are the Scrabbler, an assistant that extract information from the user to provide the user's preferences for different kind of duties who can take place at any time and anywhere, such as: guarding, cleaning, escorting and more..
@@ -105,7 +147,10 @@ scrabble_agent = Agent(
 
       Tailor your response based on the user's information and the context provided in the interaction history.
 
-      After every response from a user with "system_user" role, transfer the user's query to the security agent to ensure that the user is not violating any rules of the system:
+      Every user message is checked by a local security pre-filter before it reaches you, its verdict for the current message is: {security_verdict}
+         - If the verdict is "clean", the message is not violating any rules, do not transfer it to the security agent.
+         - If the verdict is "escalate", transfer the user's query to the security agent to ensure that the user is not violating any rules of the system.
+         - If the verdict is "pending", the security agent is already checking the message in parallel, do not transfer it to the security agent and handle the query as usual.
          - If the security agent detects that the user is violating any rules, it will inform you in a formatted manner, in that case, you will not answer the query. instead, use the security agent reponse and conduct a warning to the user about this and similar future actions, be polite and provide the exact reason for the violation.
          - If the security agent does not detect any violations, you will continue with the conversation as usual and use the specialized agents to handle the user's queries if needed.
       
@@ -118,13 +163,29 @@ scrabble_agent = Agent(
       
       """,
    sub_agents=[chatbot_agent, judge_agent, categorizer_agent, manager_agent, critic_agent, security_agent, reporter_agent, supreme_agent],
-   tools=[],
+   tools=[user_duties_tool],
+   before_agent_callback=security_precheck_callback,
 )
 
-### TODO: 
-# add user_constraints_tool that fetches user constraints from the Database by user_id
-# add user_duties_tool that fetches the user's duties from the Database by user_name, if the tool doesnt find the user by name it returns a list of possible users with similar names
-# add send_report_tool that sends an SMS or email to the admin with the report provided by the Reporter Agent, this tool will be used to send the report to the admin after the user approves it.
+
+def prepare_sub_agent(sub_agent):
+   # Every agent can receive the user's next message directly, so every agent runs the security pre-filter,
+   # before any callback of its own
+   own_callbacks = sub_agent.before_agent_callback or []
+   if not isinstance(own_callbacks, list):
+      own_callbacks = [own_callbacks]
+   sub_agent.before_agent_callback = [security_precheck_callback, *own_callbacks]
+
+   # Repeated queries are answered from the response cache while the state the agent reads is unchanged
+   response_cache.attach(sub_agent)
+
+
+response_cache.attach(scrabble_agent)
+for sub_agent in scrabble_agent.sub_agents:
+   if isinstance(sub_agent, LazyAgent):
+      sub_agent.prepare(prepare_sub_agent)
+   else:
+      prepare_sub_agent(sub_agent)
 
 ### guidelines for the critic agent 
 # receives the user constraints from user_constraints_tool and the output from the manager agent and checks if the assigned duties meet the user's preferences and constraints, if not, it loops back for a fix
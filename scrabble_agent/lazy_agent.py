@@ -0,0 +1,53 @@
+import importlib
+from typing import AsyncGenerator
+
+from google.adk.agents import LlmAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from pydantic import PrivateAttr
+
+
+class LazyAgent(LlmAgent):
+    """A sub-agent that is imported and built the first time it runs.
+
+    Until then only its name and description are known, which is all the
+    parent needs to offer the transfer. The built agent takes the parent of
+    the LazyAgent, and every callback given to prepare() is called with it.
+
+    A LazyAgent is an LlmAgent so the runner keeps the conversation with it
+    between turns, like with the agent it stands for.
+    """
+
+    module: str = ""
+    attribute: str = ""
+    _agent = PrivateAttr(default=None)
+    _prepare = PrivateAttr(default_factory=list)
+
+    @property
+    def built(self):
+        return self._agent is not None
+
+    @property
+    def agent(self):
+        """The built agent."""
+        if self._agent is None:
+            agent = getattr(importlib.import_module(self.module), self.attribute or self.name)
+            agent.parent_agent = self.parent_agent
+            for callback in self._prepare:
+                callback(agent)
+            self._agent = agent
+        return self._agent
+
+    def prepare(self, callback):
+        """Call `callback` with the agent once it is built."""
+        self._prepare.append(callback)
+        if self._agent is not None:
+            callback(self._agent)
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        async for event in self.agent.run_async(ctx):
+            yield event
+
+    async def _run_live_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        async for event in self.agent.run_live(ctx):
+            yield event
@@ -0,0 +1,220 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, AsyncGenerator
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.models.registry import LLMRegistry
+from google.genai import types
+
+from .model_config import model_configs
+
+# "live" calls the model, "record" calls it and saves every request/response pair to the cassette,
+# "replay" answers from the cassette without any network access
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "live")
+MODEL_CASSETTE_PATH = os.getenv("MODEL_CASSETTE_PATH", "model_cassette.jsonl")
+# Latency added to replayed responses: "" for none, "recorded", "fixed:0.5", "uniform:0.2,0.8",
+# "normal:0.6,0.1" (mean, standard deviation) or "lognormal:-0.5,0.3" (mu, sigma), in seconds
+MODEL_REPLAY_LATENCY = os.getenv("MODEL_REPLAY_LATENCY", "")
+MODEL_REPLAY_SEED = int(os.getenv("MODEL_REPLAY_SEED", "0"))
+
+# Parts of a request that change between otherwise identical runs
+_VOLATILE_PATTERNS = [
+    (re.compile(r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(\.\d+)?"), "<timestamp>"),
+    (re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"), "<uuid>"),
+]
+
+
+def request_key(llm_request: LlmRequest):
+    """A fingerprint of a model request that ignores timestamps and generated ids."""
+    config = llm_request.config
+    request = {
+        "model": llm_request.model,
+        "system_instruction": config.system_instruction if config else None,
+        "tools": sorted(llm_request.tools_dict),
+        "contents": [content.model_dump(mode="json", exclude_none=True) for content in llm_request.contents],
+    }
+    text = json.dumps(request, sort_keys=True, default=str)
+    for pattern, replacement in _VOLATILE_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Recorded model responses by request key, kept in a JSONL file.
+
+    A request recorded several times is replayed in the recorded order, and
+    its last recording is repeated once they run out.
+    """
+
+    def __init__(self, path=MODEL_CASSETTE_PATH):
+        self.path = path
+        self._entries = {}
+        self._cursors = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as cassette_file:
+                for line in cassette_file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries.setdefault(entry["key"], []).append(entry)
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    def record(self, key, responses, latency):
+        entry = {
+            "key": key,
+            "latency": latency,
+            "responses": [response.model_dump(mode="json", exclude_none=True) for response in responses],
+        }
+        with self._lock:
+            self._entries.setdefault(key, []).append(entry)
+            with open(self.path, "a", encoding="utf-8") as cassette_file:
+                cassette_file.write(json.dumps(entry) + "\n")
+
+    def next(self, key):
+        """The next recorded entry of a request, None if it was never recorded."""
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                return None
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            return entries[min(cursor, len(entries) - 1)]
+
+    def rewind(self):
+        """Replay every request from its first recording again."""
+        with self._lock:
+            self._cursors.clear()
+
+
+class LatencyModel:
+    """Samples the latency of replayed responses from a seeded distribution."""
+
+    def __init__(self, spec=MODEL_REPLAY_LATENCY, seed=MODEL_REPLAY_SEED):
+        self.spec = spec
+        self._random = random.Random(seed)
+        self._kind, _, params = spec.partition(":")
+        self._params = [float(param) for param in params.split(",") if param]
+        samplers = {
+            "": lambda recorded: 0.0,
+            "recorded": lambda recorded: recorded,
+            "fixed": lambda recorded: self._params[0],
+            "uniform": lambda recorded: self._random.uniform(*self._params),
+            "normal": lambda recorded: self._random.gauss(*self._params),
+            "lognormal": lambda recorded: self._random.lognormvariate(*self._params),
+        }
+        if self._kind not in samplers:
+            raise ValueError(f"Unknown replay latency {spec!r}")
+        self._sampler = samplers[self._kind]
+
+    def sample(self, recorded=0.0):
+        return max(0.0, self._sampler(recorded))
+
+
+class RecordReplayLlm(BaseLlm):
+    """A model that records the responses of the real model, or replays them offline.
+
+    In record mode every request goes to the model registered for `model`
+    and its responses are saved to the cassette. In replay mode the
+    responses are served from the cassette after the sampled latency, and a
+    request that was never recorded raises a KeyError.
+    """
+
+    mode: str = "replay"
+    cassette: Any = None
+    latency: Any = None
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        key = request_key(llm_request)
+        if self.mode == "replay":
+            entry = self.cassette.next(key)
+            if entry is None:
+                raise KeyError(f"No recorded response for this {self.model} request, record it with MODEL_BACKEND=record")
+            if self.latency:
+                await asyncio.sleep(self.latency.sample(entry["latency"]))
+            for response in entry["responses"]:
+                yield LlmResponse.model_validate(response)
+            return
+
+        started = time.perf_counter()
+        responses = []
+        async for response in LLMRegistry.new_llm(self.model).generate_content_async(llm_request, stream):
+            responses.append(response)
+            yield response
+        self.cassette.record(key, responses, time.perf_counter() - started)
+
+
+# Shared by every agent, so one seed fixes the latencies of a whole run
+_cassette = None
+_latency = None
+_backend_lock = threading.Lock()
+# Backend models by model name, a live model keeps its API client between calls
+_backends = {}
+
+
+def backend_model(model_name):
+    """The model that answers for a model name, wrapped for recording or replay when MODEL_BACKEND asks for it."""
+    global _cassette, _latency
+    if MODEL_BACKEND not in ("live", "record", "replay"):
+        raise ValueError(f"Unknown MODEL_BACKEND {MODEL_BACKEND!r}, use live, record or replay")
+    with _backend_lock:
+        if model_name not in _backends:
+            if MODEL_BACKEND == "live":
+                _backends[model_name] = LLMRegistry.new_llm(model_name)
+            else:
+                if _cassette is None:
+                    _cassette = Cassette()
+                    _latency = LatencyModel()
+                _backends[model_name] = RecordReplayLlm(
+                    model=model_name, mode=MODEL_BACKEND, cassette=_cassette, latency=_latency
+                )
+        return _backends[model_name]
+
+
+class ConfiguredLlm(BaseLlm):
+    """An agent's model, whose settings are read from the model config registry on every call.
+
+    The model name, temperature and token cap of the request are replaced by
+    the agent's settings, and the call fails with a TimeoutError when the
+    whole response takes longer than its timeout.
+    """
+
+    agent_name: str = ""
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        config = model_configs.get(self.agent_name)
+        # Tools that check the model name see the current one on the next call
+        self.model = llm_request.model = config["model"]
+        llm_request.config = llm_request.config or types.GenerateContentConfig()
+        if config["temperature"] is not None:
+            llm_request.config.temperature = config["temperature"]
+        if config["max_output_tokens"] is not None:
+            llm_request.config.max_output_tokens = config["max_output_tokens"]
+
+        responses = backend_model(config["model"]).generate_content_async(llm_request, stream).__aiter__()
+        deadline = time.monotonic() + config["timeout"]
+        while True:
+            try:
+                response = await asyncio.wait_for(responses.__anext__(), max(0.0, deadline - time.monotonic()))
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                await responses.aclose()
+                raise TimeoutError(f"{config['model']} did not answer {self.agent_name} within {config['timeout']}s")
+            yield response
+
+
+def agent_model(agent_name):
+    """The model of an agent, configured per agent by the model config registry."""
+    return ConfiguredLlm(model=model_configs.get(agent_name)["model"], agent_name=agent_name)
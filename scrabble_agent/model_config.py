@@ -0,0 +1,152 @@
+import json
+import os
+import threading
+import time
+
+# JSON file with the model settings per agent, re-read when it changes, e.g.
+# {
+#     "tiers": {"fast": "gemini-2.0-flash-lite"},
+#     "default": {"tier": "standard", "timeout": 60},
+#     "agents": {"security_checker": {"tier": "fast", "timeout": 10, "max_output_tokens": 64}}
+# }
+MODEL_CONFIG_PATH = os.getenv("MODEL_CONFIG_PATH", "model_config.json")
+# Seconds between checks of the file for changes
+MODEL_CONFIG_RELOAD_INTERVAL = float(os.getenv("MODEL_CONFIG_RELOAD_INTERVAL", "2"))
+
+# Model tiers an agent can be put on instead of naming a model
+MODEL_TIERS = {
+    "fast": "gemini-2.0-flash-lite",
+    "standard": "gemini-2.0-flash",
+}
+
+# The settings of every agent the file and the environment don't change,
+# a temperature or max_output_tokens of None keeps the model's default
+DEFAULT_MODEL_CONFIG = {
+    "model": MODEL_TIERS["standard"],
+    "timeout": 60.0,
+    "temperature": None,
+    "max_output_tokens": None,
+}
+
+# The settings, their types and the suffix of their environment variable,
+# e.g. SECURITY_CHECKER_TIER=fast or AGENTS_TIMEOUT=30 for every agent
+CONFIG_FIELDS = {
+    "model": (str, "MODEL"),
+    "tier": (str, "TIER"),
+    "timeout": (float, "TIMEOUT"),
+    "temperature": (float, "TEMPERATURE"),
+    "max_output_tokens": (int, "MAX_TOKENS"),
+}
+
+
+def _check_settings(settings, where):
+    if not isinstance(settings, dict):
+        raise ValueError(f"The model settings of {where} must be an object")
+    unknown = set(settings) - set(CONFIG_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown model settings {sorted(unknown)} in {where}, expected {sorted(CONFIG_FIELDS)}")
+    return {field: CONFIG_FIELDS[field][0](value) if value is not None else None for field, value in settings.items()}
+
+
+def _env_settings(prefix):
+    settings = {}
+    for field, (_, suffix) in CONFIG_FIELDS.items():
+        value = os.getenv(f"{prefix}_{suffix}")
+        if value:
+            settings[field] = value
+    return _check_settings(settings, f"the {prefix}_* environment variables")
+
+
+class ModelConfigRegistry:
+    """The model, timeout, temperature and token cap of every agent.
+
+    Settings are layered, later layers win: DEFAULT_MODEL_CONFIG, the file's
+    "default", the AGENTS_* environment variables, the file's entry of the
+    agent and the <AGENT_NAME>_* environment variables. A "tier" is resolved
+    to its model from MODEL_TIERS and the file's "tiers".
+
+    The file is checked for changes at most every `reload_interval` seconds
+    when a setting is read, so edits apply to the next model call without a
+    restart. A file that fails to load keeps the previous settings.
+    """
+
+    def __init__(self, path=MODEL_CONFIG_PATH, reload_interval=MODEL_CONFIG_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._file = {}
+        self._mtime = None
+        self._checked = 0.0
+        self._resolved = {}
+        self.reloads = 0
+        self._load_file()
+
+    def _load_file(self):
+        mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+        if mtime == self._mtime:
+            return
+        # A broken file is reported once, not on every check until it is fixed
+        self._mtime = mtime
+        config = {}
+        if mtime is not None:
+            with open(self.path, encoding="utf-8") as config_file:
+                config = json.load(config_file)
+            tiers = {**MODEL_TIERS, **config.get("tiers", {})}
+            sections = {"default": config.get("default", {})}
+            sections.update({f"agent {name}": settings for name, settings in config.get("agents", {}).items()})
+            for where, settings in sections.items():
+                tier = _check_settings(settings, f"{self.path} {where}").get("tier")
+                if tier is not None and tier not in tiers:
+                    raise ValueError(f"Unknown model tier {tier!r} in {self.path} {where}, expected one of {sorted(tiers)}")
+        self._file = config
+        self._resolved = {}
+        self.reloads += 1
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked < self.reload_interval:
+            return
+        self._checked = now
+        try:
+            self._load_file()
+        except (OSError, ValueError) as e:
+            print(f"ERROR reloading {self.path}: {e}, keeping the previous model config")
+
+    def reload(self):
+        """Re-read the file now."""
+        with self._lock:
+            self._checked = time.monotonic()
+            self._mtime = None
+            self._resolved = {}
+            self._load_file()
+
+    def get(self, agent_name):
+        """The settings of an agent: {"model", "timeout", "temperature", "max_output_tokens"}."""
+        with self._lock:
+            self._maybe_reload()
+            config = self._resolved.get(agent_name)
+            if config is None:
+                config = self._resolved[agent_name] = self._resolve(agent_name)
+            return config
+
+    def _resolve(self, agent_name):
+        tiers = {**MODEL_TIERS, **self._file.get("tiers", {})}
+        layers = [
+            _check_settings(self._file.get("default", {}), "default"),
+            _env_settings("AGENTS"),
+            _check_settings(self._file.get("agents", {}).get(agent_name, {}), agent_name),
+            _env_settings(agent_name.upper()),
+        ]
+        config = dict(DEFAULT_MODEL_CONFIG)
+        for layer in layers:
+            layer = dict(layer)
+            tier = layer.pop("tier", None)
+            if tier is not None:
+                if tier not in tiers:
+                    raise ValueError(f"Unknown model tier {tier!r} for {agent_name}, expected one of {sorted(tiers)}")
+                config["model"] = tiers[tier]
+            config.update(layer)
+        return config
+
+
+model_configs = ModelConfigRegistry()
@@ -0,0 +1,274 @@
+import json
+import re
+import threading
+import time
+
+from cachetools import TTLCache
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+from pydantic import ValidationError
+
+from .telemetry import OUTPUT_REPAIRS, OUTPUT_RETRY_LATENCY, TOKENS, tracer
+
+# Outcomes of a structured output: valid as is, repaired locally, fixed by asking the model again, or failed
+VALID = "valid"
+REPAIRED = "repaired"
+REPROMPTED = "reprompted"
+FAILED = "failed"
+
+_FENCE_PATTERN = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+_TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+_UNQUOTED_KEY_PATTERN = re.compile(r"([{,]\s*)([A-Za-z_][A-Za-z0-9_]*)\s*:")
+_PYTHON_LITERALS = [(re.compile(r"\bTrue\b"), "true"), (re.compile(r"\bFalse\b"), "false"), (re.compile(r"\bNone\b"), "null")]
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+
+def _split_strings(text):
+    """Split a text into the JSON strings in it and the text between them.
+
+    Returns:
+        A list of (segment, is_string) pairs, and whether the text ends
+        inside a string
+    """
+    segments = []
+    start = 0
+    in_string = escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+                segments.append((text[start : index + 1], True))
+                start = index + 1
+        elif char == '"':
+            segments.append((text[start:index], False))
+            start = index
+            in_string = True
+    segments.append((text[start:], in_string))
+    return segments, in_string
+
+
+def _outside_strings(text, fixes):
+    """Apply the (pattern, replacement) fixes to the text outside JSON strings only."""
+    segments, _ = _split_strings(text)
+    fixed = []
+    for segment, is_string in segments:
+        if not is_string:
+            for pattern, replacement in fixes:
+                segment = pattern.sub(replacement, segment)
+        fixed.append(segment)
+    return "".join(fixed)
+
+
+def _close_object(text):
+    """Cut the text after the JSON object it starts with, or close the brackets a truncated object leaves open."""
+    stack = []
+    offset = 0
+    segments, in_string = _split_strings(text)
+    for segment, is_string in segments:
+        if not is_string:
+            for index, char in enumerate(segment):
+                if char in "{[":
+                    stack.append("}" if char == "{" else "]")
+                elif char in "}]" and stack:
+                    stack.pop()
+                    if not stack:
+                        return text[: offset + index + 1]
+        offset += len(segment)
+    return text + ('"' if in_string else "") + "".join(reversed(stack))
+
+
+def repair_json(text):
+    """Parse the JSON object in a model's text, fixing the common syntax errors.
+
+    Drops code fences and text around the object, trailing commas, smart and
+    single quotes, unquoted keys, Python literals and unclosed brackets. The
+    fixes only apply outside the strings, the values are kept as written.
+
+    Returns:
+        The parsed object
+
+    Raises:
+        ValueError: If the text holds no JSON object, or it can't be repaired
+    """
+    text = _FENCE_PATTERN.sub("", text.strip().translate(_SMART_QUOTES))
+    start = text.find("{")
+    if start == -1:
+        raise ValueError("No JSON object in the response")
+    text = text[start:]
+
+    candidates = [text[: text.rfind("}") + 1]]
+    fixed = text.replace("'", '"') if '"' not in text else text
+    candidates.append(
+        _outside_strings(
+            _close_object(fixed),
+            [(_TRAILING_COMMA_PATTERN, r"\1"), (_UNQUOTED_KEY_PATTERN, r'\1"\2":'), *_PYTHON_LITERALS],
+        )
+    )
+
+    error = None
+    for candidate in candidates:
+        try:
+            value = json.loads(candidate)
+        except json.JSONDecodeError as e:
+            error = e
+            continue
+        if isinstance(value, dict):
+            return value
+        error = ValueError("The response is not a JSON object")
+    raise ValueError(f"Invalid JSON: {error}")
+
+
+def _replace_text(content, text):
+    """The content with its response text replaced, keeping the function calls and thoughts."""
+    parts = []
+    for part in content.parts:
+        if part.text and not part.thought:
+            if text is not None:
+                parts.append(types.Part(text=text))
+                text = None
+        else:
+            parts.append(part)
+    return types.Content(role=content.role or "model", parts=parts)
+
+
+def _response_text(llm_response):
+    if not llm_response.content or not llm_response.content.parts:
+        return ""
+    return "".join(part.text for part in llm_response.content.parts if part.text and not part.thought)
+
+
+class StructuredOutput:
+    """Repairs and validates an agent's JSON output against a pydantic schema, locally.
+
+    A final response that holds a JSON object is parsed with repair_json(),
+    coerced with `coerce(data, state)` and validated against the schema. The
+    response text is replaced by the validated JSON, so the agent's
+    output_key keeps the canonical form. Only when that fails is the model
+    asked once more, with the validation error. Responses without a JSON
+    object (questions to the user, tool calls) are left alone.
+    """
+
+    def __init__(self, schema, coerce=None, agent_name=""):
+        self.schema = schema
+        self.coerce = coerce or (lambda data, state: data)
+        self.agent_name = agent_name
+        self._lock = threading.Lock()
+        # Model requests in flight, by invocation, for asking the model again
+        self._requests = TTLCache(maxsize=4096, ttl=600)
+        self.counts = {VALID: 0, REPAIRED: 0, REPROMPTED: 0, FAILED: 0}
+        self._agent = None
+
+    def validate(self, text, state):
+        """The validated output of a response text, and whether it needed repair.
+
+        Raises:
+            ValueError: If the text can't be repaired into the schema
+        """
+        try:
+            data = json.loads(text)
+            repaired = False
+        except json.JSONDecodeError:
+            data = repair_json(text)
+            repaired = True
+        if not isinstance(data, dict) or not set(data) & set(self.schema.model_fields):
+            raise ValueError(f"The response has none of the fields {sorted(self.schema.model_fields)}")
+        coerced = self.coerce(data, state)
+        try:
+            output = self.schema.model_validate(coerced)
+        except ValidationError as e:
+            raise ValueError(str(e)) from e
+        return output.model_dump(), repaired or coerced != data or output.model_dump() != data
+
+    def _count(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+        OUTPUT_REPAIRS.labels(self.agent_name, outcome).inc()
+
+    def metrics(self):
+        """How many outputs were valid, repaired, fixed by the model or failed, and the repair success rate."""
+        with self._lock:
+            counts = dict(self.counts)
+        needed_repair = counts[REPAIRED] + counts[REPROMPTED] + counts[FAILED]
+        return {
+            **counts,
+            "local_repair_rate": counts[REPAIRED] / needed_repair if needed_repair else 0.0,
+        }
+
+    def before_model(self, callback_context: CallbackContext, llm_request: LlmRequest):
+        self._requests[callback_context.invocation_id] = llm_request
+        return None
+
+    async def after_model(self, callback_context: CallbackContext, llm_response: LlmResponse):
+        if llm_response.partial or llm_response.error_code:
+            return None
+        text = _response_text(llm_response)
+        if "{" not in text:
+            return None
+
+        state = callback_context.state
+        try:
+            output, repaired = self.validate(text, state)
+            outcome = REPAIRED if repaired else VALID
+        except ValueError as e:
+            output = await self._ask_again(callback_context, text, e, state)
+            outcome = REPROMPTED if output is not None else FAILED
+        self._count(outcome)
+
+        if output is not None and outcome != VALID:
+            # Replace the text in place, the callbacks after this one (the response cache) see the fixed response
+            llm_response.content = _replace_text(llm_response.content, json.dumps(output, ensure_ascii=False))
+        return None
+
+    async def _ask_again(self, callback_context, text, error, state):
+        llm_request = self._requests.pop(callback_context.invocation_id, None)
+        if llm_request is None or self._agent is None:
+            return None
+        retry = llm_request.model_copy()
+        retry.contents = [
+            *llm_request.contents,
+            types.Content(role="model", parts=[types.Part(text=text)]),
+            types.Content(
+                role="user",
+                parts=[
+                    types.Part(
+                        text="Your last response is not a valid JSON object of the required structure: "
+                        f"{error}\nAnswer again with only the corrected JSON object."
+                    )
+                ],
+            ),
+        ]
+        # One whole response, the retry is not streamed to the user
+        response = None
+        with tracer.start_as_current_span("output_retry", attributes={"scrabble.agent": self.agent_name}):
+            started = time.perf_counter()
+            async for response in self._agent.canonical_model.generate_content_async(retry, stream=False):
+                pass
+            OUTPUT_RETRY_LATENCY.labels(self.agent_name).observe(time.perf_counter() - started)
+        if response is None:
+            return None
+        usage = response.usage_metadata
+        if usage:
+            TOKENS.labels(self.agent_name, "prompt").inc(usage.prompt_token_count or 0)
+            TOKENS.labels(self.agent_name, "response").inc(usage.candidates_token_count or 0)
+        try:
+            return self.validate(_response_text(response), state)[0]
+        except ValueError:
+            return None
+
+    def attach(self, agent):
+        """Repair the agent's final responses, asking its model again when repair fails."""
+        self.agent_name = self.agent_name or agent.name
+        self._agent = agent
+        agent.before_model_callback = [*_callbacks(agent.before_model_callback), self.before_model]
+        agent.after_model_callback = [self.after_model, *_callbacks(agent.after_model_callback)]
+
+
+def _callbacks(callbacks):
+    if callbacks is None:
+        return []
+    return list(callbacks) if isinstance(callbacks, list) else [callbacks]
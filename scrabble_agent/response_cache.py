@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from cachetools import TTLCache
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+
+# Number of cached model responses and how long they stay valid, a size of 0 disables the cache
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+
+# Queries shorter than this ("yes", "ok thanks") only make sense with the conversation around them
+MIN_CACHED_QUERY_WORDS = 3
+
+# State fields that are left out of the key, the history changes every turn
+UNKEYED_STATE_FIELDS = {"interaction_history"}
+
+_STATE_FIELD_PATTERN = re.compile(r"{+([A-Za-z_][A-Za-z0-9_]*)\??}+")
+
+
+def normalize_query(query):
+    """Lowercase the query, drop punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^\w\s/]", " ", query.lower()).split())
+
+
+def instruction_state_fields(instruction):
+    """The state fields an instruction template reads, without the ones left out of the key."""
+    if not isinstance(instruction, str):
+        return ()
+    return tuple(sorted(set(_STATE_FIELD_PATTERN.findall(instruction)) - UNKEYED_STATE_FIELDS))
+
+
+def _digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """An LRU cache of model responses, whose entries expire after a TTL.
+
+    A response is keyed on the agent, the normalized user query, the state
+    fields the agent's instruction reads and the model calls already made in
+    the turn (tool calls and their results). The conversation before the
+    query is left out, so a user repeating a question is answered from the
+    cache. Changing the state the agent reads changes the key, and stale
+    responses age out.
+    """
+
+    def __init__(self, maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL):
+        self.enabled = maxsize > 0
+        self._cache = TTLCache(maxsize=max(maxsize, 1), ttl=ttl)
+        self._lock = threading.Lock()
+        # Model calls in flight, by invocation and agent, with their key and start time,
+        # a call that fails never reaches after_model and ages out
+        self._pending = TTLCache(maxsize=4096, ttl=600)
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+
+    def key(self, agent_name, state_fields, callback_context, llm_request):
+        """The cache key of a model call, or None if the call should not be cached."""
+        user_content = callback_context.user_content
+        if not user_content or not user_content.parts:
+            return None
+        query = " ".join(part.text for part in user_content.parts if part.text)
+        normalized = normalize_query(query)
+        if len(normalized.split()) < MIN_CACHED_QUERY_WORDS:
+            return None
+
+        # The contents after the user's query are this turn's tool calls and results,
+        # a later model call of the turn must not get the response of an earlier one
+        turn = []
+        for index in range(len(llm_request.contents) - 1, -1, -1):
+            if llm_request.contents[index] == user_content:
+                turn = llm_request.contents[index + 1 :]
+                break
+        state = {field: callback_context.state.get(field) for field in state_fields}
+        return (
+            agent_name,
+            normalized,
+            _digest(state),
+            _digest([content.model_dump(exclude_none=True) for content in turn]),
+        )
+
+    def before_model(self, agent_name, state_fields, callback_context: CallbackContext, llm_request: LlmRequest):
+        key = self.key(agent_name, state_fields, callback_context, llm_request)
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self.hits += 1
+                self.latency_saved += entry["latency"]
+                return entry["response"].model_copy(deep=True)
+            self.misses += 1
+            self._pending[(callback_context.invocation_id, agent_name)] = (key, time.perf_counter())
+        return None
+
+    def after_model(self, agent_name, callback_context: CallbackContext, llm_response: LlmResponse):
+        if llm_response.partial:
+            return None
+        with self._lock:
+            pending = self._pending.pop((callback_context.invocation_id, agent_name), None)
+            if pending is None or llm_response.error_code or not llm_response.content:
+                return None
+            key, started = pending
+            self._cache[key] = {
+                "response": llm_response.model_copy(deep=True),
+                "latency": time.perf_counter() - started,
+                "size": len(llm_response.model_dump_json(exclude_none=True)),
+            }
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def metrics(self):
+        """Hit rate, size and the model latency saved by the cache."""
+        with self._lock:
+            self._cache.expire()
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._cache),
+                "memory_bytes": sum(entry["size"] for entry in self._cache.values()),
+                "latency_saved_seconds": round(self.latency_saved, 3),
+            }
+
+    def attach(self, agent):
+        """Serve the agent's model calls from the cache, and cache its responses.
+
+        The cache is looked up before the agent's own model callbacks, and
+        stores the response after them.
+        """
+        if not self.enabled:
+            return
+        state_fields = instruction_state_fields(agent.instruction)
+        agent.before_model_callback = [
+            lambda callback_context, llm_request: self.before_model(agent.name, state_fields, callback_context, llm_request),
+            *_callbacks(agent.before_model_callback),
+        ]
+        agent.after_model_callback = [
+            *_callbacks(agent.after_model_callback),
+            lambda callback_context, llm_response: self.after_model(agent.name, callback_context, llm_response),
+        ]
+
+
+def _callbacks(callbacks):
+    if callbacks is None:
+        return []
+    return list(callbacks) if isinstance(callbacks, list) else [callbacks]
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,11 @@
+from .solver import DutySolver, repair_assignments, solve_assignments
+from .validator import ScheduleArrays, check_schedule, validate_assignments
+
+__all__ = [
+    "DutySolver",
+    "ScheduleArrays",
+    "check_schedule",
+    "repair_assignments",
+    "solve_assignments",
+    "validate_assignments",
+]
@@ -0,0 +1,149 @@
+import calendar
+import re
+from datetime import date, timedelta
+
+DATE_FORMAT = "%d/%m/%Y"
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+_DATE = r"(\d{1,2})[/.](\d{1,2})[/.](\d{4})"
+_SINGLE_DATE = re.compile(rf"^{_DATE}$")
+_DATE_RANGE = re.compile(rf"^{_DATE}\s*-\s*{_DATE}$")
+_DAY_RANGE = re.compile(r"^(\d{1,2})\s*-\s*" + _DATE + "$")
+
+
+def parse_date(text):
+    """Parse a single "dd/mm/yyyy" date, with the separators parse_date_entry() accepts.
+
+    Raises:
+        ValueError: If the text is not a single real date
+    """
+    match = _SINGLE_DATE.match(text.strip())
+    if not match:
+        raise ValueError(f"{text} is not in dd/mm/yyyy format")
+    return _make_date(*match.groups())
+
+
+def format_date(value):
+    """Format a date as "dd/mm/yyyy"."""
+    return value.strftime(DATE_FORMAT)
+
+
+def _make_date(day, month, year):
+    """Build a date, explaining why it is impossible if it is."""
+    day, month, year = int(day), int(month), int(year)
+    if not 1 <= month <= 12:
+        raise ValueError(f"{day:02d}/{month:02d}/{year} is not valid, there is no month {month}")
+    days_in_month = calendar.monthrange(year, month)[1]
+    if not 1 <= day <= days_in_month:
+        raise ValueError(
+            f"{day:02d}/{month:02d}/{year} is not valid, "
+            f"{calendar.month_name[month]} {year} has only {days_in_month} days"
+        )
+    return date(year, month, day)
+
+
+def parse_date_entry(text):
+    """Parse a date entry into its first and last date.
+
+    Supports the formats used by chatbot_agent, with "/" or "." separators
+    and with or without leading zeros:
+        - "dd/mm/yyyy"
+        - "dd/mm/yyyy - dd/mm/yyyy"
+        - "dd-dd/mm/yyyy", e.g. "04-10/06/2026"
+
+    Raises:
+        ValueError: If the entry is not in one of the formats above, or is
+            not a real date.
+    """
+    text = text.strip()
+    match = _SINGLE_DATE.match(text)
+    if match:
+        start = end = _make_date(*match.groups())
+    elif _DATE_RANGE.match(text):
+        groups = _DATE_RANGE.match(text).groups()
+        start, end = _make_date(*groups[:3]), _make_date(*groups[3:])
+    elif _DAY_RANGE.match(text):
+        first_day, last_day, month, year = _DAY_RANGE.match(text).groups()
+        start, end = _make_date(first_day, month, year), _make_date(last_day, month, year)
+    else:
+        raise ValueError(f"{text} is not in dd/mm/yyyy, dd/mm/yyyy - dd/mm/yyyy or dd-dd/mm/yyyy format")
+
+    if end < start:
+        raise ValueError(f"{text} ends before it starts")
+    return start, end
+
+
+def expand_dates(text):
+    """Expand a date entry into the list of dates it covers.
+
+    Raises:
+        ValueError: If the entry cannot be parsed, see parse_date_entry()
+    """
+    start, end = parse_date_entry(text)
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def compact_dates(dates):
+    """Merge dates into the shortest list of chatbot_agent date entries.
+
+    Consecutive dates become one "dd/mm/yyyy - dd/mm/yyyy" range, the
+    format the chatbot_agent keeps ranges in.
+    """
+    entries = []
+    days = sorted(set(dates))
+    position = 0
+    while position < len(days):
+        start = end = days[position]
+        while position + 1 < len(days) and days[position + 1] == end + timedelta(days=1):
+            position += 1
+            end = days[position]
+        if start == end:
+            entries.append(format_date(start))
+        else:
+            entries.append(f"{format_date(start)} - {format_date(end)}")
+        position += 1
+    return entries
+
+
+def check_date_entry(text, weekday=None):
+    """Validate a date entry and the day of the week the user claimed for it.
+
+    Args:
+        text: The date entry, see parse_date_entry()
+        weekday: The day of the week the user said the dates fall on, e.g. "sunday"
+
+    Returns:
+        A dictionary with:
+            - 'valid': True if the entry is a real date on the claimed weekday
+            - 'entry': The entry as given
+            - 'normalized': The entry in the chatbot_agent format
+            - 'dates': Every date the entry covers, in dd/mm/yyyy format
+            - 'message': Why the entry is not valid, if it is not
+    """
+    try:
+        days = expand_dates(text)
+    except ValueError as e:
+        return {"valid": False, "entry": text, "message": str(e)}
+
+    result = {
+        "valid": True,
+        "entry": text,
+        "normalized": compact_dates(days)[0],
+        "dates": [format_date(day) for day in days],
+    }
+    if weekday:
+        weekday = weekday.strip().lower()
+        if weekday not in WEEKDAYS:
+            result.update(valid=False, message=f"{weekday} is not a day of the week")
+            return result
+        wrong_days = [day for day in days if WEEKDAYS[day.weekday()] != weekday]
+        if wrong_days:
+            result.update(
+                valid=False,
+                message=", ".join(
+                    f"{format_date(day)} is a {WEEKDAYS[day.weekday()].capitalize()}" for day in wrong_days[:7]
+                )
+                + f", not a {weekday.capitalize()}",
+            )
+    return result
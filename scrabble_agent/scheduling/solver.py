@@ -0,0 +1,467 @@
+import heapq
+import time
+from datetime import date, timedelta
+
+from .dates import WEEKDAYS, expand_dates, format_date, parse_date
+
+# Cost of assigning a user to a duty category, by the preference the
+# categorizer_agent attached to it. Lower is better.
+PREFERENCE_COSTS = {
+    "prefer": -2,
+    "like": -1,
+    "neutral": 0,
+    "dislike": 2,
+    "avoid": 4,
+}
+
+# Cost of every duty a user already holds, keeps the workload balanced
+LOAD_COST = 1
+# Bonus for assigning a user on one of their good_days
+GOOD_DAY_BONUS = 3
+# Assigned duties in the next FREEZE_DAYS days must never change
+FREEZE_DAYS = 14
+
+
+def _preference_cost(preference):
+    """Convert a categorizer preference (name or number) into a cost."""
+    if isinstance(preference, (int, float)):
+        return preference
+    return PREFERENCE_COSTS.get(str(preference).strip().lower(), 0)
+
+
+def _preference_pairs(preferences):
+    """Normalize categorizer output into a {category: preference} dict.
+
+    Accepts either a dict of category to preference, or a list of
+    {"category": ..., "preference": ...} pairs.
+    """
+    if isinstance(preferences, dict):
+        return preferences
+    return {
+        pair["category"]: pair.get("preference", "neutral")
+        for pair in preferences or []
+        if isinstance(pair, dict) and "category" in pair
+    }
+
+
+def _entry_dates(entry):
+    """Return the date text of a good_days/bad_days entry.
+
+    bad_days entries may be DayOff objects ({"date": ..., "reason": ...})
+    or the {"dd/mm/yyyy": "reason"} shape the chatbot sometimes returns.
+    """
+    if isinstance(entry, str):
+        return [entry]
+    if isinstance(entry, dict):
+        if "date" in entry:
+            return [entry["date"]]
+        return list(entry.keys())
+    return []
+
+
+class DutySolver:
+    """Deterministic duty assignment over a fixed date horizon.
+
+    The solver fills every (date, duty) slot greedily, cheapest users first,
+    then improves the result with same-day swaps until the time budget runs
+    out or no swap helps. Given the same input and a budget large enough for
+    the swaps to converge, the output is identical between runs.
+
+    Args:
+        users: A list of user dictionaries
+            - 'user_id': The user's id
+            - 'constraints': The user's Chatbot__Output_Schema as a dict
+            - 'preferences': The categorizer_agent category/preference pairs
+        requirements: A list of duty dictionaries
+            - 'duty_title': The title written to the assignments
+            - 'category': The duty category, defaults to the duty_title
+            - 'headcount': Users needed per date, defaults to 1
+            - 'weekdays': Optional list of weekday names the duty runs on
+        start_date: The first date of the horizon
+        horizon_days: The number of days to schedule
+    """
+
+    def __init__(self, users, requirements, start_date, horizon_days=60):
+        self.dates = [start_date + timedelta(days=offset) for offset in range(horizon_days)]
+        self.date_index = {day: index for index, day in enumerate(self.dates)}
+
+        self.requirements = []
+        for requirement in requirements:
+            weekdays = requirement.get("weekdays")
+            self.requirements.append(
+                {
+                    "duty_title": requirement["duty_title"],
+                    "category": requirement.get("category", requirement["duty_title"]),
+                    "headcount": int(requirement.get("headcount", 1)),
+                    "weekdays": {WEEKDAYS.index(day.lower()) for day in weekdays} if weekdays else None,
+                }
+            )
+        self.categories = sorted({requirement["category"] for requirement in self.requirements})
+        category_index = {category: index for index, category in enumerate(self.categories)}
+        for requirement in self.requirements:
+            requirement["category_index"] = category_index[requirement["category"]]
+
+        self.user_ids = []
+        self.blocked = []
+        self.wanted = []
+        self.costs = []
+        self.wanted_by_date = [[] for _ in self.dates]
+        self.errors = []
+        for user in users:
+            self._add_user(user)
+
+        # Current solution
+        self.slots = {}
+        self.busy = {}
+        self.load = [0] * len(self.user_ids)
+
+    def _add_user(self, user):
+        user_index = len(self.user_ids)
+        constraints = user.get("constraints") or {}
+        preferences = _preference_pairs(user.get("preferences"))
+
+        self.user_ids.append(user["user_id"])
+        self.blocked.append(self._date_indexes(user["user_id"], constraints.get("bad_days", [])))
+        wanted = self._date_indexes(user["user_id"], constraints.get("good_days", []))
+        self.wanted.append(wanted)
+        for day in wanted:
+            self.wanted_by_date[day].append(user_index)
+        self.costs.append(
+            [_preference_cost(preferences.get(category, "neutral")) for category in self.categories]
+        )
+
+    def _date_indexes(self, user_id, entries):
+        indexes = set()
+        for entry in entries:
+            for text in _entry_dates(entry):
+                try:
+                    days = expand_dates(text)
+                except ValueError:
+                    self.errors.append({"user_id": user_id, "date": text})
+                    continue
+                indexes.update(self.date_index[day] for day in days if day in self.date_index)
+        return indexes
+
+    def _runs_on(self, requirement, day):
+        weekdays = requirement["weekdays"]
+        return weekdays is None or self.dates[day].weekday() in weekdays
+
+    def _cost(self, user, category, day):
+        cost = self.costs[user][category] + LOAD_COST * self.load[user]
+        if day in self.wanted[user]:
+            cost -= GOOD_DAY_BONUS
+        return cost
+
+    def _assign(self, user, day, slot):
+        self.slots.setdefault((day, slot), []).append(user)
+        self.busy[(user, day)] = slot
+        self.load[user] += 1
+
+    def _unassign(self, user, day):
+        slot = self.busy.pop((user, day))
+        self.slots[(day, slot)].remove(user)
+        self.load[user] -= 1
+
+    def _fill(self, days):
+        """Greedily fill the open slots on the given dates.
+
+        Each category keeps a heap of users keyed by their cost without the
+        good-day bonus. Users who asked for the date are merged in directly,
+        so a slot costs O(headcount * log(users)) instead of a full scan.
+        """
+        version = [0] * len(self.user_ids)
+        heaps = []
+        for category in range(len(self.categories)):
+            heap = [
+                (self.costs[user][category] + LOAD_COST * self.load[user], user, 0)
+                for user in range(len(self.user_ids))
+            ]
+            heapq.heapify(heap)
+            heaps.append(heap)
+
+        for day in sorted(days):
+            for slot, requirement in enumerate(self.requirements):
+                if not self._runs_on(requirement, day):
+                    continue
+                missing = requirement["headcount"] - len(self.slots.get((day, slot), []))
+                if missing <= 0:
+                    continue
+
+                category = requirement["category_index"]
+                heap = heaps[category]
+                wanted = sorted(
+                    (self._cost(user, category, day), user)
+                    for user in self.wanted_by_date[day]
+                    if (user, day) not in self.busy and day not in self.blocked[user]
+                )
+                wanted_position = 0
+                skipped = []
+                while missing > 0:
+                    # Drop stale and unavailable entries from the top of the heap
+                    while heap:
+                        _, user, user_version = heap[0]
+                        if user_version != version[user]:
+                            heapq.heappop(heap)
+                        elif (user, day) in self.busy or day in self.blocked[user]:
+                            skipped.append(heapq.heappop(heap))
+                        else:
+                            break
+
+                    if wanted_position < len(wanted) and (
+                        not heap or wanted[wanted_position] < heap[0][:2]
+                    ):
+                        user = wanted[wanted_position][1]
+                        wanted_position += 1
+                        if (user, day) in self.busy:
+                            continue
+                    elif heap:
+                        user = heapq.heappop(heap)[1]
+                    else:
+                        break
+
+                    self._assign(user, day, slot)
+                    version[user] += 1
+                    for other_category, other_heap in enumerate(heaps):
+                        heapq.heappush(
+                            other_heap,
+                            (
+                                self.costs[user][other_category] + LOAD_COST * self.load[user],
+                                user,
+                                version[user],
+                            ),
+                        )
+                    missing -= 1
+
+                for entry in skipped:
+                    heapq.heappush(heap, entry)
+
+    def _improve(self, days, deadline, users=None):
+        """Swap same-day duties between pairs of users while it lowers the cost.
+
+        Swaps never change how many duties a user holds, so they only trade
+        category preferences. For every pair of duties on a date, users are
+        sorted by what they gain from moving to the other duty and the best
+        candidates are paired off, instead of trying every pair of users.
+        When users is given, at least one side of every swap must belong to it.
+        """
+        improved = True
+        while improved and time.monotonic() < deadline:
+            improved = False
+            for day in sorted(days):
+                if time.monotonic() >= deadline:
+                    break
+                for slot_a, requirement_a in enumerate(self.requirements):
+                    category_a = requirement_a["category_index"]
+                    for slot_b, requirement_b in enumerate(self.requirements):
+                        category_b = requirement_b["category_index"]
+                        if category_a == category_b or (users is None and slot_b <= slot_a):
+                            continue
+                        side_a = sorted(
+                            (self.costs[user][category_b] - self.costs[user][category_a], user)
+                            for user in self.slots.get((day, slot_a), [])
+                            if users is None or user in users
+                        )
+                        side_b = sorted(
+                            (self.costs[user][category_a] - self.costs[user][category_b], user)
+                            for user in self.slots.get((day, slot_b), [])
+                        )
+                        for (gain_a, user_a), (gain_b, user_b) in zip(side_a, side_b):
+                            if gain_a + gain_b >= 0:
+                                break
+                            self._unassign(user_a, day)
+                            self._unassign(user_b, day)
+                            self._assign(user_a, day, slot_b)
+                            self._assign(user_b, day, slot_a)
+                            improved = True
+
+    def solve(self, time_budget=5.0):
+        """Assign duties on every date of the horizon.
+
+        Args:
+            time_budget: Seconds the swap phase may run after the greedy fill
+
+        Returns:
+            The solution, see result()
+        """
+        started = time.monotonic()
+        days = range(len(self.dates))
+        self._fill(days)
+        self._improve(days, started + time_budget)
+        return self.result(started)
+
+    def repair(self, previous, affected_user_ids, frozen_until, time_budget=5.0):
+        """Re-optimize the affected users around a previous solution.
+
+        Every previous assignment on or before frozen_until is kept as is,
+        even if it now conflicts with the user's constraints. After it, the
+        assignments of unaffected users are kept as a warm start and only the
+        duties of the affected users are released, refilled and improved.
+
+        Args:
+            previous: The previous assignments, {user_id: {"dd/mm/yyyy": duty_title}}
+            affected_user_ids: The ids of the users whose constraints changed
+            frozen_until: The last date that must not change
+            time_budget: Seconds the swap phase may run after the refill
+
+        Returns:
+            The solution, see result(), with the kept frozen conflicts
+        """
+        started = time.monotonic()
+        user_index = {user_id: index for index, user_id in enumerate(self.user_ids)}
+        slot_index = {requirement["duty_title"]: slot for slot, requirement in enumerate(self.requirements)}
+        affected = {user_index[user_id] for user_id in affected_user_ids if user_id in user_index}
+
+        frozen_conflicts = []
+        for user_id, duties in previous.items():
+            user = user_index.get(user_id)
+            if user is None:
+                continue
+            for date_text, duty_title in duties.items():
+                day = self.date_index.get(parse_date(date_text))
+                slot = slot_index.get(duty_title)
+                if day is None or slot is None:
+                    continue
+                frozen = self.dates[day] <= frozen_until
+                if not frozen and (user in affected or day in self.blocked[user]):
+                    continue
+                if frozen and day in self.blocked[user]:
+                    frozen_conflicts.append({"user_id": user_id, "date": date_text, "duty_title": duty_title})
+                self._assign(user, day, slot)
+
+        open_days = [day for day in range(len(self.dates)) if self.dates[day] > frozen_until]
+        self._fill(open_days)
+        self._improve(open_days, started + time_budget, users=affected)
+
+        result = self.result(started)
+        result["frozen_conflicts"] = frozen_conflicts
+        return result
+
+    def result(self, started):
+        """Build the JSON-serializable solution.
+
+        Returns:
+            A dictionary with:
+                - 'assignments': {user_id: {"dd/mm/yyyy": duty_title}}
+                - 'unfilled': Slots that could not be fully staffed
+                - 'invalid_dates': Constraint dates that could not be parsed
+                - 'stats': Cost and timing of the solution
+        """
+        assignments = {}
+        total_cost = 0
+        for (user, day), slot in sorted(self.busy.items(), key=lambda item: (item[0][1], item[0][0])):
+            requirement = self.requirements[slot]
+            assignments.setdefault(self.user_ids[user], {})[format_date(self.dates[day])] = requirement[
+                "duty_title"
+            ]
+            total_cost += self.costs[user][requirement["category_index"]]
+            if day in self.wanted[user]:
+                total_cost -= GOOD_DAY_BONUS
+
+        unfilled = []
+        for day in range(len(self.dates)):
+            for slot, requirement in enumerate(self.requirements):
+                if not self._runs_on(requirement, day):
+                    continue
+                missing = requirement["headcount"] - len(self.slots.get((day, slot), []))
+                if missing > 0:
+                    unfilled.append(
+                        {
+                            "date": format_date(self.dates[day]),
+                            "duty_title": requirement["duty_title"],
+                            "missing": missing,
+                        }
+                    )
+
+        return {
+            "assignments": assignments,
+            "unfilled": unfilled,
+            "invalid_dates": self.errors,
+            "stats": {
+                "users": len(self.user_ids),
+                "assigned_duties": len(self.busy),
+                "preference_cost": total_cost,
+                "max_load": max(self.load, default=0),
+                "min_load": min(self.load, default=0),
+                "elapsed_seconds": round(time.monotonic() - started, 3),
+            },
+        }
+
+
+def solve_assignments(users, requirements, start_date=None, horizon_days=60, time_budget=5.0):
+    """Assign duty titles per date for every user.
+
+    Args:
+        users: A list of user dictionaries, see DutySolver
+        requirements: A list of duty dictionaries, see DutySolver
+        start_date: The first date to schedule, as "dd/mm/yyyy" or a date,
+            defaults to today
+        horizon_days: The number of days to schedule
+        time_budget: Seconds the solver may spend improving the greedy solution
+
+    Returns:
+        The solution dictionary, see DutySolver.result()
+    """
+    if start_date is None:
+        start_date = date.today()
+    elif isinstance(start_date, str):
+        start_date = parse_date(start_date)
+    solver = DutySolver(users, requirements, start_date, horizon_days)
+    return solver.solve(time_budget)
+
+
+def repair_assignments(
+    users,
+    requirements,
+    previous,
+    affected_user_ids,
+    start_date=None,
+    horizon_days=60,
+    frozen_until=None,
+    time_budget=5.0,
+):
+    """Repair a previous schedule after some users changed their constraints.
+
+    Args:
+        users: A list of user dictionaries with the updated constraints, see DutySolver
+        requirements: A list of duty dictionaries, see DutySolver
+        previous: The previous assignments, {user_id: {"dd/mm/yyyy": duty_title}}
+        affected_user_ids: The ids of the users whose constraints changed
+        start_date: The first date of the schedule, as "dd/mm/yyyy" or a date,
+            defaults to today
+        horizon_days: The number of days in the schedule
+        frozen_until: The last date that must not change, as "dd/mm/yyyy" or a
+            date, defaults to FREEZE_DAYS days from today
+        time_budget: Seconds the solver may spend improving the repaired solution
+
+    Returns:
+        The solution dictionary, see DutySolver.repair(), with a 'changes'
+        list of {"user_id", "date", "before", "after"} entries
+    """
+    if start_date is None:
+        start_date = date.today()
+    elif isinstance(start_date, str):
+        start_date = parse_date(start_date)
+    if frozen_until is None:
+        frozen_until = date.today() + timedelta(days=FREEZE_DAYS - 1)
+    elif isinstance(frozen_until, str):
+        frozen_until = parse_date(frozen_until)
+
+    solver = DutySolver(users, requirements, start_date, horizon_days)
+    result = solver.repair(previous, affected_user_ids, frozen_until, time_budget)
+
+    changes = []
+    for user_id in sorted(set(previous) | set(result["assignments"])):
+        before = previous.get(user_id, {})
+        after = result["assignments"].get(user_id, {})
+        for date_text in sorted(set(before) | set(after), key=parse_date):
+            if before.get(date_text) != after.get(date_text):
+                changes.append(
+                    {
+                        "user_id": user_id,
+                        "date": date_text,
+                        "before": before.get(date_text),
+                        "after": after.get(date_text),
+                    }
+                )
+    result["changes"] = changes
+    return result
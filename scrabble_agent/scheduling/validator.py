@@ -0,0 +1,182 @@
+from datetime import timedelta
+
+import numpy as np
+
+from .dates import WEEKDAYS, expand_dates, format_date, parse_date
+from .solver import GOOD_DAY_BONUS, _entry_dates, _preference_cost, _preference_pairs
+
+
+class ScheduleArrays:
+    """A schedule and its constraints as users x dates x duties arrays.
+
+    Attributes:
+        assigned: bool[users, dates, duties], True where a user holds a duty
+        available: bool[users, dates], False on the user's bad_days
+        wanted: bool[users, dates], True on the user's good_days
+        costs: int[users, duties], the categorizer preference cost of each duty
+        demand: int[dates, duties], the headcount each duty needs per date
+        errors: Entries that could not be placed in the arrays
+    """
+
+    def __init__(self, users, requirements, assignments, start_date, horizon_days):
+        self.dates = [start_date + timedelta(days=offset) for offset in range(horizon_days)]
+        date_index = {day: index for index, day in enumerate(self.dates)}
+        self.user_ids = [user["user_id"] for user in users]
+        user_index = {user_id: index for index, user_id in enumerate(self.user_ids)}
+        self.duty_titles = [requirement["duty_title"] for requirement in requirements]
+        duty_index = {duty_title: index for index, duty_title in enumerate(self.duty_titles)}
+        self.errors = []
+
+        shape = (len(self.user_ids), len(self.dates))
+        self.available = np.ones(shape, dtype=bool)
+        self.wanted = np.zeros(shape, dtype=bool)
+        self.assigned = np.zeros(shape + (len(self.duty_titles),), dtype=bool)
+        self.costs = np.zeros((len(self.user_ids), len(self.duty_titles)), dtype=np.int32)
+        self.demand = np.zeros((len(self.dates), len(self.duty_titles)), dtype=np.int32)
+
+        weekdays = np.array([day.weekday() for day in self.dates])
+        for duty, requirement in enumerate(requirements):
+            runs_on = requirement.get("weekdays")
+            mask = np.isin(weekdays, [WEEKDAYS.index(day.lower()) for day in runs_on]) if runs_on else True
+            self.demand[:, duty] = np.where(mask, int(requirement.get("headcount", 1)), 0)
+
+        for user, user_data in enumerate(users):
+            constraints = user_data.get("constraints") or {}
+            self.available[user, self._date_indexes(user_data, constraints.get("bad_days", []), date_index)] = False
+            self.wanted[user, self._date_indexes(user_data, constraints.get("good_days", []), date_index)] = True
+            preferences = _preference_pairs(user_data.get("preferences"))
+            self.costs[user] = [
+                _preference_cost(preferences.get(requirement.get("category", requirement["duty_title"]), "neutral"))
+                for requirement in requirements
+            ]
+
+        for user_id, duties in assignments.items():
+            for date_text, duty_title in duties.items():
+                user = user_index.get(user_id)
+                try:
+                    day = date_index.get(parse_date(date_text))
+                except ValueError:
+                    day = None
+                duty = duty_index.get(duty_title)
+                if user is None or day is None or duty is None:
+                    self.errors.append(
+                        {"type": "unknown_assignment", "user_id": user_id, "date": date_text, "duty_title": duty_title}
+                    )
+                    continue
+                self.assigned[user, day, duty] = True
+
+    def _date_indexes(self, user_data, entries, date_index):
+        indexes = []
+        for entry in entries:
+            for text in _entry_dates(entry):
+                try:
+                    days = expand_dates(text)
+                except ValueError:
+                    self.errors.append({"type": "invalid_date", "user_id": user_data["user_id"], "date": text})
+                    continue
+                indexes.extend(date_index[day] for day in days if day in date_index)
+        return indexes
+
+
+def check_schedule(arrays):
+    """Check the admin HARD constraints and score the user SOFT constraints.
+
+    Every check runs as one batched array operation over all users and dates.
+
+    HARD constraints:
+        - Every duty has exactly its headcount on every date
+        - No user holds more than one duty per date
+        - No user holds a duty on one of their bad_days
+
+    SOFT constraints, added up into the penalty:
+        - Duties the user dislikes, by their preference cost
+        - good_days the user is not assigned on, GOOD_DAY_BONUS each
+        - The spread between the busiest and the least busy user
+
+    Args:
+        arrays: The ScheduleArrays to check
+
+    Returns:
+        A dictionary with:
+            - 'valid': True if there are no hard violations
+            - 'hard_violations': Every hard violation found
+            - 'soft_penalty': The total soft constraint penalty
+            - 'soft_breakdown': The penalty by soft constraint
+            - 'worst_users': Up to 10 users with the highest penalty
+    """
+    violations = list(arrays.errors)
+
+    staffed = arrays.assigned.sum(axis=0, dtype=np.int32)
+    for day, duty in np.argwhere(staffed != arrays.demand):
+        violations.append(
+            {
+                "type": "understaffed" if staffed[day, duty] < arrays.demand[day, duty] else "overstaffed",
+                "date": format_date(arrays.dates[day]),
+                "duty_title": arrays.duty_titles[duty],
+                "assigned": int(staffed[day, duty]),
+                "required": int(arrays.demand[day, duty]),
+            }
+        )
+
+    duties_per_day = arrays.assigned.sum(axis=2, dtype=np.int32)
+    for user, day in np.argwhere(duties_per_day > 1):
+        violations.append(
+            {
+                "type": "double_booked",
+                "user_id": arrays.user_ids[user],
+                "date": format_date(arrays.dates[day]),
+                "duty_titles": [arrays.duty_titles[duty] for duty in np.flatnonzero(arrays.assigned[user, day])],
+            }
+        )
+
+    working = duties_per_day > 0
+    for user, day in np.argwhere(working & ~arrays.available):
+        violations.append(
+            {
+                "type": "bad_day",
+                "user_id": arrays.user_ids[user],
+                "date": format_date(arrays.dates[day]),
+                "duty_title": arrays.duty_titles[int(arrays.assigned[user, day].argmax())],
+            }
+        )
+
+    duty_penalty = np.einsum("udk,uk->u", arrays.assigned, np.maximum(arrays.costs, 0))
+    missed_good_days = (arrays.wanted & ~working).sum(axis=1) * GOOD_DAY_BONUS
+    user_penalty = duty_penalty + missed_good_days
+    load = working.sum(axis=1)
+    load_spread = int(load.max() - load.min()) if load.size else 0
+
+    worst = np.argsort(-user_penalty, kind="stable")[:10]
+    return {
+        "valid": not violations,
+        "hard_violations": violations,
+        "soft_penalty": int(user_penalty.sum()) + load_spread,
+        "soft_breakdown": {
+            "disliked_duties": int(duty_penalty.sum()),
+            "missed_good_days": int(missed_good_days.sum()),
+            "load_spread": load_spread,
+        },
+        "worst_users": [
+            {"user_id": arrays.user_ids[user], "penalty": int(user_penalty[user])}
+            for user in worst
+            if user_penalty[user] > 0
+        ],
+    }
+
+
+def validate_assignments(users, requirements, assignments, start_date, horizon_days=60):
+    """Validate assignments against the users' constraints and the duty requirements.
+
+    Args:
+        users: A list of user dictionaries, see DutySolver
+        requirements: A list of duty dictionaries, see DutySolver
+        assignments: The assignments, {user_id: {"dd/mm/yyyy": duty_title}}
+        start_date: The first date of the schedule, as "dd/mm/yyyy" or a date
+        horizon_days: The number of days in the schedule
+
+    Returns:
+        The report, see check_schedule()
+    """
+    if isinstance(start_date, str):
+        start_date = parse_date(start_date)
+    return check_schedule(ScheduleArrays(users, requirements, assignments, start_date, horizon_days))
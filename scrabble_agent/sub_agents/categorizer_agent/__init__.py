@@ -1,3 +1,12 @@
-from .agent import categorizer_agent
+from . import info
 
-__all__ = ["categorizer_agent"]
+__all__ = ["info", "categorizer_agent"]
+
+
+def __getattr__(name):
+    # The agent is built on first use, importing the package only reads its info
+    if name == "categorizer_agent":
+        from .agent import categorizer_agent
+
+        return categorizer_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,60 +1,71 @@
+import json
+
 from google.adk.agents import Agent
+from google.adk.agents.callback_context import CallbackContext
+from google.genai import types
+
+from ...model_backend import agent_model
+from ...tools import save_categorizer_output_callback, save_preferences
+from .classifier import chatbot_output_other, classifier
+from .info import DESCRIPTION, NAME
+
+
+async def categorize_fast_path_callback(callback_context: CallbackContext):
+    """
+    Categorizes the "other" constraints in state['chatbot_output_schema'] with the local classifier.
+    If every constraint was categorized confidently, answers with the category/preference pairs
+    and saves them to state['categorizer_output'] and the Database without calling the LLM.
+    Otherwise saves the partial result to state['categorizer_prefill'] for the LLM to complete.
+    """
+    result = classifier.categorize(chatbot_output_other(callback_context.state.get("chatbot_output_schema")))
+
+    # Update the categorizer state via assignment
+    callback_context.state["categorizer_prefill"] = result
+    if result["unresolved"]:
+        return None
+
+    callback_context.state["categorizer_output"] = result["preferences"]
+    # The answer ends the agent's run, so the after agent callback does not save it
+    await save_preferences(callback_context.state.get("user_id"), result["preferences"])
+    return types.Content(role="model", parts=[types.Part(text=json.dumps(result["preferences"]))])
 
-# Create the policy agent
+
+# Create the categorizer agent
 categorizer_agent = Agent(
-    name="categorizer_agent",
-    model="gemini-2.0-flash",
-    description="Policy agent for the AI Developer Accelerator community",
+    name=NAME,
+    model=agent_model("categorizer_agent"),
+    description=DESCRIPTION,
     instruction="""
-    You are the policy agent for the AI Developer Accelerator community. Your role is to help users
-    understand our community guidelines and policies.
+    You are the categorizer agent of ScrabbleAI. Your role is to map the user's free-text constraints
+    onto the duty categories, with the user's preference for every category.
 
     <user_info>
     Name: {user_name}
     </user_info>
 
-    Community Guidelines:
-    1. Promotions
-       - No self-promotion or advertising
-       - Focus on learning and growing together
-       - Share your work only in designated channels
-
-    2. Content Quality
-       - Provide detailed, helpful responses
-       - Include code examples when relevant
-       - Use proper formatting for code snippets
-
-    3. Behavior
-       - Be respectful and professional
-       - No politics or religion discussions
-       - Help maintain a positive learning environment
-
-    Course Policies:
-    1. Refund Policy
-       - 30-day money-back guarantee
-       - Full refund if you complete the course and aren't satisfied
-       - No questions asked
-
-    2. Course Access
-       - Lifetime access to course content
-       - 6 weeks of group support included
-       - Weekly coaching calls every Sunday
-
-    3. Code Usage
-       - You can use course code in your projects
-       - Credit not required but appreciated
-       - No reselling of course materials
-
-    Privacy Policy:
-    - We respect your privacy
-    - Your data is never sold
-    - Course progress is tracked for support purposes
-
-    When responding:
-    1. Be clear and direct
-    2. Quote relevant policy sections
-    3. Explain the reasoning behind policies
-    4. Direct complex issues to support
+    The duty categories are: """
+    + ", ".join(classifier.categories)
+    + """.
+    The preferences are: "prefer", "like", "neutral", "dislike" and "avoid".
+    Use "avoid" only when the user has a strong reason, such as a health issue, and "dislike" otherwise.
+
+    Most constraints were already categorized, only categorize the unresolved ones:
+    <categorizer_prefill>
+    {categorizer_prefill}
+    </categorizer_prefill>
+
+    When categorizing:
+    1. Map every unresolved constraint to the categories it is about, a constraint may be about several categories.
+    2. Skip constraints that are not about any of the categories, such as the time of day the user prefers.
+    3. Keep every pair from "preferences" as it is.
+
+    IMPORTANT: Your final response must be a valid JSON list, with the pairs from "preferences" and your pairs:
+    [{"category": "cleaning", "preference": "avoid"}, ...]
+
+    DO NOT include any additional text or explanations in your response, just the JSON list.
     """,
+    output_key="categorizer_output",
+    before_agent_callback=categorize_fast_path_callback,
+    after_agent_callback=save_categorizer_output_callback,
     tools=[],
 )
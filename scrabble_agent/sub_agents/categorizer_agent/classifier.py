@@ -0,0 +1,222 @@
+import json
+import os
+import re
+
+# The duty category table with the keywords and synonyms of every category,
+# extended from the JSON file in DUTY_CATEGORIES_PATH ({"category": ["synonym", ...]})
+DUTY_CATEGORIES = {
+    "cleaning": ["cleaning", "clean", "cleaner", "mop", "sweep", "vacuum", "dust", "scrub", "wash", "dishes",
+                 "toilets", "bathrooms", "trash", "garbage", "janitor", "cleaning materials", "detergent"],
+    "maintenance": ["maintenance", "repair", "fix", "fixing things", "plumbing", "electrical", "painting",
+                    "tools", "handyman", "technician", "mechanic", "gardening", "lawn"],
+    "guarding": ["guarding", "guard", "guard duty", "security", "watch", "night watch", "sentry", "gate",
+                 "checkpoint", "standing post", "patrol", "lookout"],
+    "escorting": ["escorting", "escort", "accompany", "accompanying", "chaperone", "visitors", "guests", "tour"],
+    "kitchen": ["kitchen", "cooking", "cook", "chef", "food", "meals", "serving food", "dining hall", "bakery"],
+    "driving": ["driving", "drive", "driver", "vehicle", "car", "truck", "van", "shuttle", "transport",
+                "delivery", "deliveries"],
+    "office": ["office", "paperwork", "admin work", "reception", "phones", "computer", "filing", "desk"],
+}
+
+# Phrases that tell how the user feels about a category, checked longest first
+PREFERENCE_CUES = {
+    "avoid": ["allergic", "allergy", "can't", "cannot", "can not", "unable", "not able", "not allowed", "injury",
+              "injured", "medical", "avoid", "never", "hate", "afraid", "fear", "phobia", "not for me",
+              "must not", "forbidden", "no way"],
+    "dislike": ["don't like", "do not like", "dislike", "rather not", "not fond", "prefer not", "not a fan",
+                "don't want", "do not want", "don't enjoy", "do not enjoy", "less", "not keen", "tired of"],
+    "prefer": ["prefer", "love", "enjoy", "favorite", "favourite", "happy to", "want", "would like",
+               "good at", "best at", "passionate", "experience in", "experienced", "more"],
+    "like": ["like", "fine with", "ok with", "okay with", "don't mind", "do not mind", "willing", "can do", "sure"],
+}
+
+# Negation and exception phrases that may turn a cue around, "fine with anything except cleaning"
+REVERSAL_CUES = ["except", "excepting", "apart from", "other than", "besides", "but not", "anything but",
+                 "everything but", "rather than", "instead of", "no problem with", "unless", "without"]
+
+# A category is left to the LLM when a reversal cue ends at most this many words before it
+REVERSAL_WINDOW = 3
+
+# Local results below this confidence go to the LLM
+CATEGORIZER_CONFIDENCE = float(os.getenv("CATEGORIZER_CONFIDENCE", "0.6"))
+
+# Weight of a matched n-gram by its length, phrases are stronger evidence than single words
+NGRAM_WEIGHTS = {1: 1.0, 2: 2.0, 3: 3.0}
+
+_CLAUSE_SPLIT = re.compile(r"[,;.!?]|\bbut\b|\bwhile\b|\bwhereas\b|\bhowever\b|\balthough\b")
+_WORD = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+
+def lemma(word):
+    """Reduce a word to a lemma-like stem, so "cleaning", "cleans" and "clean" match.
+
+    Both the table and the constraints go through the same rules, so the
+    stems only need to be consistent, not dictionary words.
+    """
+    for suffix, replacement in (("ies", "y"), ("ied", "y"), ("ing", ""), ("ed", ""), ("es", ""), ("s", "")):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not word.endswith("ss"):
+            word = word[: len(word) - len(suffix)] + replacement
+            break
+    if word.endswith("e") and len(word) > 3:
+        word = word[:-1]
+    # Doubled final consonants, "mopping" -> "mopp" -> "mop"
+    if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "aeiousl":
+        word = word[:-1]
+    return word
+
+
+def lemmas(text):
+    return [lemma(word) for word in _WORD.findall(text.lower().replace("’", "'"))]
+
+
+def _ngrams(words, max_n):
+    for n in range(1, max_n + 1):
+        for i in range(len(words) - n + 1):
+            yield tuple(words[i : i + n])
+
+
+class ConstraintClassifier:
+    """Maps free-text constraints onto the duty categories and a preference.
+
+    An inverted index maps every lemmatized keyword n-gram to the categories
+    it belongs to. A clause scores every category by the weights of the
+    n-grams it contains, and the confidence is the winning category's share
+    of the evidence. The preference is the longest cue phrase in the clause,
+    or in the whole constraint when it names a single category. A category
+    shortly after a negation or exception cue gets no confidence, the cue
+    may reverse the preference.
+    """
+
+    def __init__(self, categories=None, cues=None, reversal_cues=None):
+        self.categories = categories or _load_categories()
+        self._index = {}
+        for category, keywords in self.categories.items():
+            for keyword in [category, *keywords]:
+                self._index.setdefault(tuple(lemmas(keyword)), set()).add(category)
+        self._cues = sorted(
+            ((tuple(lemmas(cue)), preference) for preference, phrases in (cues or PREFERENCE_CUES).items()
+             for cue in phrases),
+            key=lambda cue: -len(cue[0]),
+        )
+        self._reversal_cues = [tuple(lemmas(cue)) for cue in (reversal_cues or REVERSAL_CUES)]
+        self._max_n = max(len(key) for key in self._index)
+
+    def _score(self, words):
+        scores = {}
+        for ngram in _ngrams(words, self._max_n):
+            for category in self._index.get(ngram, ()):
+                scores[category] = scores.get(category, 0.0) + NGRAM_WEIGHTS.get(len(ngram), 3.0)
+        return scores
+
+    def _preference(self, words):
+        text = f" {' '.join(words)} "
+        for cue, preference in self._cues:
+            if f" {' '.join(cue)} " in text:
+                return preference
+        return None
+
+    def _reversed(self, words, category):
+        """Whether a reversal cue ends within REVERSAL_WINDOW words before a keyword of the category."""
+        cue_ends = [
+            i + len(cue)
+            for cue in self._reversal_cues
+            for i in range(len(words) - len(cue) + 1)
+            if tuple(words[i : i + len(cue)]) == cue
+        ]
+        if not cue_ends:
+            return False
+        for n in range(1, self._max_n + 1):
+            for i in range(len(words) - n + 1):
+                if category in self._index.get(tuple(words[i : i + n]), ()):
+                    if any(0 <= i - end <= REVERSAL_WINDOW for end in cue_ends):
+                        return True
+        return False
+
+    def classify(self, constraint):
+        """Classify one free-text constraint.
+
+        Returns:
+            A list with a {"category", "preference", "confidence"} dictionary for every
+            category the constraint mentions, empty if it mentions none
+        """
+        all_words = lemmas(constraint)
+        clauses = [lemmas(clause) for clause in _CLAUSE_SPLIT.split(constraint.lower())]
+        found = []
+        for words in clauses:
+            scores = self._score(words)
+            if not scores:
+                continue
+            category = max(scores, key=scores.get)
+            found.append((category, scores[category] / (sum(scores.values()) + 0.5), words))
+
+        results = {}
+        for category, confidence, words in found:
+            preference = self._preference(words)
+            if preference is None and len({category for category, _, _ in found}) == 1:
+                preference = self._preference(all_words)
+            if preference is None:
+                preference, confidence = "neutral", 0.0
+            elif self._reversed(all_words, category):
+                confidence = 0.0
+            current = results.get(category)
+            if current is None or confidence > current["confidence"]:
+                results[category] = {"category": category, "preference": preference, "confidence": round(confidence, 3)}
+        return list(results.values())
+
+    def categorize(self, constraints, threshold=CATEGORIZER_CONFIDENCE):
+        """Classify a user's "other" constraints.
+
+        Returns:
+            A dictionary with:
+                - 'preferences': The confident category/preference pairs
+                - 'unresolved': The constraints that need the LLM to categorize
+        """
+        preferences = {}
+        unresolved = []
+        for constraint in constraints or []:
+            results = self.classify(constraint)
+            if not results or any(result["confidence"] < threshold for result in results):
+                unresolved.append(constraint)
+                continue
+            for result in results:
+                preferences[result["category"]] = result["preference"]
+        return {
+            "preferences": [{"category": category, "preference": preference} for category, preference in preferences.items()],
+            "unresolved": unresolved,
+        }
+
+    def categorize_batch(self, outputs, threshold=CATEGORIZER_CONFIDENCE):
+        """Categorize the chatbot outputs of many users, by user id.
+
+        Args:
+            outputs: A dictionary of user id to chatbot_output_schema
+        """
+        return {
+            user_id: self.categorize(chatbot_output_other(output), threshold)
+            for user_id, output in outputs.items()
+        }
+
+
+def chatbot_output_other(output):
+    """The "other" constraints of a chatbot_output_schema, given as a dictionary or JSON text."""
+    if isinstance(output, str):
+        try:
+            output = json.loads(output)
+        except json.JSONDecodeError:
+            return []
+    if not isinstance(output, dict):
+        return []
+    return [item for item in output.get("other") or [] if isinstance(item, str)]
+
+
+def _load_categories():
+    categories = {category: list(keywords) for category, keywords in DUTY_CATEGORIES.items()}
+    path = os.getenv("DUTY_CATEGORIES_PATH")
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as categories_file:
+            for category, keywords in json.load(categories_file).items():
+                categories.setdefault(category, []).extend(keywords)
+    return categories
+
+
+classifier = ConstraintClassifier()
@@ -0,0 +1,3 @@
+# The agent's name and description, read by the root agent without building the agent
+NAME = "categorizer_agent"
+DESCRIPTION = "Categorizes the user's constraints into the duty categories"
@@ -1,3 +1,12 @@
-from .agent import chatbot_agent
+from . import info
 
-__all__ = ["chatbot_agent"]
+__all__ = ["info", "chatbot_agent"]
+
+
+def __getattr__(name):
+    # The agent is built on first use, importing the package only reads its info
+    if name == "chatbot_agent":
+        from .agent import chatbot_agent
+
+        return chatbot_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,7 +1,14 @@
+import json
 from datetime import datetime
 from pydantic import BaseModel, Field
 from google.adk.agents import Agent
-from google.adk.tools import google_search
+from google.adk.agents.callback_context import CallbackContext
+
+from ...model_backend import agent_model
+from ...output_repair import StructuredOutput
+from ...scheduling.dates import check_date_entry
+from ...tools import save_constraints
+from .info import DESCRIPTION, NAME
 
 def get_current_time() -> dict:
     """Get the current time in the format YYYY-MM-DD HH:MM:SS"""
@@ -9,12 +16,34 @@ def get_current_time() -> dict:
         "current_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
     }
 
+def validate_dates_tool(dates: list[str], weekday: str) -> dict:
+    """
+    Validates and normalizes the dates given by the user, with one result per entry.
+    Catches impossible dates such as 31/02/2025, and checks that the dates fall on the
+    day of the week the user mentioned.
+
+    Args:
+        dates: The dates as given by the user, in "dd/mm/yyyy", "dd/mm/yyyy - dd/mm/yyyy"
+            or "dd-dd/mm/yyyy" format, e.g. ["01/06/2025", "04-10/06/2026"], ranges are returned
+            as "dd/mm/yyyy - dd/mm/yyyy"
+        weekday: The day of the week the user said the dates fall on, e.g. "sunday",
+            empty if the user did not mention one
+    """
+    results = [check_date_entry(entry, weekday or None) for entry in dates]
+    return {
+        "status": "success" if all(result["valid"] for result in results) else "error",
+        # In the order of the entries, so every date stays with its reason
+        "results": [
+            {key: value for key, value in result.items() if key != "dates"} for result in results
+        ],
+    }
+
 # TODO: add `search_online` tool
 
 
 # ---- Define Output Schema ----
 class DayOff(BaseModel):
-   date: str = Field(description="The date the user does not want to work on, in dd/mm/yyyy or range format")
+   date: str = Field(description="The date the user does not want to work on, in dd/mm/yyyy or dd/mm/yyyy - dd/mm/yyyy format")
    reason: str = Field(description="The reason the user can't work on that date")
 
 class Chatbot__Output_Schema(BaseModel):
@@ -23,11 +52,78 @@ class Chatbot__Output_Schema(BaseModel):
    bad_days: list[DayOff] = Field(description="A list of DayOff entries with date and reason why not.")
    other: list[str] = Field(description="A list of other constraints or preferences the user has if it is not in a format of a date, such as 'I prefer to work in the morning' or 'I am allergic to cleaning materials'.")
 
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def coerce_chatbot_output(data, state):
+    """
+    Maps the shapes the model tends to answer with onto Chatbot__Output_Schema.
+    bad_days entries given as {"02/06/2025": "sick day"} or "02/06/2025: sick day" become DayOff entries,
+    single values become lists, and a missing fullname is taken from state['user_name'].
+    Nothing is made up, a value that is still wrong fails the schema validation.
+    """
+    data = dict(data)
+    if not data.get("fullname"):
+        data["fullname"] = state.get("user_name", "")
+
+    good_days = []
+    for entry in _as_list(data.get("good_days")):
+        if isinstance(entry, dict):
+            good_days.extend(str(day) for day in entry)
+        else:
+            good_days.append(str(entry))
+    data["good_days"] = good_days
+
+    # An entry without a reason is left without one, so it fails validation and the model is asked again
+    bad_days = []
+    for entry in _as_list(data.get("bad_days")):
+        if isinstance(entry, dict) and "date" in entry:
+            bad_days.append(entry)
+        elif isinstance(entry, dict):
+            bad_days.extend({"date": day, "reason": reason} for day, reason in entry.items())
+        elif isinstance(entry, str) and ":" in entry:
+            day, _, reason = entry.partition(":")
+            bad_days.append({"date": day.strip(), "reason": reason.strip()})
+        else:
+            bad_days.append({"date": entry})
+    data["bad_days"] = bad_days
+
+    data["other"] = [str(item) for item in _as_list(data.get("other"))]
+    return data
+
+
+# Repairs the chatbot's JSON locally, the model is asked again only when that fails
+chatbot_output = StructuredOutput(Chatbot__Output_Schema, coerce_chatbot_output)
+
+
+async def save_chatbot_output_callback(callback_context: CallbackContext):
+    """
+    Saves the constraints in state['chatbot_output_schema'] to the Database after the chatbot agent runs.
+    Only a reply valid against Chatbot__Output_Schema is saved, after a question or small talk the
+    last valid constraints stay in the Database and in state['saved_chatbot_output'].
+    """
+    state = callback_context.state
+    output = state.get("chatbot_output_schema")
+    if not output:
+        return None
+    try:
+        constraints, _ = chatbot_output.validate(output if isinstance(output, str) else json.dumps(output), state)
+    except ValueError:
+        return None
+    if constraints != state.get("saved_chatbot_output"):
+        await save_constraints(state.get("user_id"), constraints)
+        state["saved_chatbot_output"] = constraints
+    return None
+
 # ---- Define the Agent ----
 chatbot_agent = Agent(
-    name="chatbot_agent",
-    model="gemini-2.0-flash", # https://cloud.google.com/vertex-ai/generative-ai/docs/models/gemini/2-0-flash
-    description="Receive initial constraints from the users about work shifts",
+    name=NAME,
+    model=agent_model("chatbot_agent"),
+    description=DESCRIPTION,
     instruction="""
         You are chatbot_agent, an assistant that helps the user to provide work shifts for different kind of duties who can take place at any time and anywhere.
         You task is to ask the user for constraints or preferences about his job duties, and summarize the entire conversation you had with him as sentences representing each date given and its constrain or preference.
@@ -57,11 +153,11 @@ chatbot_agent = Agent(
         - When you chat with the user, answer in a concise manner.
         - Answer to the user with his name, given by user_name, for example: "Hello John Doe, how can I help you today?".
         - Be aware of the current date and time, you can use the get_current_time tool to get the current date and time.
-        - You have access to an online search tool, using google_search, for extra information
         
         MORE GUIDELINES:
-        - Always check the date given and the day of the week is valid, for example: if the user says he wants to work on 31/02/2025, you will tell him that this date is not valid since February has only 28 days in 2025, and you will ask him to provide a valid date. or if he wants to work on Sunday at the 06/06/2025, you will tell him that this date is not on suday, to make sure what date he intended. always check if the dates correspond to that day of week the user meant if he mentions a specific day of the week, you can use the google_search tool for this task.
+        - Always check the date given and the day of the week is valid, for example: if the user says he wants to work on 31/02/2025, you will tell him that this date is not valid since February has only 28 days in 2025, and you will ask him to provide a valid date. or if he wants to work on Sunday at the 06/06/2025, you will tell him that this date is not on suday, to make sure what date he intended. always check if the dates correspond to that day of week the user meant if he mentions a specific day of the week, use the validate_dates_tool for this task.
         - Keep the dates in the format of "dd/mm/yyyy" and if the user mentions a range of dates, you will keep it as "dd/mm/yyyy - dd/mm/yyyy".
+        - Use the "normalized" date of every entry returned by the validate_dates_tool in the good_days and bad_days, it is already in the correct format. Each result belongs to the entry at the same position, so every date keeps its reason.
         - Keep the reasons in a short and concise manner, for example: "sick day", "wedding for my brother", "family vacation", etc.
         - Do not include any personal information about the user in the output, such as their email, phone number, or any other sensitive data.
         - Do not include any information that is not related to the user's work shifts or preferences. be strict and concise.
@@ -70,14 +166,17 @@ chatbot_agent = Agent(
         IMPORTANT: Your final response must be a valid JSON object that matches this structure:
         {
         "fullname": "The full name of the user, with capitalized first letters", e.g. "John Doe", taken from user_name,
-        "good_days": List of days the user wants to work on, e.g ["01/06/2025", "04-10/06/2026", ...],
-        "bad_days": List of dictionary values of days the user does not want to work on, e.g [{"02/06/2025":"sick day"}, {"15-17/06/2026":"wedding for my brother"}, ...],
+        "good_days": List of days the user wants to work on, e.g ["01/06/2025", "04/06/2026 - 10/06/2026", ...],
+        "bad_days": List of the days the user does not want to work on with the reason, e.g [{"date": "02/06/2025", "reason": "sick day"}, {"date": "15/06/2026 - 17/06/2026", "reason": "wedding for my brother"}, ...],
         "other": List of other constraints or preferences the user has if it is not in a format of a date,
         }
         
         DO NOT include any additional text or explanations in your response, just the JSON object.
     """,
-    output_schema=Chatbot__Output_Schema,
+    # ADK rejects output_schema with tools, chatbot_output validates the final response against the schema instead
     output_key="chatbot_output_schema",
-    tools=[get_current_time, google_search],
+    tools=[get_current_time, validate_dates_tool],
+    after_agent_callback=save_chatbot_output_callback,
 )
+
+chatbot_output.attach(chatbot_agent)
@@ -0,0 +1,3 @@
+# The agent's name and description, read by the root agent without building the agent
+NAME = "chatbot_agent"
+DESCRIPTION = "Receive initial constraints from the users about work shifts"
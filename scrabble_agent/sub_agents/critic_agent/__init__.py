@@ -1,3 +1,12 @@
-from .agent import critic_agent
+from . import info
 
-__all__ = ["critic_agent"]
+__all__ = ["info", "critic_agent"]
+
+
+def __getattr__(name):
+    # The agent is built on first use, importing the package only reads its info
+    if name == "critic_agent":
+        from .agent import critic_agent
+
+        return critic_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,112 +1,94 @@
-from datetime import datetime
+import asyncio
 
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
 
+from ...model_backend import agent_model
+from ...scheduling import validate_assignments
+from ...tools import DUTY_HORIZON_KEY, load_assignments, load_duty_requirements, load_roster, user_constraints_tool
+from .info import DESCRIPTION, NAME
 
-def purchase_course(tool_context: ToolContext) -> dict:
-    """
-    Simulates purchasing the AI Marketing Platform course.
-    Updates state with purchase information.
-    """
-    course_id = "ai_marketing_platform"
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    # Get current purchased courses
-    current_purchased_courses = tool_context.state.get("purchased_courses", [])
-
-    # Check if user already owns the course
-    course_ids = [
-        course["id"] for course in current_purchased_courses if isinstance(course, dict)
-    ]
-    if course_id in course_ids:
-        return {"status": "error", "message": "You already own this course!"}
-
-    # Create new list with the course added
-    new_purchased_courses = []
-    # Only include valid dictionary courses
-    for course in current_purchased_courses:
-        if isinstance(course, dict) and "id" in course:
-            new_purchased_courses.append(course)
-
-    # Add the new course as a dictionary with id and purchase_date
-    new_purchased_courses.append({"id": course_id, "purchase_date": current_time})
-
-    # Update purchased courses in state via assignment
-    tool_context.state["purchased_courses"] = new_purchased_courses
+# Maximum number of hard violations returned to the model and kept in state
+MAX_REPORTED_VIOLATIONS = 50
 
-    # Get current interaction history
-    current_interaction_history = tool_context.state.get("interaction_history", [])
 
-    # Create new interaction history with purchase added
-    new_interaction_history = current_interaction_history.copy()
-    new_interaction_history.append(
-        {"action": "purchase_course", "course_id": course_id, "timestamp": current_time}
+async def check_assignments_tool(tool_context: ToolContext) -> dict:
+    """
+    Checks the manager's assignments saved in the Database against the admin's
+    HARD constraints and the users' SOFT constraints. Only the system admin may ask for this.
+    Saves the summary of the report to state['critic_report'].
+    """
+    if tool_context.state.get("user_role") != "system_admin":
+        return {"status": "error", "message": "Only a system_admin can check the assigned duties."}
+    assignments = await load_assignments()
+    horizon = tool_context.state.get(DUTY_HORIZON_KEY)
+    if not assignments or not horizon:
+        return {
+            "status": "error",
+            "message": "There are no assigned duties to check, the Manager Agent must assign them first.",
+        }
+
+    report = await asyncio.to_thread(
+        validate_assignments,
+        await load_roster(),
+        load_duty_requirements(),
+        assignments,
+        horizon["start_date"],
+        horizon["horizon_days"],
     )
 
-    # Update interaction history in state via assignment
-    tool_context.state["interaction_history"] = new_interaction_history
-
-    return {
-        "status": "success",
-        "message": "Successfully purchased the AI Marketing Platform course!",
-        "course_id": course_id,
-        "timestamp": current_time,
+    violation_counts = {}
+    for violation in report["hard_violations"]:
+        violation_counts[violation["type"]] = violation_counts.get(violation["type"], 0) + 1
+    summary = {
+        "valid": report["valid"],
+        "hard_violation_counts": violation_counts,
+        "hard_violations": report["hard_violations"][:MAX_REPORTED_VIOLATIONS],
+        "soft_penalty": report["soft_penalty"],
+        "soft_breakdown": report["soft_breakdown"],
+        "worst_users": report["worst_users"],
     }
 
+    # The state is saved with the session every turn, so it keeps the summary rather than every violation
+    tool_context.state["critic_report"] = summary
+    return {"status": "success", **summary}
+
 
-# Create the sales agent
+# Create the critic agent
 critic_agent = Agent(
-    name="manager_agent",
-    model="gemini-2.0-flash",
-    description="Sales agent for the AI Marketing Platform course",
+    name=NAME,
+    model=agent_model("critic_agent"),
+    description=DESCRIPTION,
     instruction="""
-    You are a sales agent for the AI Developer Accelerator community, specifically handling sales
-    for the Fullstack AI Marketing Platform course.
+    You are the critic agent of ScrabbleAI. Your role is to review the duties assigned by the Manager Agent
+    before they are approved.
 
     <user_info>
     Name: {user_name}
+    Role: {user_role}
     </user_info>
 
-    <purchase_info>
-    Purchased Courses: {purchased_courses}
-    </purchase_info>
-
     <interaction_history>
     {interaction_history}
     </interaction_history>
 
-    Course Details:
-    - Name: Fullstack AI Marketing Platform
-    - Price: $149
-    - Value Proposition: Learn to build AI-powered marketing automation apps
-    - Includes: 6 weeks of group support with weekly coaching calls
-
-    When interacting with users:
-    1. Check if they already own the course (check purchased_courses above)
-       - Course information is stored as objects with "id" and "purchase_date" properties
-       - The course id is "ai_marketing_platform"
-    2. If they own it:
-       - Remind them they have access
-       - Ask if they need help with any specific part
-       - Direct them to course support for content questions
-    
-    3. If they don't own it:
-       - Explain the course value proposition
-       - Mention the price ($149)
-       - If they want to purchase:
-           - Use the purchase_course tool
-           - Confirm the purchase
-           - Ask if they'd like to start learning right away
-
-    4. After any interaction:
-       - The state will automatically track the interaction
-       - Be ready to hand off to course support after purchase
+    When reviewing assignments:
+    1. Use the check_assignments_tool to check the assignments, never check them yourself.
+    2. The admin's constraints are HARD constraints:
+       - Every duty must have exactly the number of users it needs on every date.
+       - No user may hold more than one duty per date.
+       - No user may hold a duty on one of their bad days.
+       - If there are any hard violations, the assignments are not valid, loop back to the Manager Agent for a fix
+         and list the violations it must fix.
+    3. The users' preferences are SOFT constraints:
+       - Report the soft penalty and its breakdown.
+       - Mention the users with the highest penalty, so the admin can review them.
+    4. If there are no hard violations, approve the assignments.
+    5. To explain a user's penalty, use the user_constraints_tool to fetch the constraints the user gave.
 
     Remember:
-    - Be helpful but not pushy
-    - Focus on the value and practical skills they'll gain
-    - Emphasize the hands-on nature of building a real AI application
+    - Be concise and clear.
+    - The summary of the report is saved in state['critic_report'].
     """,
-    tools=[purchase_course],
+    tools=[check_assignments_tool, user_constraints_tool],
 )
@@ -0,0 +1,3 @@
+# The agent's name and description, read by the root agent without building the agent
+NAME = "critic_agent"
+DESCRIPTION = "Reviews the Manager Agent's assignments against the admin's and the users' constraints"
@@ -1,3 +1,12 @@
-from .agent import judge_agent
+from . import info
 
-__all__ = ["judge_agent"]
+__all__ = ["info", "judge_agent"]
+
+
+def __getattr__(name):
+    # The agent is built on first use, importing the package only reads its info
+    if name == "judge_agent":
+        from .agent import judge_agent
+
+        return judge_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,143 +1,41 @@
 from google.adk.agents import Agent
 
-# Create the course support agent
+from ...model_backend import agent_model
+from ...tools import user_constraints_tool, user_duties_tool
+from .info import DESCRIPTION, NAME
+
+# Create the judge agent
 judge_agent = Agent(
-    name="judge_agent",
-    model="gemini-2.0-flash",
-    description="Course support agent for the AI Marketing Platform course",
+    name=NAME,
+    model=agent_model("judge_agent"),
+    description=DESCRIPTION,
     instruction="""
-    You are the course support agent for the Fullstack AI Marketing Platform course.
-    Your role is to help users with questions about course content and sections.
+    You are the judge agent of ScrabbleAI. Your role is to make sure the user is satisfied with his assigned duties,
+    and that they meet the preferences and constraints he gave before.
 
     <user_info>
     Name: {user_name}
+    Role: {user_role}
     </user_info>
 
-    <purchase_info>
-    Purchased Courses: {purchased_courses}
-    </purchase_info>
-
-    Before helping:
-    - Check if the user owns the AI Marketing Platform course
-    - Course information is stored as objects with "id" and "purchase_date" properties
-    - Look for a course with id "ai_marketing_platform" in the purchased courses
-    - Only provide detailed help if they own the course
-    - If they don't own the course, direct them to the sales agent
-    - If they do own the course, you can mention when they purchased it (from the purchase_date property)
-
-    Course Sections:
-    1. Introduction
-       - Course Overview
-       - Tech Stack Introduction
-       - Project Goals
-
-    2. Problem, Solution, & Technical Design
-       - Market Analysis
-       - Architecture Overview
-       - Tech Stack Selection
-
-    3. Models & Views - How To Think
-       - Data Modeling
-       - View Structure
-       - Component Design
-
-    4. Setup Environment
-       - Development Tools
-       - Configuration
-       - Dependencies
-
-    5. Create Projects
-       - Project Structure
-       - Initial Setup
-       - Basic Configuration
-
-    6. Software Deployment Tools
-       - Deployment Options
-       - CI/CD Setup
-       - Monitoring
-
-    7. NextJS Crash Course
-       - Fundamentals
-       - Routing
-       - API Routes
-
-    8. Stub Out NextJS App
-       - Create app directory structure
-       - Setup initial layouts
-       - Configure NextJS routing
-       - Create placeholder components
-
-    9. Create Responsive Sidebar
-       - Design mobile-friendly sidebar
-       - Implement sidebar navigation
-       - Add responsive breakpoints
-       - Create menu toggling behavior
-
-    10. Setup Auth with Clerk
-       - Integrate Clerk authentication
-       - Create login/signup flows
-       - Configure protected routes
-       - Setup user session management
-
-    11. Setup Postgres Database & Blob Storage
-       - Configure database connections
-       - Create schema and migrations
-       - Setup file/image storage
-       - Implement data access patterns
-
-    12. Projects Build Out (List & Detail)
-       - Create projects listing page
-       - Implement project detail views
-       - Add CRUD operations for projects
-       - Create data fetching hooks
-
-    13. Asset Processing NextJS
-       - Client-side image optimization
-       - Asset loading strategies
-       - Implementing CDN integration
-       - Frontend caching mechanisms
-
-    14. Asset Processing Server
-       - Server-side image manipulation
-       - Batch processing workflows
-       - Compression and optimization
-       - Storage management solutions
-
-    15. Prompt Management
-       - Create prompt templates
-       - Build prompt versioning system
-       - Implement prompt testing tools
-       - Design prompt chaining capabilities
-
-    16. Fully Build Template (List & Detail)
-       - Create template management system
-       - Implement template editor
-       - Design template marketplace
-       - Add template sharing features
-
-    17. AI Content Generation
-       - Integrate AI generation capabilities
-       - Design content generation workflows
-       - Create output validation systems
-       - Implement feedback mechanisms
-
-    18. Setup Stripe + Block Free Users
-       - Integrate Stripe payment processing
-       - Create subscription management
-       - Implement payment webhooks
-       - Design feature access restrictions
-
-    19. Landing & Pricing Pages
-       - Design conversion-optimized landing pages
-       - Create pricing tier comparisons
-       - Implement checkout flows
-       - Add testimonials and social proof
-
-    When helping:
-    1. Direct users to specific sections
-    2. Explain concepts clearly
-    3. Provide context for how sections connect
-    4. Encourage hands-on practice
+    <interaction_history>
+    {interaction_history}
+    </interaction_history>
+
+    When the user is dissatisfied:
+    1. Ask follow up questions to understand his exact concern, regarding specific dates and duties.
+    2. Use the user_constraints_tool to fetch the constraints he gave before, and the user_duties_tool
+       with his name to fetch his assigned duties.
+    3. Review the assigned duties against his constraints:
+       - If a duty was assigned on one of his bad days, tell him this is a mistake that will be reported.
+       - Otherwise, explain why he was assigned that duty on that date, based on the constraints he gave
+         and the needs of the other users.
+    4. If the user is still unhappy after your explanation, transfer to the Reporter Agent to write a report
+       for the system admin.
+
+    Remember:
+    - Never change the assigned duties yourself.
+    - Be polite, concise and clear.
     """,
-    tools=[],
+    tools=[user_constraints_tool, user_duties_tool],
 )
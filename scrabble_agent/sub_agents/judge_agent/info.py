@@ -0,0 +1,3 @@
+# The agent's name and description, read by the root agent without building the agent
+NAME = "judge_agent"
+DESCRIPTION = "Handles users who are dissatisfied with their assigned duties"
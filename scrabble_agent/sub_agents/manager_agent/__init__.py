@@ -1,3 +1,12 @@
-from .agent import manager_agent
+from . import info
 
-__all__ = ["manager_agent"]
+__all__ = ["info", "manager_agent"]
+
+
+def __getattr__(name):
+    # The agent is built on first use, importing the package only reads its info
+    if name == "manager_agent":
+        from .agent import manager_agent
+
+        return manager_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,112 +1,157 @@
-from datetime import datetime
+import asyncio
+import os
+from datetime import date
 
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
 
+from ...model_backend import agent_model
+from ...scheduling import repair_assignments, solve_assignments
+from ...scheduling.dates import format_date
+from ...tools import DUTY_HORIZON_KEY, load_assignments, load_duty_requirements, load_roster, save_assignments
+from ..security_agent.agent import hold_for_security_check
+from .info import DESCRIPTION, NAME
 
-def purchase_course(tool_context: ToolContext) -> dict:
-    """
-    Simulates purchasing the AI Marketing Platform course.
-    Updates state with purchase information.
-    """
-    course_id = "ai_marketing_platform"
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    # Get current purchased courses
-    current_purchased_courses = tool_context.state.get("purchased_courses", [])
-
-    # Check if user already owns the course
-    course_ids = [
-        course["id"] for course in current_purchased_courses if isinstance(course, dict)
-    ]
-    if course_id in course_ids:
-        return {"status": "error", "message": "You already own this course!"}
+# Seconds the solver may spend improving a schedule, configurable from .env
+SOLVER_TIME_BUDGET = float(os.getenv("SOLVER_TIME_BUDGET", "5"))
 
-    # Create new list with the course added
-    new_purchased_courses = []
-    # Only include valid dictionary courses
-    for course in current_purchased_courses:
-        if isinstance(course, dict) and "id" in course:
-            new_purchased_courses.append(course)
 
-    # Add the new course as a dictionary with id and purchase_date
-    new_purchased_courses.append({"id": course_id, "purchase_date": current_time})
-
-    # Update purchased courses in state via assignment
-    tool_context.state["purchased_courses"] = new_purchased_courses
+async def assign_duties_tool(start_date: str, horizon_days: int, tool_context: ToolContext) -> dict:
+    """
+    Assigns duties to every user with saved constraints using the shift solver.
+    Builds each user's input from the constraints the chatbot agent saved and the category/preference
+    pairs the categorizer agent saved, staffs the duties in the duty requirements file,
+    and saves the assigned duties of every user to the Database.
+
+    Args:
+        start_date: The first date to schedule in dd/mm/yyyy format, empty for today
+        horizon_days: The number of days to schedule, e.g. 60
+    """
+    if tool_context.state.get("user_role") != "system_admin":
+        return {"status": "error", "message": "Only a system_admin can assign duties."}
+
+    users = await load_roster()
+    requirements = load_duty_requirements()
+    if not users or not requirements:
+        return {
+            "status": "error",
+            "message": "There are no users with constraints or no duty requirements to schedule.",
+        }
+
+    start_date = start_date or format_date(date.today())
+    try:
+        result = await asyncio.to_thread(
+            solve_assignments,
+            users,
+            requirements,
+            start_date=start_date,
+            horizon_days=horizon_days,
+            time_budget=SOLVER_TIME_BUDGET,
+        )
+    except ValueError as e:
+        return {"status": "error", "message": f"Invalid input for the solver: {e}"}
+
+    # A new schedule replaces the duties of every user
+    await save_assignments(result["assignments"], replace=True)
+    tool_context.state[DUTY_HORIZON_KEY] = {"start_date": start_date, "horizon_days": horizon_days}
+
+    # The full schedule is in the Database, return only a summary to keep the prompt short
+    return {
+        "status": "success",
+        "message": f"Assigned {result['stats']['assigned_duties']} duties to {len(result['assignments'])} users.",
+        "unfilled": result["unfilled"],
+        "invalid_dates": result["invalid_dates"],
+        "stats": result["stats"],
+    }
 
-    # Get current interaction history
-    current_interaction_history = tool_context.state.get("interaction_history", [])
 
-    # Create new interaction history with purchase added
-    new_interaction_history = current_interaction_history.copy()
-    new_interaction_history.append(
-        {"action": "purchase_course", "course_id": course_id, "timestamp": current_time}
-    )
+async def repair_duties_tool(user_ids: list[str], tool_context: ToolContext) -> dict:
+    """
+    Repairs the current assignments after some users changed their constraints.
+    Assignments in the next 2 weeks never change, after that only the given users'
+    duties are re-optimized and every other assignment is kept.
 
-    # Update interaction history in state via assignment
-    tool_context.state["interaction_history"] = new_interaction_history
+    Args:
+        user_ids: The ids of the users whose constraints changed
+    """
+    if tool_context.state.get("user_role") != "system_admin":
+        return {"status": "error", "message": "Only a system_admin can repair the assigned duties."}
+
+    previous = await load_assignments()
+    horizon = tool_context.state.get(DUTY_HORIZON_KEY)
+    if not previous or not horizon:
+        return {
+            "status": "error",
+            "message": "There are no assigned duties to repair, use assign_duties_tool first.",
+        }
+
+    try:
+        result = await asyncio.to_thread(
+            repair_assignments,
+            await load_roster(),
+            load_duty_requirements(),
+            previous,
+            user_ids,
+            start_date=horizon["start_date"],
+            horizon_days=horizon["horizon_days"],
+            time_budget=SOLVER_TIME_BUDGET,
+        )
+    except ValueError as e:
+        return {"status": "error", "message": f"Invalid input for the solver: {e}"}
+
+    await save_assignments(result["assignments"], replace=True)
 
     return {
         "status": "success",
-        "message": "Successfully purchased the AI Marketing Platform course!",
-        "course_id": course_id,
-        "timestamp": current_time,
+        "message": f"Changed {len(result['changes'])} assignments.",
+        "changes": result["changes"],
+        "frozen_conflicts": result["frozen_conflicts"],
+        "unfilled": result["unfilled"],
+        "stats": result["stats"],
     }
 
 
-# Create the sales agent
+# Create the manager agent
 manager_agent = Agent(
-    name="manager_agent",
-    model="gemini-2.0-flash",
-    description="Sales agent for the AI Marketing Platform course",
+    name=NAME,
+    model=agent_model("manager_agent"),
+    description=DESCRIPTION,
     instruction="""
-    You are a sales agent for the AI Developer Accelerator community, specifically handling sales
-    for the Fullstack AI Marketing Platform course.
+    You are the manager agent of ScrabbleAI. Your role is to assign duties to users on specific dates,
+    according to the users' preferences and constraints and the duties the admin needs staffed.
 
     <user_info>
     Name: {user_name}
+    Role: {user_role}
     </user_info>
 
-    <purchase_info>
-    Purchased Courses: {purchased_courses}
-    </purchase_info>
-
     <interaction_history>
     {interaction_history}
     </interaction_history>
 
-    Course Details:
-    - Name: Fullstack AI Marketing Platform
-    - Price: $149
-    - Value Proposition: Learn to build AI-powered marketing automation apps
-    - Includes: 6 weeks of group support with weekly coaching calls
-
-    When interacting with users:
-    1. Check if they already own the course (check purchased_courses above)
-       - Course information is stored as objects with "id" and "purchase_date" properties
-       - The course id is "ai_marketing_platform"
-    2. If they own it:
-       - Remind them they have access
-       - Ask if they need help with any specific part
-       - Direct them to course support for content questions
-    
-    3. If they don't own it:
-       - Explain the course value proposition
-       - Mention the price ($149)
-       - If they want to purchase:
-           - Use the purchase_course tool
-           - Confirm the purchase
-           - Ask if they'd like to start learning right away
-
-    4. After any interaction:
-       - The state will automatically track the interaction
-       - Be ready to hand off to course support after purchase
+    When assigning duties:
+    1. Only a "system_admin" may ask you to assign duties, refuse any other role.
+    2. Use the assign_duties_tool to assign the duties, never assign duties yourself.
+       - The tool reads every user's constraints saved by the Chatbot Agent and category/preference pairs saved by
+         the Categorizer Agent, and the duties to staff from the duty requirements file.
+       - Ask the admin for the first date and the number of days to schedule if they were not provided.
+    3. After the tool returns:
+       - Report how many duties were assigned and the solver stats.
+       - List any unfilled duties, with their date and how many users are missing.
+       - List any invalid dates found in the users' constraints.
+    4. The assignments are saved to the Database as pairs of duty_title per date for every user,
+       the Critic Agent reviews them from there.
+    5. When users changed their constraints after duties were assigned, use the repair_duties_tool with their user ids
+       instead of assigning everything again.
+       - Report the changed assignments.
+       - Report any frozen conflicts, these are duties in the next 2 weeks that conflict with the new constraints
+         and were kept, the admin decides on them using the Supreme Agent.
 
     Remember:
-    - Be helpful but not pushy
-    - Focus on the value and practical skills they'll gain
-    - Emphasize the hands-on nature of building a real AI application
+    - Once duties are assigned for the next 2 weeks, never change them, inform the admin instead.
+    - Be concise and clear.
     """,
-    tools=[purchase_course],
+    tools=[assign_duties_tool, repair_duties_tool],
+    # In speculative mode, nothing is written or sent before the security check clears
+    before_tool_callback=hold_for_security_check,
 )
@@ -0,0 +1,3 @@
+# The agent's name and description, read by the root agent without building the agent
+NAME = "manager_agent"
+DESCRIPTION = "Assigns duties to users according to their categorized preferences and constraints"
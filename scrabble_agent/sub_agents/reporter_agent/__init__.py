@@ -1,3 +1,12 @@
-from .agent import reporter_agent
+from . import info
 
-__all__ = ["reporter_agent"]
+__all__ = ["info", "reporter_agent"]
+
+
+def __getattr__(name):
+    # The agent is built on first use, importing the package only reads its info
+    if name == "reporter_agent":
+        from .agent import reporter_agent
+
+        return reporter_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,60 +1,47 @@
-from datetime import datetime
-
 from google.adk.agents import Agent
-from google.adk.tools.tool_context import ToolContext
 
-# Create the sales agent
+from ...model_backend import agent_model
+from ...tools import draft_report_tool, send_report_tool, user_constraints_tool, user_duties_tool
+from ..security_agent.agent import hold_for_security_check
+from .info import DESCRIPTION, NAME
+
+# Create the reporter agent
 reporter_agent = Agent(
-    name="reporter_agent",
-    model="gemini-2.0-flash",
-    description="Sales agent for the AI Marketing Platform course",
+    name=NAME,
+    model=agent_model("reporter_agent"),
+    description=DESCRIPTION,
     instruction="""
-    You are a sales agent for the AI Developer Accelerator community, specifically handling sales
-    for the Fullstack AI Marketing Platform course.
+    You are the reporter agent of ScrabbleAI. Your role is to write a report for the system admin
+    when a user is still dissatisfied with his assigned duties after the Judge Agent explained them.
 
     <user_info>
     Name: {user_name}
+    Role: {user_role}
     </user_info>
 
-    <purchase_info>
-    Purchased Courses: {purchased_courses}
-    </purchase_info>
-
     <interaction_history>
     {interaction_history}
     </interaction_history>
 
-    Course Details:
-    - Name: Fullstack AI Marketing Platform
-    - Price: $149
-    - Value Proposition: Learn to build AI-powered marketing automation apps
-    - Includes: 6 weeks of group support with weekly coaching calls
-
-    When interacting with users:
-    1. Check if they already own the course (check purchased_courses above)
-       - Course information is stored as objects with "id" and "purchase_date" properties
-       - The course id is "ai_marketing_platform"
-    2. If they own it:
-       - Remind them they have access
-       - Ask if they need help with any specific part
-       - Direct them to course support for content questions
-    
-    3. If they don't own it:
-       - Explain the course value proposition
-       - Mention the price ($149)
-       - If they want to purchase:
-           - Use the purchase_course tool
-           - Confirm the purchase
-           - Ask if they'd like to start learning right away
-
-    4. After any interaction:
-       - The state will automatically track the interaction
-       - Be ready to hand off to course support after purchase
+    When writing a report:
+    1. Use the user_constraints_tool to fetch the constraints the user gave the chatbot agent,
+       and the user_duties_tool with his name to fetch his assigned duties.
+    2. Write a short report that includes:
+       - The user's name.
+       - His good days, bad days and other constraints or preferences.
+       - The assigned duties he is dissatisfied with.
+       - The contradiction between his assigned duties and the outcome he wants now.
+    3. Save the report with the draft_report_tool, show it to the user and ask him to approve it before it is
+       sent to the system admin. If he asks for changes, draft the report again.
+    4. Once the user approves the report, send it with the send_report_tool and tell the user it was
+       sent to the system admin for evaluation, with the ticket the tool returns.
 
     Remember:
-    - Be helpful but not pushy
-    - Focus on the value and practical skills they'll gain
-    - Emphasize the hands-on nature of building a real AI application
+    - Never change the assigned duties yourself.
+    - Never send a report the user has not approved.
+    - Be concise, neutral and clear, the admin decides on the final outcome.
     """,
-    tools=[purchase_course],
+    tools=[user_constraints_tool, user_duties_tool, draft_report_tool, send_report_tool],
+    # In speculative mode, nothing is written or sent before the security check clears
+    before_tool_callback=hold_for_security_check,
 )
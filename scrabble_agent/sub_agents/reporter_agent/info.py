@@ -0,0 +1,3 @@
+# The agent's name and description, read by the root agent without building the agent
+NAME = "reporter_agent"
+DESCRIPTION = "Writes a report for the system admin when a user is dissatisfied with his assigned duties"
@@ -0,0 +1,168 @@
+import os
+import re
+from collections import deque
+
+# Verdicts of the pre-filter
+CLEAN = "clean"
+ESCALATE = "escalate"
+BLOCKED = "blocked"
+# Escalated, and checked by the security agent while the other agents already handle the message
+PENDING = "pending"
+
+# What every role is allowed to do, a role that is not here may not interact with the system
+ROLE_PERMISSIONS = {
+    "system_user": {"submit_constraints", "view_own_duties", "report_dissatisfaction"},
+    "system_admin": {
+        "submit_constraints",
+        "view_own_duties",
+        "report_dissatisfaction",
+        "assign_duties",
+        "view_other_duties",
+        "change_assignments",
+    },
+}
+
+# The role of a session whose state has none, the one with the fewest permissions
+DEFAULT_ROLE = "system_user"
+
+# Banned language, extended from the file in SECURITY_BANNED_TERMS_PATH, one term per line
+BANNED_TERMS = [
+    "idiot",
+    "stupid",
+    "moron",
+    "shut up",
+    "damn you",
+    "go to hell",
+    "kill you",
+    "screw you",
+]
+
+# Phrases asking for an admin permission, by the permission they need
+PERMISSION_TERMS = {
+    "assign_duties": ["assign duties", "assign the duties", "assign shifts", "run the manager"],
+    "view_other_duties": ["other users", "other user's", "someone else's", "everyone's duties", "all users"],
+    "change_assignments": ["change the assignment", "change his duty", "change her duty", "override", "supreme agent"],
+}
+
+_ADMIN_ROLE = r"(an?\s+|the\s+)?(system[\s_-]?admin|admin|administrator|supreme|superuser|root)\b(?!['’])"
+
+# Explicit attempts to claim a role or override the system's instructions, blocked
+ROLE_SPOOFING_PATTERN = re.compile(
+    rf"\b(i am|i'm|im|my role is|switch me to|make me|grant me|give me)\s+{_ADMIN_ROLE}"
+    r"|\bignore (all |any |the |your )?(previous |above |prior )?(instructions|rules)\b",
+    re.IGNORECASE,
+)
+
+# Phrasing that may claim a role or only mention one, e.g. "as the admin asked", for the security agent to decide
+ROLE_MENTION_PATTERN = re.compile(rf"\b(as an?|as the|act as|acting as)\s+{_ADMIN_ROLE}", re.IGNORECASE)
+
+
+class AhoCorasick:
+    """Finds every occurrence of a set of terms in one pass over the text.
+
+    Terms only match on word boundaries, the text and the terms are lowercased
+    and every non-alphanumeric character is treated as a space.
+    """
+
+    def __init__(self, terms):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for term, label in terms:
+            self._add(_normalize(term), label)
+        self._build()
+
+    def _add(self, term, label):
+        state = 0
+        for char in f" {term} ":
+            if char not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = len(self._goto) - 1
+            state = self._goto[state][char]
+        self._output[state].append(label)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def search(self, text):
+        """Return the labels of every term found in the text."""
+        found = []
+        state = 0
+        for char in f" {_normalize(text)} ":
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            found.extend(self._output[state])
+        return found
+
+
+def _normalize(text):
+    return re.sub(r"[^a-z0-9']+", " ", text.lower()).strip()
+
+
+def _load_banned_terms():
+    terms = list(BANNED_TERMS)
+    path = os.getenv("SECURITY_BANNED_TERMS_PATH")
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as banned_file:
+            terms.extend(line.strip() for line in banned_file if line.strip())
+    return terms
+
+
+_matcher = AhoCorasick(
+    [(term, ("banned", term)) for term in _load_banned_terms()]
+    + [(term, ("permission", permission)) for permission, terms in PERMISSION_TERMS.items() for term in terms]
+)
+
+
+def prefilter_message(message, user_role):
+    """Check a user's message before it reaches the security agent.
+
+    Args:
+        message: The user's message
+        user_role: The user's role from state['user_role'], DEFAULT_ROLE if None
+
+    Returns:
+        A dictionary with:
+            - 'verdict': "clean", "escalate" for the security agent to decide,
+              or "blocked"
+            - 'reason': Why the message was escalated or blocked
+    """
+    if user_role is None:
+        user_role = DEFAULT_ROLE
+    permissions = ROLE_PERMISSIONS.get(user_role)
+    if permissions is None:
+        return {"verdict": BLOCKED, "reason": f"The role {user_role!r} is not allowed to interact with the system."}
+
+    banned = []
+    needed = []
+    for kind, value in _matcher.search(message):
+        if kind == "banned":
+            banned.append(value)
+        elif value not in permissions:
+            needed.append(value)
+
+    if banned:
+        return {"verdict": BLOCKED, "reason": f"The message uses inappropriate language: {', '.join(sorted(set(banned)))}."}
+    if user_role != "system_admin" and ROLE_SPOOFING_PATTERN.search(message):
+        return {
+            "verdict": BLOCKED,
+            "reason": f"The message tries to claim a role other than {user_role} or to override the system's rules.",
+        }
+    if needed:
+        # Asking about an admin function is not always a violation, let the security agent decide
+        return {"verdict": ESCALATE, "reason": f"The message may need the permissions: {', '.join(sorted(set(needed)))}."}
+    if user_role != "system_admin" and ROLE_MENTION_PATTERN.search(message):
+        return {"verdict": ESCALATE, "reason": f"The message may claim a role other than {user_role}."}
+    return {"verdict": CLEAN, "reason": ""}
@@ -1,3 +1,12 @@
-from .agent import supreme_agent
+from . import info
 
-__all__ = ["supreme_agent"]
+__all__ = ["info", "supreme_agent"]
+
+
+def __getattr__(name):
+    # The agent is built on first use, importing the package only reads its info
+    if name == "supreme_agent":
+        from .agent import supreme_agent
+
+        return supreme_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
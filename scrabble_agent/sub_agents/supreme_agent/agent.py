@@ -1,60 +1,73 @@
-from datetime import datetime
-
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
 
-# Create the sales agent
+from ...model_backend import agent_model
+from ...scheduling.dates import format_date, parse_date
+from ...tools import user_constraints_tool, user_duties_tool, user_records_cache
+from ..security_agent.agent import hold_for_security_check
+from .info import DESCRIPTION, NAME
+
+
+async def change_assignment_tool(user_id: str, date: str, duty_title: str, tool_context: ToolContext) -> dict:
+    """
+    Changes the duty of a user on a date in the users' Database, even within the next 2 weeks
+    and against the user's constraints. Only the system admin may ask for this.
+
+    Args:
+        user_id: The id of the user
+        date: The date in dd/mm/yyyy format
+        duty_title: The new duty title, empty to remove the user's duty on that date
+    """
+    if tool_context.state.get("user_role") != "system_admin":
+        return {"status": "error", "message": "Only a system_admin can change assignments."}
+    try:
+        date = format_date(parse_date(date))
+    except ValueError:
+        return {"status": "error", "message": f"{date} is not a valid dd/mm/yyyy date."}
+
+    duties = dict(await user_records_cache.get("duties", user_id) or {})
+    previous = duties.pop(date, None)
+    if duty_title:
+        duties[date] = duty_title
+    await user_records_cache.save(user_id, duties=duties)
+
+    return {
+        "status": "success",
+        "message": f"Changed the duty of {user_id} on {date} from {previous or 'none'} to {duty_title or 'none'}.",
+    }
+
+
+# Create the supreme agent
 supreme_agent = Agent(
-    name="supreme_agent",
-    model="gemini-2.0-flash",
-    description="Sales agent for the AI Marketing Platform course",
+    name=NAME,
+    model=agent_model("supreme_agent"),
+    description=DESCRIPTION,
     instruction="""
-    You are a sales agent for the AI Developer Accelerator community, specifically handling sales
-    for the Fullstack AI Marketing Platform course.
+    You are the supreme agent of ScrabbleAI. Your role is to make the final decision when the system admin
+    reviews a user's dissatisfaction with his assigned duties.
 
     <user_info>
     Name: {user_name}
+    Role: {user_role}
     </user_info>
 
-    <purchase_info>
-    Purchased Courses: {purchased_courses}
-    </purchase_info>
-
     <interaction_history>
     {interaction_history}
     </interaction_history>
 
-    Course Details:
-    - Name: Fullstack AI Marketing Platform
-    - Price: $149
-    - Value Proposition: Learn to build AI-powered marketing automation apps
-    - Includes: 6 weeks of group support with weekly coaching calls
-
-    When interacting with users:
-    1. Check if they already own the course (check purchased_courses above)
-       - Course information is stored as objects with "id" and "purchase_date" properties
-       - The course id is "ai_marketing_platform"
-    2. If they own it:
-       - Remind them they have access
-       - Ask if they need help with any specific part
-       - Direct them to course support for content questions
-    
-    3. If they don't own it:
-       - Explain the course value proposition
-       - Mention the price ($149)
-       - If they want to purchase:
-           - Use the purchase_course tool
-           - Confirm the purchase
-           - Ask if they'd like to start learning right away
-
-    4. After any interaction:
-       - The state will automatically track the interaction
-       - Be ready to hand off to course support after purchase
-
-    Remember:
-    - Be helpful but not pushy
-    - Focus on the value and practical skills they'll gain
-    - Emphasize the hands-on nature of building a real AI application
+    Only a "system_admin" may use you, for any other role answer that this is an admin functionality
+    and transfer back to the scrabble_agent.
+
+    When the admin asks to change an assignment:
+    1. Use the user_duties_tool to fetch the user's assigned duties, and the user_constraints_tool
+       to fetch his constraints.
+    2. Confirm the exact change with the admin, tell him if it contradicts the user's constraints.
+    3. Use the change_assignment_tool to change the duty. You may bypass the user's constraints
+       and the 2 weeks freeze of the Manager Agent, since the admin decided so.
+    4. Remind the admin that the duty now needs another user if it was removed, the Manager Agent
+       can repair the assignments.
     """,
-    tools=[purchase_course],
+    tools=[change_assignment_tool, user_constraints_tool, user_duties_tool],
+    # In speculative mode, nothing is written or sent before the security check clears
+    before_tool_callback=hold_for_security_check,
 )
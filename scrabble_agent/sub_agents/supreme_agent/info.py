@@ -0,0 +1,3 @@
+# The agent's name and description, read by the root agent without building the agent
+NAME = "supreme_agent"
+DESCRIPTION = "Makes the final decision on a user's dissatisfaction and can change any assigned duty"
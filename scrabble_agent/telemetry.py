@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+
+from opentelemetry import trace
+from prometheus_client import Counter, Histogram, start_http_server
+
+# Where the spans go: "none", "console" or "gcp" (Cloud Trace)
+TRACES_EXPORTER = os.getenv("TRACES_EXPORTER", "none")
+# Port of the local Prometheus /metrics endpoint of the CLI, 0 disables it
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+tracer = trace.get_tracer("scrabble_agent")
+
+TURN_LATENCY = Histogram(
+    "scrabble_turn_latency_seconds", "Time from a user message to the last event of its turn", buckets=LATENCY_BUCKETS
+)
+TURN_FIRST_TOKEN = Histogram(
+    "scrabble_turn_first_token_seconds",
+    "Time from a user message to the first response text shown for it",
+    buckets=LATENCY_BUCKETS,
+)
+AGENT_FIRST_TOKEN = Histogram(
+    "scrabble_agent_first_token_seconds",
+    "Time from the start of an agent's hop to its first response text",
+    ["agent"],
+    buckets=LATENCY_BUCKETS,
+)
+AGENT_LATENCY = Histogram(
+    "scrabble_agent_latency_seconds",
+    "Time an agent spent producing its events in a turn",
+    ["agent"],
+    buckets=LATENCY_BUCKETS,
+)
+TOKENS = Counter("scrabble_model_tokens", "Model tokens used, by agent", ["agent", "kind"])
+TRANSFERS = Counter("scrabble_agent_transfers", "Transfers between agents", ["source", "target"])
+TOOL_CALLS = Counter("scrabble_tool_calls", "Tool calls, by agent", ["agent", "tool"])
+OUTPUT_REPAIRS = Counter(
+    "scrabble_output_repairs", "Structured outputs by outcome: valid, repaired, reprompted or failed", ["agent", "outcome"]
+)
+OUTPUT_RETRY_LATENCY = Histogram(
+    "scrabble_output_retry_latency_seconds",
+    "Time of the model call asking an agent again for a structured output it could not repair",
+    ["agent"],
+    buckets=LATENCY_BUCKETS,
+)
+
+_setup_lock = threading.Lock()
+_tracing_ready = False
+_metrics_server_started = False
+
+
+def setup_tracing(exporter=TRACES_EXPORTER):
+    """Export the spans of the agents, once per process.
+
+    The runner's own spans (invocation, agent_run and tool_call per agent and
+    tool) are exported with ours, under the span of the turn.
+    """
+    global _tracing_ready
+    with _setup_lock:
+        if _tracing_ready or exporter == "none":
+            return
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+        if exporter == "gcp":
+            from opentelemetry.exporter.cloud_trace import CloudTraceSpanExporter
+
+            span_exporter = CloudTraceSpanExporter()
+        elif exporter == "console":
+            span_exporter = ConsoleSpanExporter()
+        else:
+            raise ValueError(f"Unknown TRACES_EXPORTER {exporter!r}, expected none, console or gcp")
+        provider = TracerProvider(resource=Resource.create({"service.name": "scrabble_agent"}))
+        provider.add_span_processor(BatchSpanProcessor(span_exporter))
+        trace.set_tracer_provider(provider)
+        _tracing_ready = True
+
+
+def start_metrics_server(port=METRICS_PORT):
+    """Serve the Prometheus metrics on http://localhost:<port>/metrics, once per process."""
+    global _metrics_server_started
+    with _setup_lock:
+        if not port or _metrics_server_started:
+            return
+        start_http_server(port, addr="127.0.0.1")
+        _metrics_server_started = True
+
+
+class HopRecorder:
+    """Records the agent hops of a run from its events, in the order they are produced.
+
+    The time between two events is spent by the author of the later one. Every
+    run of consecutive events of an agent becomes an "agent_hop [name]" span,
+    a child of the span current when the recorder was created. The time per
+    agent, the time to its first response text, the tokens, transfers and
+    tool calls go to the Prometheus metrics.
+    """
+
+    def __init__(self):
+        self._parent = trace.set_span_in_context(trace.get_current_span())
+        self._last = time.perf_counter()
+        self._last_ns = time.time_ns()
+        self._agent_seconds = {}
+        self._hop = None
+        self._hop_agent = None
+        self._hop_started = self._last
+        self._hop_answered = False
+
+    def record(self, event):
+        now, now_ns = time.perf_counter(), time.time_ns()
+        agent = event.author or "unknown"
+        self._agent_seconds[agent] = self._agent_seconds.get(agent, 0.0) + now - self._last
+
+        if agent != self._hop_agent:
+            self._end_hop(self._last_ns)
+            self._hop = tracer.start_span(f"agent_hop [{agent}]", context=self._parent, start_time=self._last_ns)
+            self._hop.set_attribute("scrabble.agent", agent)
+            self._hop_agent = agent
+            self._hop_started = self._last
+            self._hop_answered = False
+        self._last, self._last_ns = now, now_ns
+
+        if not self._hop_answered and event.content and any(part.text for part in event.content.parts or []):
+            AGENT_FIRST_TOKEN.labels(agent).observe(now - self._hop_started)
+            self._hop.add_event("first_token")
+            self._hop_answered = True
+
+        usage = event.usage_metadata
+        # Streamed chunks repeat the usage of the response they are part of
+        if usage and not event.partial:
+            TOKENS.labels(agent, "prompt").inc(usage.prompt_token_count or 0)
+            TOKENS.labels(agent, "response").inc(usage.candidates_token_count or 0)
+        for call in event.get_function_calls():
+            if call.name == "transfer_to_agent":
+                target = (call.args or {}).get("agent_name", "unknown")
+                TRANSFERS.labels(agent, target).inc()
+                self._hop.add_event("transfer", {"scrabble.target": target})
+            else:
+                TOOL_CALLS.labels(agent, call.name).inc()
+
+    def _end_hop(self, end_ns):
+        if self._hop is not None:
+            self._hop.end(end_time=end_ns)
+            self._hop = None
+
+    def finish(self):
+        """End the last hop and observe the time of every agent in the run."""
+        self._end_hop(self._last_ns)
+        self._hop_agent = None
+        for agent, seconds in self._agent_seconds.items():
+            AGENT_LATENCY.labels(agent).observe(seconds)
+        self._agent_seconds = {}
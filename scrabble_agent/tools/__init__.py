@@ -0,0 +1,37 @@
+from .assignments import DUTY_HORIZON_KEY, load_assignments, load_duty_requirements, save_assignments
+from .name_index import NameIndex
+from .outbox import ReportOutbox, draft_report_tool, report_outbox, send_report_tool
+from .user_constraints import (
+    ReadThroughCache,
+    load_roster,
+    prefetch_user,
+    save_categorizer_output_callback,
+    save_constraints,
+    save_preferences,
+    user_constraints_tool,
+    user_records_cache,
+)
+from .user_duties import user_duties_tool
+from .user_records import UserRecords
+
+__all__ = [
+    "DUTY_HORIZON_KEY",
+    "NameIndex",
+    "ReadThroughCache",
+    "ReportOutbox",
+    "UserRecords",
+    "draft_report_tool",
+    "load_assignments",
+    "load_duty_requirements",
+    "load_roster",
+    "prefetch_user",
+    "report_outbox",
+    "save_assignments",
+    "save_categorizer_output_callback",
+    "save_constraints",
+    "save_preferences",
+    "send_report_tool",
+    "user_constraints_tool",
+    "user_duties_tool",
+    "user_records_cache",
+]
@@ -0,0 +1,31 @@
+import json
+import os
+
+from .user_constraints import user_records_cache
+
+# JSON file with the duties the admin needs staffed, a list of
+# {"duty_title", "category", "headcount", "weekdays"}, see DutySolver
+DUTY_REQUIREMENTS_PATH = os.getenv("DUTY_REQUIREMENTS_PATH", "duty_requirements.json")
+
+# Where the schedule's first date and length are kept, shared by every session
+DUTY_HORIZON_KEY = "app:duty_horizon"
+
+
+def load_duty_requirements(path=None):
+    """The duties to staff from DUTY_REQUIREMENTS_PATH, read on every call so edits apply at once."""
+    path = path or DUTY_REQUIREMENTS_PATH
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as requirements_file:
+        return json.load(requirements_file)
+
+
+async def load_assignments():
+    """The assigned duties of every user, {user_id: {"dd/mm/yyyy": duty_title}}."""
+    records = await user_records_cache.records.fetch_all("duties")
+    return {user_id: user_records["duties"] for user_id, user_records in records.items() if user_records["duties"]}
+
+
+async def save_assignments(assignments, replace=False):
+    """Save the assigned duties of the given users, with replace those of every other user are cleared."""
+    await user_records_cache.save_all("duties", assignments, replace)
@@ -0,0 +1,156 @@
+import math
+import re
+
+import numpy as np
+
+# Suggestions scoring below this trigram similarity are not returned
+MIN_NAME_SIMILARITY = 0.3
+
+
+def normalize_name(name):
+    """Lowercase the name and collapse whitespace and punctuation."""
+    return " ".join(re.sub(r"[^\w\s]", " ", name.lower()).split())
+
+
+def name_trigrams(name):
+    """The set of trigrams of a normalized name, padded so short names still have some."""
+    padded = f"  {name} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class _Postings:
+    """A growable array of slot ids, appends are amortized O(1)."""
+
+    __slots__ = ("array", "length")
+
+    def __init__(self):
+        self.array = np.empty(4, dtype=np.int32)
+        self.length = 0
+
+    def append(self, value):
+        if self.length == len(self.array):
+            self.array = np.resize(self.array, 2 * len(self.array))
+        self.array[self.length] = value
+        self.length += 1
+
+    def view(self):
+        return self.array[: self.length]
+
+
+class NameIndex:
+    """Exact and fuzzy lookup of users by name.
+
+    Every name is stored under its normalized form for exact lookups, and
+    in trigram postings lists for similar-name suggestions. A query counts
+    its shared trigrams with every candidate in one numpy pass and ranks
+    them by the Dice coefficient, 2 * shared / (query trigrams + name trigrams).
+
+    Adding a user is O(name length). Removing one only marks its slot dead,
+    the postings are rebuilt once dead slots outnumber live ones.
+    """
+
+    def __init__(self, users=()):
+        self._clear()
+        for user_id, name in users:
+            self.add(user_id, name)
+
+    def _clear(self):
+        self._slots = {}
+        self._exact = {}
+        self._postings = {}
+        self._user_ids = []
+        self._names = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._sizes = np.zeros(0, dtype=np.int32)
+        self._dead = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, user_id):
+        return user_id in self._slots
+
+    def add(self, user_id, name):
+        """Add a user, or rename it if it is already indexed."""
+        if user_id in self._slots:
+            if self._names[self._slots[user_id]] == name:
+                return
+            self.remove(user_id)
+
+        slot = len(self._user_ids)
+        if slot == len(self._alive):
+            capacity = max(16, 2 * slot)
+            self._alive = np.resize(self._alive, capacity)
+            self._alive[slot:] = False
+            self._sizes = np.resize(self._sizes, capacity)
+        normalized = normalize_name(name)
+        trigrams = name_trigrams(normalized)
+        for trigram in trigrams:
+            postings = self._postings.get(trigram)
+            if postings is None:
+                postings = self._postings[trigram] = _Postings()
+            postings.append(slot)
+
+        self._slots[user_id] = slot
+        self._user_ids.append(user_id)
+        self._names.append(name)
+        self._alive[slot] = True
+        self._sizes[slot] = len(trigrams)
+        self._exact.setdefault(normalized, set()).add(user_id)
+
+    def remove(self, user_id):
+        """Remove a user, unknown users are ignored."""
+        slot = self._slots.pop(user_id, None)
+        if slot is None:
+            return
+        normalized = normalize_name(self._names[slot])
+        self._exact[normalized].discard(user_id)
+        if not self._exact[normalized]:
+            del self._exact[normalized]
+        self._alive[slot] = False
+        self._dead += 1
+        if self._dead > len(self._slots):
+            self._rebuild()
+
+    def _rebuild(self):
+        users = [(user_id, self._names[slot]) for user_id, slot in self._slots.items()]
+        self._clear()
+        for user_id, name in users:
+            self.add(user_id, name)
+
+    def name(self, user_id):
+        """The indexed name of a user."""
+        return self._names[self._slots[user_id]]
+
+    def lookup(self, name):
+        """The ids of the users whose name matches exactly, ignoring case and punctuation."""
+        return sorted(self._exact.get(normalize_name(name), ()))
+
+    def similar(self, name, k=5, min_similarity=MIN_NAME_SIMILARITY):
+        """The k users with the most similar names.
+
+        Returns:
+            A list of (user_id, name, similarity) tuples, most similar first
+        """
+        trigrams = name_trigrams(normalize_name(name))
+        postings = [self._postings[trigram].view() for trigram in trigrams if trigram in self._postings]
+        if not postings or k <= 0:
+            return []
+
+        shared = np.bincount(np.concatenate(postings), minlength=len(self._user_ids))
+        # A name can only reach min_similarity if it shares at least this many trigrams,
+        # since it has at least as many trigrams as it shares
+        min_shared = max(1, math.ceil(min_similarity * len(trigrams) / (2 - min_similarity)))
+        slots = np.flatnonzero(shared >= min_shared)
+        scores = 2 * shared[slots] / (len(trigrams) + self._sizes[slots])
+        keep = self._alive[slots] & (scores >= min_similarity)
+        slots, scores = slots[keep], scores[keep]
+        if len(slots) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            slots, scores = slots[top], scores[top]
+
+        order = np.argsort(-scores, kind="stable")
+        return [
+            (self._user_ids[slot], self._names[slot], round(float(score), 3))
+            for slot, score in zip(slots[order], scores[order])
+        ]
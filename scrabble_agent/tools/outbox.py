@@ -0,0 +1,312 @@
+import asyncio
+import logging
+import os
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+import uuid
+from email.message import EmailMessage
+
+from google.adk.tools.tool_context import ToolContext
+
+# The outbox Database, reports wait there until they are delivered
+REPORT_OUTBOX_PATH = os.getenv("REPORT_OUTBOX_PATH", "scrabble_outbox.db")
+
+# The system admins who receive the reports, comma separated
+ADMIN_EMAILS = [email.strip() for email in os.getenv("ADMIN_EMAILS", "admin@localhost").split(",") if email.strip()]
+REPORT_SENDER = os.getenv("REPORT_SENDER", "scrabble-ai@localhost")
+
+# The SMTP server, the default is a local stand-in: python -m aiosmtpd -n -l localhost:8025
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "8025"))
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "10"))
+
+# A failed delivery is retried after REPORT_RETRY_DELAY seconds, doubling up to
+# REPORT_RETRY_MAX_DELAY, and given up after REPORT_MAX_ATTEMPTS attempts
+REPORT_MAX_ATTEMPTS = int(os.getenv("REPORT_MAX_ATTEMPTS", "6"))
+REPORT_RETRY_DELAY = float(os.getenv("REPORT_RETRY_DELAY", "5"))
+REPORT_RETRY_MAX_DELAY = float(os.getenv("REPORT_RETRY_MAX_DELAY", "300"))
+
+# Seconds a process holds the reports it is sending, a process that dies while
+# sending leaves them to another after this long
+REPORT_CLAIM_SECONDS = float(os.getenv("REPORT_CLAIM_SECONDS", "120"))
+
+# Reports queued within this many seconds of each other go to an admin in one email
+REPORT_BATCH_WINDOW = float(os.getenv("REPORT_BATCH_WINDOW", "2"))
+
+# Delivery states of a report to an admin
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+# The report the reporter agent showed the user, sent by send_report_tool once the user answered
+REPORT_DRAFT_KEY = "report_draft"
+
+logger = logging.getLogger(__name__)
+
+
+def send_email(recipient, subject, body):
+    """Send one email through the SMTP server, blocking until it is accepted."""
+    message = EmailMessage()
+    message["From"] = REPORT_SENDER
+    message["To"] = recipient
+    message["Subject"] = subject
+    message.set_content(body)
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT) as smtp:
+        smtp.send_message(message)
+
+
+def _format_batch(reports):
+    sections = [
+        f"Report {ticket} from {user_name or user_id} ({user_id}):\n\n{report}"
+        for ticket, user_id, user_name, report in reports
+    ]
+    return "\n\n---\n\n".join(sections)
+
+
+class ReportOutbox:
+    """Reports for the system admins, stored in SQLite and delivered in the background.
+
+    enqueue() only writes the report, one row per admin, and returns its
+    ticket, so the agent turn never waits for the mail server. A worker task
+    sends the due reports of each admin in one email, and reschedules a failed
+    email with exponential backoff and jitter. Reports left by an earlier run
+    are delivered once the worker starts again. Several processes may share
+    the outbox, each due report is claimed by one of them while it is sent.
+    A report is sent at least once, a crash between the send and its record
+    may send it twice.
+    """
+
+    def __init__(
+        self,
+        db_path=REPORT_OUTBOX_PATH,
+        admins=None,
+        send=send_email,
+        max_attempts=REPORT_MAX_ATTEMPTS,
+        retry_delay=REPORT_RETRY_DELAY,
+        retry_max_delay=REPORT_RETRY_MAX_DELAY,
+        batch_window=REPORT_BATCH_WINDOW,
+        claim_seconds=REPORT_CLAIM_SECONDS,
+    ):
+        self.db_path = db_path
+        self.admins = admins if admins is not None else ADMIN_EMAILS
+        self.send = send
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.retry_max_delay = retry_max_delay
+        self.batch_window = batch_window
+        self.claim_seconds = claim_seconds
+        self._connection = None
+        self._lock = threading.Lock()
+        self._task = None
+        self._wake = None
+        self.emails_sent = 0
+
+    @property
+    def connection(self):
+        # Opened on first use, so importing the tools does not create the Database
+        with self._lock:
+            if self._connection is None:
+                connection = sqlite3.connect(self.db_path, check_same_thread=False)
+                with connection:
+                    connection.execute(
+                        "CREATE TABLE IF NOT EXISTS reports ("
+                        "id INTEGER PRIMARY KEY AUTOINCREMENT, ticket TEXT NOT NULL, admin TEXT NOT NULL, "
+                        "user_id TEXT, user_name TEXT, report TEXT NOT NULL, status TEXT NOT NULL, "
+                        "attempts INTEGER NOT NULL DEFAULT 0, next_attempt REAL NOT NULL, "
+                        "created REAL NOT NULL, sent REAL, error TEXT)"
+                    )
+                    connection.execute("CREATE INDEX IF NOT EXISTS ix_reports_due ON reports (status, next_attempt)")
+                    connection.execute("CREATE INDEX IF NOT EXISTS ix_reports_ticket ON reports (ticket)")
+                self._connection = connection
+            return self._connection
+
+    def _enqueue(self, ticket, user_id, user_name, report):
+        connection = self.connection
+        now = time.time()
+        with self._lock, connection:
+            connection.executemany(
+                "INSERT INTO reports (ticket, admin, user_id, user_name, report, status, next_attempt, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(ticket, admin, user_id, user_name, report, PENDING, now, now) for admin in self.admins],
+            )
+
+    async def enqueue(self, user_id, user_name, report):
+        """Store a report for every admin and wake the worker.
+
+        Returns:
+            The report's delivery ticket
+        """
+        if not self.admins:
+            raise ValueError("No admin to send the report to, set ADMIN_EMAILS")
+        ticket = uuid.uuid4().hex[:12]
+        await asyncio.to_thread(self._enqueue, ticket, user_id, user_name, report)
+        self.start()
+        self._wake.set()
+        return ticket
+
+    def _status(self, ticket):
+        connection = self.connection
+        with self._lock:
+            rows = connection.execute(
+                "SELECT admin, status, attempts, sent, error FROM reports WHERE ticket = ? ORDER BY id", (ticket,)
+            ).fetchall()
+        return [
+            {"admin": admin, "status": status, "attempts": attempts, "sent": sent, "error": error}
+            for admin, status, attempts, sent, error in rows
+        ]
+
+    async def status(self, ticket):
+        """The delivery of a report to each admin, an empty list for an unknown ticket."""
+        return await asyncio.to_thread(self._status, ticket)
+
+    def _claim_due(self, now):
+        connection = self.connection
+        # One statement, so no other process claims the same reports
+        with self._lock, connection:
+            rows = connection.execute(
+                "UPDATE reports SET next_attempt = ? WHERE status = ? AND next_attempt <= ? "
+                "RETURNING id, ticket, admin, user_id, user_name, report, attempts",
+                (now + self.claim_seconds, PENDING, now),
+            ).fetchall()
+        return sorted(rows)
+
+    def _next_attempt(self):
+        connection = self.connection
+        with self._lock:
+            row = connection.execute("SELECT MIN(next_attempt) FROM reports WHERE status = ?", (PENDING,)).fetchone()
+        return row[0]
+
+    def _mark_sent(self, ids):
+        connection = self.connection
+        now = time.time()
+        with self._lock, connection:
+            connection.executemany(
+                "UPDATE reports SET status = ?, attempts = attempts + 1, sent = ?, error = NULL WHERE id = ?",
+                [(SENT, now, row_id) for row_id in ids],
+            )
+
+    def _mark_failed(self, rows, error):
+        connection = self.connection
+        now = time.time()
+        # Jitter keeps the retries of many emails from hitting the server at once,
+        # the reports of one email share it so they are retried together
+        jitter = random.uniform(0.5, 1.0)
+        updates = []
+        for row_id, attempts in rows:
+            attempts += 1
+            delay = min(self.retry_max_delay, self.retry_delay * 2 ** (attempts - 1))
+            next_attempt = now + delay * jitter
+            status = FAILED if attempts >= self.max_attempts else PENDING
+            updates.append((status, attempts, next_attempt, error, row_id))
+        with self._lock, connection:
+            connection.executemany(
+                "UPDATE reports SET status = ?, attempts = ?, next_attempt = ?, error = ? WHERE id = ?", updates
+            )
+
+    async def deliver_due(self):
+        """Send every due report, one email per admin, concurrently.
+
+        Returns:
+            The number of emails sent
+        """
+        rows = await asyncio.to_thread(self._claim_due, time.time())
+        batches = {}
+        for row_id, ticket, admin, user_id, user_name, report, attempts in rows:
+            batches.setdefault(admin, []).append((row_id, attempts, (ticket, user_id, user_name, report)))
+        sent = await asyncio.gather(*(self._deliver(admin, batch) for admin, batch in batches.items()))
+        return sum(sent)
+
+    async def _deliver(self, admin, batch):
+        reports = [report for _, _, report in batch]
+        subject = f"ScrabbleAI: {len(reports)} user report{'s' if len(reports) > 1 else ''}"
+        try:
+            await asyncio.to_thread(self.send, admin, subject, _format_batch(reports))
+        except Exception as e:
+            logger.warning("Sending %d report(s) to %s failed: %s", len(reports), admin, e)
+            await asyncio.to_thread(self._mark_failed, [(row_id, attempts) for row_id, attempts, _ in batch], str(e))
+            return 0
+        await asyncio.to_thread(self._mark_sent, [row_id for row_id, _, _ in batch])
+        self.emails_sent += 1
+        return 1
+
+    async def _run(self):
+        while True:
+            if self._wake.is_set():
+                # Give the reports that follow a moment to join the same email
+                await asyncio.sleep(self.batch_window)
+                self._wake.clear()
+            try:
+                await self.deliver_due()
+                next_attempt = await asyncio.to_thread(self._next_attempt)
+            except Exception:
+                logger.exception("The report outbox failed, retrying in %ss", self.retry_delay)
+                next_attempt = time.time() + self.retry_delay
+            timeout = None if next_attempt is None else max(0.0, next_attempt - time.time())
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Start the worker on the running event loop, if it is not running yet."""
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker, undelivered reports stay in the outbox for the next run."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+report_outbox = ReportOutbox()
+
+
+def draft_report_tool(report: str, tool_context: ToolContext) -> dict:
+    """
+    Saves the report to show the user for approval, send_report_tool sends exactly this report.
+
+    Args:
+        report: The report for the system admin
+    """
+    tool_context.state[REPORT_DRAFT_KEY] = {"report": report, "invocation_id": tool_context.invocation_id}
+    return {"status": "success", "message": "Show the report to the user and ask him to approve it."}
+
+
+async def send_report_tool(tool_context: ToolContext) -> dict:
+    """
+    Sends the drafted report to the system admins by email, once the user approved it.
+    The report is delivered in the background, the tool returns at once with its delivery ticket.
+    """
+    draft = tool_context.state.get(REPORT_DRAFT_KEY)
+    if not draft:
+        return {"status": "error", "message": "There is no report to send, draft it with the draft_report_tool first."}
+    # The user has to answer after seeing the draft, a draft of this turn was not shown to him yet
+    if draft["invocation_id"] == tool_context.invocation_id:
+        return {"status": "error", "message": "Show the report to the user and wait for his approval before sending it."}
+
+    user_id = tool_context.state.get("user_id")
+    user_name = tool_context.state.get("user_name")
+    try:
+        ticket = await report_outbox.enqueue(user_id, user_name, draft["report"])
+    except (sqlite3.Error, ValueError) as e:
+        return {"status": "error", "message": f"The report could not be queued: {e}"}
+    tool_context.state[REPORT_DRAFT_KEY] = None
+    return {
+        "status": "queued",
+        "ticket": ticket,
+        "message": f"The report was queued for the system admins with ticket {ticket}",
+    }
@@ -0,0 +1,261 @@
+import asyncio
+import json
+import os
+import re
+
+from cachetools import TTLCache
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.tools.tool_context import ToolContext
+
+from .name_index import NameIndex
+from .user_records import RECORD_KINDS, UserRecords
+
+# Cached user records, and how long they may be served without a new read from the Database
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "4096"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "600"))
+
+
+class ReadThroughCache:
+    """Serves user records from memory, reading each from the Database at most once.
+
+    Concurrent reads of a record that is not cached yet share a single
+    Database read. Every write goes through invalidate, so a cached record is
+    never older than the last write. The users' names are also kept in a
+    NameIndex, read from the Database on first use and updated by the writes.
+
+    Other processes may share the Database. Before serving a read, the
+    cache drops the records they wrote since its last read, and re-reads the
+    names they changed.
+    """
+
+    def __init__(self, records=None, maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL):
+        self._records = records
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._loading = {}
+        self._names = None
+        self._names_loading = None
+        # The last change to the Database the cache has seen, see UserRecords.changes
+        self._change = None
+        self._syncing = None
+        self.reads = 0
+
+    @property
+    def records(self):
+        # Opened on first use, so importing the tools does not create the Database
+        if self._records is None:
+            self._records = UserRecords()
+        return self._records
+
+    async def _sync(self):
+        """Drop the records other processes wrote since the last read, concurrent reads share one check."""
+        if self._syncing is None:
+            self._syncing = asyncio.ensure_future(self._read_changes())
+        await asyncio.shield(self._syncing)
+
+    async def _read_changes(self):
+        try:
+            changes = await self.records.changes(self._change)
+            if changes is None:
+                return
+            first = self._change is None
+            self._change, written = changes
+            if first:
+                return
+            if written is None:
+                self.clear()
+                return
+            renamed = set()
+            for user_id, kind in written:
+                if user_id is None:
+                    self._drop_kind(kind)
+                else:
+                    self.invalidate(user_id, kind)
+                    if kind == "user_name":
+                        renamed.add(user_id)
+            if renamed and self._names is not None:
+                names = await asyncio.gather(*(self.records.fetch("user_name", user_id) for user_id in renamed))
+                for user_id, name in zip(renamed, names):
+                    self._index_name(user_id, name)
+        finally:
+            self._syncing = None
+
+    def _drop_kind(self, kind):
+        for key in [key for key in [*self._cache, *self._loading] if key[0] == kind]:
+            self._cache.pop(key, None)
+            self._loading.pop(key, None)
+        if kind == "user_name":
+            self._names = self._names_loading = None
+
+    async def get(self, kind, user_id):
+        await self._sync()
+        key = (kind, user_id)
+        if key in self._cache:
+            return self._cache[key]
+        loading = self._loading.get(key)
+        if loading is None:
+            loading = self._loading[key] = asyncio.ensure_future(self._load(key))
+        return await asyncio.shield(loading)
+
+    async def _load(self, key):
+        try:
+            self.reads += 1
+            value = await self.records.fetch(*key)
+            # A write during the read dropped this load, its value is already stale
+            if self._loading.get(key) is asyncio.current_task():
+                self._cache[key] = value
+            return value
+        finally:
+            if self._loading.get(key) is asyncio.current_task():
+                del self._loading[key]
+
+    async def names(self):
+        """Every user with a name in the Database, in a NameIndex."""
+        await self._sync()
+        if self._names is not None:
+            return self._names
+        if self._names_loading is None:
+            self._names_loading = asyncio.ensure_future(self._load_names())
+        return await asyncio.shield(self._names_loading)
+
+    async def _load_names(self):
+        try:
+            records = await self.records.fetch_all("user_name")
+            names = await asyncio.to_thread(
+                NameIndex, [(user_id, user["user_name"]) for user_id, user in records.items() if user["user_name"]]
+            )
+            # A write during the read dropped this load, its index may miss the write
+            if self._names_loading is asyncio.current_task():
+                self._names = names
+            return names
+        finally:
+            if self._names_loading is asyncio.current_task():
+                self._names_loading = None
+
+    def _index_name(self, user_id, name):
+        self._names_loading = None
+        if self._names is None:
+            return
+        if name:
+            self._names.add(user_id, name)
+        else:
+            self._names.remove(user_id)
+
+    async def prefetch(self, user_id):
+        """Read all of a user's records concurrently.
+
+        Returns:
+            A dictionary of the user's records by kind
+        """
+        values = await asyncio.gather(*(self.get(kind, user_id) for kind in RECORD_KINDS))
+        return dict(zip(RECORD_KINDS, values))
+
+    async def save(self, user_id, **records):
+        """Write records of a user to the Database and drop their cached values."""
+        await self.records.save(user_id, **records)
+        self.invalidate(user_id, *records)
+        if "user_name" in records:
+            self._index_name(user_id, records["user_name"])
+
+    async def save_all(self, kind, values, replace=False):
+        """Write one record of many users, {user_id: record}, and drop the cached values.
+
+        With replace, the record of every other user is cleared too.
+        """
+        await self.records.save_all(kind, values, replace)
+        if replace:
+            self._drop_kind(kind)
+            return
+        for user_id, value in values.items():
+            self.invalidate(user_id, kind)
+            if kind == "user_name":
+                self._index_name(user_id, value)
+
+    def invalidate(self, user_id, *kinds):
+        """Drop cached records of a user, all of them if no kinds are given."""
+        for kind in kinds or RECORD_KINDS:
+            self._cache.pop((kind, user_id), None)
+            self._loading.pop((kind, user_id), None)
+
+    def clear(self):
+        """Drop every cached record, e.g. when other processes may have written them."""
+        self._cache.clear()
+        self._loading.clear()
+        self._names = self._names_loading = None
+
+
+user_records_cache = ReadThroughCache()
+
+
+async def prefetch_user(user_id):
+    """Read a user's role, name, shifts and constraints into the cache, for a new session."""
+    return await user_records_cache.prefetch(user_id)
+
+
+async def user_constraints_tool(user_id: str, tool_context: ToolContext) -> dict:
+    """
+    Fetches the constraints a user gave the chatbot agent, his good days, bad days and other preferences.
+    A "system_user" may only fetch his own constraints.
+
+    Args:
+        user_id: The id of the user, empty for the current user
+    """
+    current_user_id = tool_context.state.get("user_id")
+    user_id = user_id or current_user_id
+    if not user_id:
+        return {"status": "error", "message": "No user id was given."}
+    if tool_context.state.get("user_role") != "system_admin" and user_id != current_user_id:
+        return {"status": "error", "message": "Only a system_admin can view other users' constraints."}
+
+    constraints = await user_records_cache.get("constraints", user_id)
+    if constraints is None:
+        return {"status": "not_found", "message": f"User {user_id} has not given any constraints yet."}
+    return {"status": "success", "user_id": user_id, "constraints": constraints}
+
+
+def _json_value(value):
+    """A record given as JSON text, possibly in a code fence, or as is."""
+    if not isinstance(value, str):
+        return value
+    try:
+        return json.loads(re.sub(r"^```(?:json)?\s*|\s*```$", "", value.strip()))
+    except json.JSONDecodeError:
+        return None
+
+
+async def load_roster():
+    """Every user with constraints, as the solver's users: {"user_id", "constraints", "preferences"}."""
+    records = await user_records_cache.records.fetch_all("constraints", "preferences")
+    roster = []
+    for user_id, user_records in sorted(records.items()):
+        constraints = _json_value(user_records["constraints"])
+        if isinstance(constraints, dict):
+            roster.append(
+                {
+                    "user_id": user_id,
+                    "constraints": constraints,
+                    "preferences": _json_value(user_records["preferences"]) or [],
+                }
+            )
+    return roster
+
+
+async def save_preferences(user_id, preferences):
+    """Save the categorizer's category/preference pairs of a user, given as a list or JSON text."""
+    preferences = _json_value(preferences)
+    if user_id and isinstance(preferences, list):
+        await user_records_cache.save(user_id, preferences=preferences)
+
+
+async def save_categorizer_output_callback(callback_context: CallbackContext):
+    """
+    Saves the category/preference pairs in state['categorizer_output'] to the Database after the
+    categorizer agent runs, for the manager agent's solver.
+    """
+    await save_preferences(callback_context.state.get("user_id"), callback_context.state.get("categorizer_output"))
+    return None
+
+
+async def save_constraints(user_id, constraints):
+    """Save the chatbot's constraints of a user, already validated against its output schema."""
+    if user_id and isinstance(constraints, dict):
+        await user_records_cache.save(user_id, constraints=constraints)
@@ -0,0 +1,64 @@
+import asyncio
+from datetime import date
+
+from google.adk.tools.tool_context import ToolContext
+
+from ..scheduling.dates import parse_date
+from .user_constraints import user_records_cache
+
+# Number of similar names suggested when no user has the requested name
+MAX_NAME_SUGGESTIONS = 5
+
+
+def _sorted_duties(duties):
+    def date_key(day):
+        try:
+            return parse_date(day)
+        except ValueError:
+            return date.max
+
+    return [{"date": day, "duty_title": duties[day]} for day in sorted(duties, key=date_key)]
+
+
+async def user_duties_tool(user_name: str, tool_context: ToolContext) -> dict:
+    """
+    Fetches the assigned duties of a user by the user's full name.
+    If no user has that name, returns the users with the most similar names to choose from.
+    A "system_user" may only fetch his own duties.
+
+    Args:
+        user_name: The full name of the user, e.g. "Eyal Cohen"
+    """
+    state = tool_context.state
+    names = await user_records_cache.names()
+    user_ids = names.lookup(user_name)
+    if state.get("user_role") != "system_admin":
+        # Checked by id, another user may have the same name
+        current_user_id = state.get("user_id")
+        if current_user_id not in user_ids:
+            return {
+                "status": "error",
+                "message": "Only a system_admin can view other users' duties.",
+            }
+        user_ids = [current_user_id]
+
+    if not user_ids:
+        suggestions = names.similar(user_name, MAX_NAME_SUGGESTIONS)
+        return {
+            "status": "not_found",
+            "message": f"No user is named {user_name}.",
+            "similar_names": [{"user_id": user_id, "user_name": name} for user_id, name, _ in suggestions],
+        }
+
+    duties = await asyncio.gather(*(user_records_cache.get("duties", user_id) for user_id in user_ids))
+    return {
+        "status": "success",
+        "users": [
+            {
+                "user_id": user_id,
+                "user_name": names.name(user_id),
+                "duties": _sorted_duties(user_duties or {}),
+            }
+            for user_id, user_duties in zip(user_ids, duties)
+        ],
+    }
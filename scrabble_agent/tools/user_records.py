@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+
+# The users' Database, its path is configurable from .env
+USERS_DB_PATH = os.getenv("USERS_DB_PATH", "scrabble_users.db")
+
+# The records kept for every user: the chatbot's constraints, the categorizer's
+# category/preference pairs and the assigned duties, {"dd/mm/yyyy": duty_title}
+RECORD_KINDS = ("user_role", "user_name", "user_shifts", "constraints", "preferences", "duties")
+
+# Number of recent writes logged for the caches of other processes, a cache further behind is cleared
+USER_CHANGES_KEPT = int(os.getenv("USER_CHANGES_KEPT", "10000"))
+
+
+class UserRecords:
+    """The users' roles, names, shifts and constraints, stored in SQLite.
+
+    The records are JSON encoded, and every call runs in a worker thread so
+    the event loop never waits for the disk. Every write is logged in the
+    user_changes table, which changes() reads, so processes sharing the
+    Database can tell which of their cached records another one wrote.
+    """
+
+    def __init__(self, db_path=USERS_DB_PATH):
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "user_id TEXT PRIMARY KEY, user_role TEXT, user_shifts TEXT, constraints TEXT)"
+            )
+            # Databases created before a record kind was added get its column
+            columns = {row[1] for row in self._connection.execute("PRAGMA table_info(users)")}
+            for kind in RECORD_KINDS:
+                if kind not in columns:
+                    self._connection.execute(f"ALTER TABLE users ADD COLUMN {kind} TEXT")
+            # A NULL user_id is a write of the record of every user
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS user_changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, kind TEXT)"
+            )
+        self._data_version = None
+
+    def _fetch(self, kind, user_id):
+        if kind not in RECORD_KINDS:
+            raise ValueError(f"Unknown user record {kind!r}")
+        with self._lock:
+            row = self._connection.execute(f"SELECT {kind} FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] is not None else None
+
+    def _save(self, user_id, records):
+        kinds = [kind for kind in RECORD_KINDS if kind in records]
+        values = [json.dumps(records[kind]) for kind in kinds]
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (user_id,))
+            self._connection.execute(
+                f"UPDATE users SET {', '.join(f'{kind} = ?' for kind in kinds)} WHERE user_id = ?",
+                (*values, user_id),
+            )
+            self._log_changes([(user_id, kind) for kind in kinds])
+
+    def _fetch_all(self, kinds):
+        for kind in kinds:
+            if kind not in RECORD_KINDS:
+                raise ValueError(f"Unknown user record {kind!r}")
+        with self._lock:
+            rows = self._connection.execute(f"SELECT user_id, {', '.join(kinds)} FROM users").fetchall()
+        return {
+            row[0]: {kind: json.loads(value) if value is not None else None for kind, value in zip(kinds, row[1:])}
+            for row in rows
+        }
+
+    def _save_all(self, kind, values, replace):
+        if kind not in RECORD_KINDS:
+            raise ValueError(f"Unknown user record {kind!r}")
+        with self._lock, self._connection:
+            if replace:
+                self._connection.execute(f"UPDATE users SET {kind} = NULL")
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO users (user_id) VALUES (?)", [(user_id,) for user_id in values]
+            )
+            self._connection.executemany(
+                f"UPDATE users SET {kind} = ? WHERE user_id = ?",
+                [(json.dumps(value), user_id) for user_id, value in values.items()],
+            )
+            self._log_changes([(None, kind)] if replace else [(user_id, kind) for user_id in values])
+
+    def _log_changes(self, changes):
+        self._connection.executemany("INSERT INTO user_changes (user_id, kind) VALUES (?, ?)", changes)
+        self._connection.execute(
+            "DELETE FROM user_changes WHERE seq <= (SELECT MAX(seq) FROM user_changes) - ?", (USER_CHANGES_KEPT,)
+        )
+
+    def _changes(self, after):
+        with self._lock:
+            # Only changes when another connection committed, so checking costs no read of the tables
+            data_version = self._connection.execute("PRAGMA data_version").fetchone()[0]
+            if after is not None and data_version == self._data_version:
+                return None
+            self._data_version = data_version
+            latest, oldest = self._connection.execute("SELECT MAX(seq), MIN(seq) FROM user_changes").fetchone()
+            if after is None or latest is None:
+                return latest or 0, []
+            if oldest > after + 1:
+                return latest, None
+            rows = self._connection.execute(
+                "SELECT user_id, kind FROM user_changes WHERE seq > ? ORDER BY seq", (after,)
+            ).fetchall()
+        return latest, rows
+
+    async def fetch(self, kind, user_id):
+        """One record of a user, None if the user or the record does not exist."""
+        return await asyncio.to_thread(self._fetch, kind, user_id)
+
+    async def save(self, user_id, **records):
+        """Create or update the given records of a user."""
+        if records:
+            await asyncio.to_thread(self._save, user_id, records)
+
+    async def fetch_all(self, *kinds):
+        """The given records of every user, {user_id: {kind: record}}."""
+        return await asyncio.to_thread(self._fetch_all, kinds)
+
+    async def save_all(self, kind, values, replace=False):
+        """Save one record of many users in one transaction, {user_id: record}.
+
+        With replace, the record of every other user is cleared.
+        """
+        await asyncio.to_thread(self._save_all, kind, values, replace)
+
+    async def changes(self, after):
+        """The records written since the change numbered `after`.
+
+        Returns:
+            None if no other connection wrote to the Database since the last
+            call, else the latest change number and a list of (user_id, kind)
+            written after `after`, user_id None for every user. The list is
+            None if the writes are no longer all logged. With `after` None,
+            only the latest change number.
+        """
+        return await asyncio.to_thread(self._changes, after)
+
+    def close(self):
+        self._connection.close()
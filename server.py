@@ -0,0 +1,264 @@
+import asyncio
+import os
+import socket
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+
+# Load .env before the agents read their configuration from the environment
+load_dotenv()
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Response, WebSocket, WebSocketDisconnect
+from google.adk.runners import Runner
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+from pydantic import BaseModel, Field, ValidationError
+
+from ring_epoch import RingEpochMiddleware
+from scrabble_agent.agent import scrabble_agent
+from scrabble_agent.telemetry import setup_tracing
+from scrabble_agent.tools import prefetch_user, report_outbox, user_records_cache
+from scrabble_agent.response_cache import response_cache
+from sqlite_session_service import SqliteSessionService
+from utils import add_user_query_to_history, call_agent_async, create_session_with_history, event_text
+
+APP_NAME = "ScrabbleAI"
+
+session_service = SqliteSessionService(os.getenv("SESSION_DB_PATH", "scrabble_sessions.db"))
+# Write every turn to the database before answering it, so another process can take the session over
+SESSION_DURABLE_TURNS = os.getenv("SESSION_DURABLE_TURNS", "0") == "1"
+# Seconds a durable turn holds its session against other processes, renewed while it runs
+SESSION_LEASE_SECONDS = float(os.getenv("SESSION_LEASE_SECONDS", "30"))
+LEASE_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+runner = Runner(agent=scrabble_agent, app_name=APP_NAME, session_service=session_service)
+
+
+class SessionLocks:
+    """One lock per session, so turns of a session run in the order they arrive.
+
+    Turns of different sessions run concurrently on the event loop. A lock is
+    dropped once no turn holds or waits for it.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._users = {}
+
+    @asynccontextmanager
+    async def hold(self, session_id):
+        lock = self._locks.setdefault(session_id, asyncio.Lock())
+        self._users[session_id] = self._users.get(session_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._users[session_id] -= 1
+            if not self._users[session_id]:
+                del self._users[session_id]
+                del self._locks[session_id]
+
+
+session_locks = SessionLocks()
+
+
+@asynccontextmanager
+async def session_lease(user_id, session_id):
+    """Hold the session's lease in the database, so no other process runs a turn on it meanwhile.
+
+    Only durable turns take the lease, their sessions may be handed to another process.
+    """
+    if not SESSION_DURABLE_TURNS:
+        yield
+        return
+    while not await session_service.acquire_lease(APP_NAME, user_id, session_id, LEASE_OWNER, SESSION_LEASE_SECONDS):
+        await asyncio.sleep(0.05)
+
+    done = asyncio.Event()
+
+    async def renew():
+        while True:
+            try:
+                await asyncio.wait_for(done.wait(), SESSION_LEASE_SECONDS / 3)
+                return
+            except asyncio.TimeoutError:
+                await session_service.acquire_lease(APP_NAME, user_id, session_id, LEASE_OWNER, SESSION_LEASE_SECONDS)
+
+    # Stopped rather than cancelled, so a renewal in flight cannot land after the release
+    renewer = asyncio.create_task(renew())
+    try:
+        yield
+    finally:
+        done.set()
+        await renewer
+        await session_service.release_lease(APP_NAME, user_id, session_id, LEASE_OWNER)
+
+
+# ---- Define Request Schemas ----
+class CreateSessionRequest(BaseModel):
+    user_id: str = Field(description="The id of the user, whose role and name are taken from the Database")
+    user_gender: str = Field(default="", description="The gender of the user")
+    user_shifts: list = Field(default_factory=list, description="The user's current shifts, if none are stored")
+
+
+class MessageRequest(BaseModel):
+    user_id: str = Field(description="The id of the user")
+    message: str = Field(description="The user's message")
+
+
+class SocketMessage(BaseModel):
+    message: str = Field(description="The user's message")
+
+
+async def run_turn(user_id, session_id, message, on_event=None):
+    """Run one user turn, after any earlier turn of the same session."""
+    async with session_locks.hold(session_id), session_lease(user_id, session_id):
+        add_user_query_to_history(session_service, APP_NAME, user_id, session_id, message)
+        response = await call_agent_async(runner, user_id, session_id, message, on_event)
+        if SESSION_DURABLE_TURNS:
+            await asyncio.to_thread(session_service.flush)
+        return response
+
+
+async def get_session_or_404(user_id, session_id):
+    session = await session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+def drop_cached_sessions():
+    """Forget the cached sessions, other workers may have changed them.
+
+    The user records need no clearing, their cache drops what other workers write.
+    """
+    session_service.clear_cache()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    setup_tracing()
+    # Deliver the reports an earlier run left in the outbox
+    report_outbox.start()
+    # Index the users' names before the first lookup needs them
+    await user_records_cache.names()
+    yield
+    await report_outbox.stop()
+    # Write any buffered session changes before exiting
+    await session_service.close()
+
+
+app = FastAPI(title="ScrabbleAI", lifespan=lifespan)
+# Behind the cluster router, users move between workers when the ring changes
+app.add_middleware(RingEpochMiddleware, on_change=drop_cached_sessions)
+
+
+@app.post("/sessions")
+async def create_session(request: CreateSessionRequest):
+    """Create a session for a user registered in the Database."""
+    # Warms the cache, later lookups in the session are served from it
+    user_records = await prefetch_user(request.user_id)
+    if user_records["user_role"] is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    session = await create_session_with_history(
+        session_service,
+        APP_NAME,
+        request.user_id,
+        {
+            "user_id": request.user_id,
+            "user_name": user_records["user_name"] or "",
+            "user_role": user_records["user_role"],
+            "user_gender": request.user_gender,
+            "user_shifts": user_records["user_shifts"] or request.user_shifts,
+        },
+    )
+    return {"session_id": session.id}
+
+
+@app.post("/sessions/{session_id}/messages")
+async def send_message(session_id: str, request: MessageRequest):
+    """Send a message and wait for the agent's final response."""
+    await get_session_or_404(request.user_id, session_id)
+    response = await run_turn(request.user_id, session_id, request.message)
+    return {"response": response}
+
+
+@app.websocket("/sessions/{session_id}/ws")
+async def session_websocket(websocket: WebSocket, session_id: str, user_id: str):
+    """Stream the runner events of every message sent on the socket.
+
+    The client sends {"message": "..."} and receives one JSON object per event,
+    {"author", "text", "partial", "final"}, ending with {"done": true, "response"}.
+    Partial events carry the next chunk of a streamed response, the following
+    event of the same author carries the whole response text. A frame that is
+    not such an object is answered with {"error", "detail"}, and the socket
+    stays open.
+    """
+    await websocket.accept()
+    session = await session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+    if session is None:
+        await websocket.close(code=4404, reason="Session not found")
+        return
+
+    async def send_event(event, final_response):
+        await websocket.send_json(
+            {
+                "author": event.author,
+                "text": event_text(event),
+                "partial": bool(event.partial),
+                "final": final_response is not None,
+            }
+        )
+
+    try:
+        while True:
+            try:
+                request = SocketMessage.model_validate_json(await websocket.receive_text())
+            except ValidationError as e:
+                detail = e.errors(include_url=False, include_context=False, include_input=False)
+                await websocket.send_json({"error": "Invalid message", "detail": detail})
+                continue
+            response = await run_turn(user_id, session_id, request.message, send_event)
+            await websocket.send_json({"done": True, "response": response})
+    except WebSocketDisconnect:
+        pass
+
+
+@app.get("/reports/{ticket}")
+async def report_delivery(ticket: str):
+    """The delivery of a report to each admin, by the ticket send_report_tool returned."""
+    deliveries = await report_outbox.status(ticket)
+    if not deliveries:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return {"ticket": ticket, "deliveries": deliveries}
+
+
+@app.get("/health")
+async def health():
+    """Answers once the app has started, for the cluster router's health checks."""
+    return {"status": "ok"}
+
+
+@app.get("/cache/metrics")
+async def cache_metrics():
+    """Hit rate, size and latency saved of the model response cache."""
+    return response_cache.metrics()
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: turn and per-agent latency, tokens, transfers and tool calls.
+
+    Behind the cluster router, the metrics of every worker together.
+    """
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def main():
+    uvicorn.run(app, host=os.getenv("HOST", "127.0.0.1"), port=int(os.getenv("PORT", "8000")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,685 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import ListSessionsResponse
+from google.adk.sessions.state import State
+from sqlalchemy import (
+    JSON,
+    Column,
+    Float,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    create_engine,
+    delete,
+    event as sqlalchemy_event,
+    insert,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from utils import InteractionHistory
+
+metadata = MetaData()
+
+sessions_table = Table(
+    "sessions",
+    metadata,
+    Column("app_name", String, primary_key=True),
+    Column("user_id", String, primary_key=True),
+    Column("id", String, primary_key=True),
+    Column("state", JSON, nullable=False),
+    Column("update_time", Float, nullable=False),
+)
+
+events_table = Table(
+    "events",
+    metadata,
+    Column("seq", Integer, primary_key=True, autoincrement=True),
+    Column("app_name", String, nullable=False),
+    Column("user_id", String, nullable=False),
+    Column("session_id", String, nullable=False),
+    Column("timestamp", Float, nullable=False),
+    Column("event", Text, nullable=False),
+    Index("ix_events_session", "app_name", "user_id", "session_id", "seq"),
+)
+
+# interaction_history is kept out of the session state, one row per entry,
+# so it can be appended to without rewriting the state and loaded lazily
+history_table = Table(
+    "interaction_history",
+    metadata,
+    Column("seq", Integer, primary_key=True, autoincrement=True),
+    Column("app_name", String, nullable=False),
+    Column("user_id", String, nullable=False),
+    Column("session_id", String, nullable=False),
+    Column("entry", JSON, nullable=False),
+    Index("ix_history_session", "app_name", "user_id", "session_id", "seq"),
+)
+
+app_states_table = Table(
+    "app_states",
+    metadata,
+    Column("app_name", String, primary_key=True),
+    Column("state", JSON, nullable=False),
+)
+
+user_states_table = Table(
+    "user_states",
+    metadata,
+    Column("app_name", String, primary_key=True),
+    Column("user_id", String, primary_key=True),
+    Column("state", JSON, nullable=False),
+)
+
+# Which process runs a session's turns; expires is when another may take over
+session_leases_table = Table(
+    "session_leases",
+    metadata,
+    Column("app_name", String, primary_key=True),
+    Column("user_id", String, primary_key=True),
+    Column("session_id", String, primary_key=True),
+    Column("owner", String, nullable=False),
+    Column("previous_owner", String, nullable=False),
+    Column("expires", Float, nullable=False),
+)
+
+HISTORY_KEY = "interaction_history"
+
+
+class StoredInteractionHistory(InteractionHistory):
+    """An interaction history loaded from the database on first read.
+
+    Appends are queued as batched writes and never load the stored entries,
+    so a turn that only records the user's query costs no database read.
+    get_session loads the history in its worker thread, so the agents never
+    read the database on the event loop.
+    """
+
+    def __init__(self, service, key, entries=None):
+        super().__init__()
+        self._service = service
+        self._key = key
+        self._loaded = entries is not None
+        self._load_lock = threading.Lock()
+        for entry in entries or []:
+            InteractionHistory.append(self, entry)
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                for entry in self._service._load_history(self._key):
+                    InteractionHistory.append(self, entry)
+                self._loaded = True
+
+    def append(self, entry):
+        # An entry appended while loading is either in the loaded rows or appended after them
+        with self._load_lock:
+            self._service._queue_history(self._key, entry)
+            if self._loaded:
+                super().append(entry)
+
+    def read(self, cursor=0, limit=None):
+        self._ensure_loaded()
+        return super().read(cursor, limit)
+
+    def copy(self):
+        self._ensure_loaded()
+        return super().copy()
+
+    def __len__(self):
+        self._ensure_loaded()
+        return super().__len__()
+
+    def __iter__(self):
+        self._ensure_loaded()
+        return super().__iter__()
+
+    def __getitem__(self, index):
+        self._ensure_loaded()
+        return super().__getitem__(index)
+
+    def __str__(self):
+        self._ensure_loaded()
+        return super().__str__()
+
+    __repr__ = __str__
+
+
+class SqliteSessionService(BaseSessionService):
+    """A session service that persists sessions in SQLite.
+
+    - The database runs in WAL mode behind a connection pool, so reads never
+      wait for the batched writes.
+    - State deltas, events and history entries are buffered and written in one
+      transaction every flush_interval seconds or batch_size writes, and
+      before any read that needs them.
+    - state['interaction_history'] is stored one row per entry, appended to
+      without reading it and loaded by get_session; the histories of the most
+      recent sessions are kept in memory, up to max_cached_histories.
+    - Processes sharing the database take a session's lease before running a
+      turn on it; taking a lease another process held drops the cached history.
+
+    Args:
+        db_path: The path of the SQLite database file
+        pool_size: The number of pooled connections
+        batch_size: The number of buffered writes that triggers a flush
+        flush_interval: The maximum seconds a write stays buffered
+        max_cached_histories: The number of interaction histories kept in memory
+    """
+
+    def __init__(
+        self,
+        db_path="scrabble_sessions.db",
+        pool_size=5,
+        batch_size=100,
+        flush_interval=0.5,
+        max_cached_histories=1024,
+    ):
+        self.engine = create_engine(
+            f"sqlite:///{db_path}",
+            pool_size=pool_size,
+            connect_args={"check_same_thread": False, "timeout": 30},
+        )
+        sqlalchemy_event.listen(self.engine, "connect", self._configure_connection)
+        self._create_tables()
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_cached_histories = max_cached_histories
+
+        self._lock = threading.Lock()
+        # Held from taking the buffers until they are committed, so a read
+        # that flushes first also waits for a flush already in progress
+        self._flush_lock = threading.Lock()
+        self._pending_states = {}
+        self._pending_app_states = {}
+        self._pending_user_states = {}
+        self._pending_events = []
+        self._pending_history = []
+        self._histories = OrderedDict()
+        self._histories_lock = threading.Lock()
+        self._flusher = None
+
+    def _create_tables(self):
+        # IF NOT EXISTS, so processes sharing a new database can start at the same time
+        with self.engine.begin() as connection:
+            for table in metadata.sorted_tables:
+                connection.execute(CreateTable(table, if_not_exists=True))
+                for index in table.indexes:
+                    connection.execute(CreateIndex(index, if_not_exists=True))
+
+    @staticmethod
+    def _configure_connection(connection, _):
+        cursor = connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    # ---- Batched writes ----
+
+    def _pending_count(self):
+        return (
+            len(self._pending_states)
+            + len(self._pending_app_states)
+            + len(self._pending_user_states)
+            + len(self._pending_events)
+            + len(self._pending_history)
+        )
+
+    def _queue_history(self, key, entry):
+        with self._lock:
+            self._pending_history.append((key, entry))
+
+    def flush(self):
+        """Write every buffered change in one transaction.
+
+        If the transaction fails the changes are buffered again, before any
+        written since, and the error is raised.
+        """
+        with self._flush_lock:
+            with self._lock:
+                states, self._pending_states = self._pending_states, {}
+                app_states, self._pending_app_states = self._pending_app_states, {}
+                user_states, self._pending_user_states = self._pending_user_states, {}
+                events, self._pending_events = self._pending_events, []
+                history, self._pending_history = self._pending_history, []
+            if not (states or app_states or user_states or events or history):
+                return
+
+            try:
+                self._write_batch(states, app_states, user_states, events, history)
+            except Exception:
+                self._requeue(states, app_states, user_states, events, history)
+                raise
+
+    def _requeue(self, states, app_states, user_states, events, history):
+        """Put a batch that failed to commit back in front of the buffered writes."""
+        with self._lock:
+            for key, (delta, update_time) in states.items():
+                newer_delta, newer_time = self._pending_states.get(key, ({}, None))
+                self._pending_states[key] = ({**delta, **newer_delta}, newer_time or update_time)
+            for app_name, delta in app_states.items():
+                self._pending_app_states[app_name] = {**delta, **self._pending_app_states.get(app_name, {})}
+            for key, delta in user_states.items():
+                self._pending_user_states[key] = {**delta, **self._pending_user_states.get(key, {})}
+            self._pending_events[:0] = events
+            self._pending_history[:0] = history
+
+    def _write_batch(self, states, app_states, user_states, events, history):
+        with self.engine.begin() as connection:
+            for (app_name, user_id, session_id), (delta, update_time) in states.items():
+                row = connection.execute(
+                    select(sessions_table.c.state).where(
+                        sessions_table.c.app_name == app_name,
+                        sessions_table.c.user_id == user_id,
+                        sessions_table.c.id == session_id,
+                    )
+                ).first()
+                if row is None:
+                    continue
+                connection.execute(
+                    update(sessions_table)
+                    .where(
+                        sessions_table.c.app_name == app_name,
+                        sessions_table.c.user_id == user_id,
+                        sessions_table.c.id == session_id,
+                    )
+                    .values(state={**row.state, **delta}, update_time=update_time)
+                )
+            for app_name, delta in app_states.items():
+                self._merge_shared_state(connection, app_states_table, {"app_name": app_name}, delta)
+            for (app_name, user_id), delta in user_states.items():
+                self._merge_shared_state(
+                    connection, user_states_table, {"app_name": app_name, "user_id": user_id}, delta
+                )
+            if events:
+                connection.execute(insert(events_table), events)
+            if history:
+                connection.execute(
+                    insert(history_table),
+                    [
+                        {"app_name": app_name, "user_id": user_id, "session_id": session_id, "entry": entry}
+                        for (app_name, user_id, session_id), entry in history
+                    ],
+                )
+
+    @staticmethod
+    def _merge_shared_state(connection, table, key, delta):
+        conditions = [table.c[column] == value for column, value in key.items()]
+        row = connection.execute(select(table.c.state).where(*conditions)).first()
+        if row is None:
+            connection.execute(insert(table).values(**key, state=delta))
+        else:
+            connection.execute(update(table).where(*conditions).values(state={**row.state, **delta}))
+
+    async def _flush_periodically(self):
+        while self._pending_count():
+            await asyncio.sleep(self.flush_interval)
+            await asyncio.to_thread(self.flush)
+        self._flusher = None
+
+    async def _after_write(self):
+        if self._pending_count() >= self.batch_size:
+            await asyncio.to_thread(self.flush)
+        elif self._flusher is None:
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_periodically())
+
+    async def close(self):
+        """Flush the buffered writes and close the connection pool."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await asyncio.to_thread(self.flush)
+        self.engine.dispose()
+
+    # ---- Interaction history ----
+
+    def _load_history(self, key):
+        self.flush()
+        app_name, user_id, session_id = key
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                select(history_table.c.entry)
+                .where(
+                    history_table.c.app_name == app_name,
+                    history_table.c.user_id == user_id,
+                    history_table.c.session_id == session_id,
+                )
+                .order_by(history_table.c.seq)
+            )
+            return [row.entry for row in rows]
+
+    def _cache_history(self, key, history):
+        with self._histories_lock:
+            self._histories[key] = history
+            self._histories.move_to_end(key)
+            while len(self._histories) > self.max_cached_histories:
+                self._histories.popitem(last=False)
+        return history
+
+    def clear_cache(self):
+        """Drop the cached interaction histories, they are read again from the database.
+
+        For when other processes sharing the database may have written the
+        sessions this process has cached.
+        """
+        with self._histories_lock:
+            self._histories.clear()
+
+    def get_interaction_history(self, app_name, user_id, session_id):
+        """Get the interaction history of a session without loading it."""
+        key = (app_name, user_id, session_id)
+        with self._histories_lock:
+            history = self._histories.get(key)
+        if history is None:
+            history = StoredInteractionHistory(self, key)
+        return self._cache_history(key, history)
+
+    # ---- Session leases ----
+
+    def _lease_conditions(self, key):
+        app_name, user_id, session_id = key
+        return (
+            session_leases_table.c.app_name == app_name,
+            session_leases_table.c.user_id == user_id,
+            session_leases_table.c.session_id == session_id,
+        )
+
+    def _acquire_lease(self, key, owner, ttl):
+        app_name, user_id, session_id = key
+        now = time.time()
+        with self.engine.begin() as connection:
+            connection.execute(
+                sqlite_insert(session_leases_table)
+                .values(
+                    app_name=app_name, user_id=user_id, session_id=session_id, owner="", previous_owner="", expires=0
+                )
+                .on_conflict_do_nothing()
+            )
+            row = connection.execute(
+                update(session_leases_table)
+                .where(
+                    *self._lease_conditions(key),
+                    or_(session_leases_table.c.owner == owner, session_leases_table.c.expires <= now),
+                )
+                .values(previous_owner=session_leases_table.c.owner, owner=owner, expires=now + ttl)
+                .returning(session_leases_table.c.previous_owner)
+            ).first()
+        if row is None:
+            return False
+        if row.previous_owner != owner:
+            # Another process may have run turns on the session since we cached it
+            with self._histories_lock:
+                self._histories.pop(key, None)
+        return True
+
+    def _release_lease(self, key, owner):
+        with self.engine.begin() as connection:
+            connection.execute(
+                update(session_leases_table)
+                .where(*self._lease_conditions(key), session_leases_table.c.owner == owner)
+                .values(expires=0)
+            )
+
+    async def acquire_lease(self, app_name, user_id, session_id, owner, ttl):
+        """Take or renew the lease on a session, unless another owner holds it.
+
+        Args:
+            app_name: The application name
+            user_id: The user ID
+            session_id: The session ID
+            owner: Who takes the lease, unique per process
+            ttl: The seconds the lease lasts unless renewed
+
+        Returns:
+            Whether the lease was taken
+        """
+        return await asyncio.to_thread(self._acquire_lease, (app_name, user_id, session_id), owner, ttl)
+
+    async def release_lease(self, app_name, user_id, session_id, owner):
+        """Release a lease taken with acquire_lease, if the owner still holds it."""
+        await asyncio.to_thread(self._release_lease, (app_name, user_id, session_id), owner)
+
+    # ---- BaseSessionService ----
+
+    @staticmethod
+    def _split_state(state):
+        """Split a state into session, app and user state, dropping temp keys."""
+        session_state, app_state, user_state = {}, {}, {}
+        for key, value in state.items():
+            if key == HISTORY_KEY or key.startswith(State.TEMP_PREFIX):
+                continue
+            if key.startswith(State.APP_PREFIX):
+                app_state[key.removeprefix(State.APP_PREFIX)] = value
+            elif key.startswith(State.USER_PREFIX):
+                user_state[key.removeprefix(State.USER_PREFIX)] = value
+            else:
+                session_state[key] = value
+        return session_state, app_state, user_state
+
+    def _create_session_impl(self, app_name, user_id, state, session_id, update_time):
+        session_state, app_state, user_state = self._split_state(state)
+        history = state.get(HISTORY_KEY)
+        entries = list(history) if history is not None else []
+        with self.engine.begin() as connection:
+            connection.execute(
+                insert(sessions_table).values(
+                    app_name=app_name,
+                    user_id=user_id,
+                    id=session_id,
+                    state=session_state,
+                    update_time=update_time,
+                )
+            )
+            if app_state:
+                self._merge_shared_state(connection, app_states_table, {"app_name": app_name}, app_state)
+            if user_state:
+                self._merge_shared_state(
+                    connection, user_states_table, {"app_name": app_name, "user_id": user_id}, user_state
+                )
+            if entries:
+                connection.execute(
+                    insert(history_table),
+                    [
+                        {"app_name": app_name, "user_id": user_id, "session_id": session_id, "entry": entry}
+                        for entry in entries
+                    ],
+                )
+        key = (app_name, user_id, session_id)
+        return self._cache_history(key, StoredInteractionHistory(self, key, entries))
+
+    async def create_session(self, *, app_name, user_id, state=None, session_id=None):
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        update_time = time.time()
+        await asyncio.to_thread(
+            self._create_session_impl, app_name, user_id, state or {}, session_id, update_time
+        )
+        return await self.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+
+    def _get_session_impl(self, app_name, user_id, session_id, config):
+        self.flush()
+        with self.engine.connect() as connection:
+            row = connection.execute(
+                select(sessions_table).where(
+                    sessions_table.c.app_name == app_name,
+                    sessions_table.c.user_id == user_id,
+                    sessions_table.c.id == session_id,
+                )
+            ).first()
+            if row is None:
+                return None
+
+            query = select(events_table.c.event).where(
+                events_table.c.app_name == app_name,
+                events_table.c.user_id == user_id,
+                events_table.c.session_id == session_id,
+            )
+            if config and config.after_timestamp:
+                query = query.where(events_table.c.timestamp >= config.after_timestamp)
+            if config and config.num_recent_events:
+                query = query.order_by(events_table.c.seq.desc()).limit(config.num_recent_events)
+                events = [Event.model_validate_json(event) for event in connection.execute(query).scalars()][::-1]
+            else:
+                query = query.order_by(events_table.c.seq)
+                events = [Event.model_validate_json(event) for event in connection.execute(query).scalars()]
+
+            app_state = connection.execute(
+                select(app_states_table.c.state).where(app_states_table.c.app_name == app_name)
+            ).scalar()
+            user_state = connection.execute(
+                select(user_states_table.c.state).where(
+                    user_states_table.c.app_name == app_name,
+                    user_states_table.c.user_id == user_id,
+                )
+            ).scalar()
+
+        state = dict(row.state)
+        for key, value in (app_state or {}).items():
+            state[State.APP_PREFIX + key] = value
+        for key, value in (user_state or {}).items():
+            state[State.USER_PREFIX + key] = value
+        history = self.get_interaction_history(app_name, user_id, session_id)
+        history._ensure_loaded()
+        state[HISTORY_KEY] = history
+        return Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=state,
+            events=events,
+            last_update_time=row.update_time,
+        )
+
+    async def get_session(self, *, app_name, user_id, session_id, config=None):
+        return await asyncio.to_thread(self._get_session_impl, app_name, user_id, session_id, config)
+
+    def _list_sessions_impl(self, app_name, user_id):
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                select(sessions_table.c.id, sessions_table.c.update_time).where(
+                    sessions_table.c.app_name == app_name,
+                    sessions_table.c.user_id == user_id,
+                )
+            )
+            return ListSessionsResponse(
+                sessions=[
+                    Session(app_name=app_name, user_id=user_id, id=row.id, last_update_time=row.update_time)
+                    for row in rows
+                ]
+            )
+
+    async def list_sessions(self, *, app_name, user_id):
+        return await asyncio.to_thread(self._list_sessions_impl, app_name, user_id)
+
+    def _delete_session_impl(self, app_name, user_id, session_id):
+        self.flush()
+        with self._histories_lock:
+            self._histories.pop((app_name, user_id, session_id), None)
+        with self.engine.begin() as connection:
+            for table, id_column in (
+                (sessions_table, sessions_table.c.id),
+                (events_table, events_table.c.session_id),
+                (history_table, history_table.c.session_id),
+            ):
+                connection.execute(
+                    delete(table).where(table.c.app_name == app_name, table.c.user_id == user_id, id_column == session_id)
+                )
+
+    async def delete_session(self, *, app_name, user_id, session_id):
+        await asyncio.to_thread(self._delete_session_impl, app_name, user_id, session_id)
+
+    async def append_event(self, session, event):
+        if event.partial:
+            return event
+        await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+
+        key = (session.app_name, session.user_id, session.id)
+        delta = event.actions.state_delta if event.actions and event.actions.state_delta else {}
+        session_delta, app_delta, user_delta = self._split_state(delta)
+        with self._lock:
+            pending_delta, _ = self._pending_states.get(key, ({}, None))
+            self._pending_states[key] = ({**pending_delta, **session_delta}, event.timestamp)
+            if app_delta:
+                self._pending_app_states.setdefault(session.app_name, {}).update(app_delta)
+            if user_delta:
+                self._pending_user_states.setdefault((session.app_name, session.user_id), {}).update(user_delta)
+            self._pending_events.append(
+                {
+                    "app_name": session.app_name,
+                    "user_id": session.user_id,
+                    "session_id": session.id,
+                    "timestamp": event.timestamp,
+                    "event": event.model_dump_json(exclude_none=True),
+                }
+            )
+
+        # A tool that replaced the history with a plain list, keep the new entries
+        replaced_history = delta.get(HISTORY_KEY)
+        if isinstance(replaced_history, list):
+            history = self.get_interaction_history(*key)
+            for entry in replaced_history[len(history) :]:
+                history.append(entry)
+            session.state[HISTORY_KEY] = history
+
+        await self._after_write()
+        return event
+
+    # ---- Migration ----
+
+    async def import_session(self, session):
+        """Copy a session, with its events and history, into the database."""
+        await asyncio.to_thread(
+            self._create_session_impl,
+            session.app_name,
+            session.user_id,
+            session.state,
+            session.id,
+            session.last_update_time,
+        )
+        with self._lock:
+            self._pending_events.extend(
+                {
+                    "app_name": session.app_name,
+                    "user_id": session.user_id,
+                    "session_id": session.id,
+                    "timestamp": event.timestamp,
+                    "event": event.model_dump_json(exclude_none=True),
+                }
+                for event in session.events
+            )
+        await self._after_write()
+
+
+async def migrate_from_memory(memory_service, sqlite_service):
+    """Copy every session of an InMemorySessionService into a SqliteSessionService.
+
+    Returns:
+        The number of sessions copied
+    """
+    copied = 0
+    for app_name, users in memory_service.sessions.items():
+        for user_id, sessions in users.items():
+            for session_id in sessions:
+                # get_session merges the app and user state into the copy
+                session = await memory_service.get_session(
+                    app_name=app_name, user_id=user_id, session_id=session_id
+                )
+                await sqlite_service.import_session(session)
+                copied += 1
+    await asyncio.to_thread(sqlite_service.flush)
+    return copied
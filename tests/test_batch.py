@@ -0,0 +1,53 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from google.adk.events import Event, EventActions
+from google.adk.sessions import InMemorySessionService
+
+import batch
+from scrabble_agent.tools import user_constraints
+from scrabble_agent.tools.user_constraints import ReadThroughCache
+from scrabble_agent.tools.user_records import UserRecords
+
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    cache = ReadThroughCache(UserRecords(tmp_path / "users.db"))
+    monkeypatch.setattr(user_constraints, "user_records_cache", cache)
+    asyncio.run(cache.save("u1", user_role="system_user", user_name="Eyal Cohen"))
+    yield SimpleNamespace(session_service=InMemorySessionService())
+    cache.records.close()
+
+
+def answer_with(monkeypatch, reply):
+    async def call_agent_async(runner, user_id, session_id, message, **kwargs):
+        service = runner.session_service
+        session = await service.get_session(app_name=batch.APP_NAME, user_id=user_id, session_id=session_id)
+        delta = {"chatbot_output_schema": reply}
+        await service.append_event(session, Event(author="chatbot_agent", actions=EventActions(state_delta=delta)))
+
+    monkeypatch.setattr(batch, "call_agent_async", call_agent_async)
+
+
+def test_unknown_user_is_rejected(runner, monkeypatch):
+    answer_with(monkeypatch, '{"good_days": ["01/06/2026"]}')
+    record = asyncio.run(batch.ingest_submission(runner, {"user_id": "u2", "user_role": "system_admin", "messages": ["hi"]}))
+    assert record["status"] == "not_found"
+
+
+def test_role_comes_from_the_database(runner, monkeypatch):
+    answer_with(monkeypatch, '{"good_days": ["01/06/2026"]}')
+    record = asyncio.run(batch.ingest_submission(runner, {"user_id": "u1", "user_role": "system_admin", "messages": ["hi"]}))
+    session = asyncio.run(
+        runner.session_service.get_session(app_name=batch.APP_NAME, user_id="u1", session_id=record["session_id"])
+    )
+    assert session.state["user_role"] == "system_user"
+    assert record["status"] == "success"
+    assert record["chatbot_output_schema"]["fullname"] == "Eyal Cohen"
+
+
+def test_question_is_incomplete(runner, monkeypatch):
+    answer_with(monkeypatch, "Eyal Cohen, why can't you work on the 5th?")
+    record = asyncio.run(batch.ingest_submission(runner, {"user_id": "u1", "messages": ["I can't work on the 5th"]}))
+    assert record["status"] == "incomplete"
@@ -0,0 +1,27 @@
+from scrabble_agent.sub_agents.categorizer_agent.classifier import classifier
+
+
+def test_plain_cues_are_categorized_locally():
+    result = classifier.categorize(["I am allergic to cleaning materials", "I love cooking"])
+    assert result["unresolved"] == []
+    assert result["preferences"] == [
+        {"category": "cleaning", "preference": "avoid"},
+        {"category": "kitchen", "preference": "prefer"},
+    ]
+
+
+def test_exceptions_go_to_the_llm():
+    constraints = [
+        "I'm fine with anything except cleaning",
+        "I like every duty but not guarding",
+        "No problem with driving",
+        "I'd like office work rather than kitchen shifts",
+    ]
+    for constraint in constraints:
+        result = classifier.categorize([constraint])
+        assert result["unresolved"] == [constraint], constraint
+
+
+def test_category_after_an_exception_has_no_confidence():
+    results = {result["category"]: result for result in classifier.classify("I'm fine with anything except cleaning")}
+    assert results["cleaning"]["confidence"] == 0.0
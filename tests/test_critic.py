@@ -0,0 +1,41 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from scrabble_agent.sub_agents.critic_agent import agent as critic
+from scrabble_agent.tools import DUTY_HORIZON_KEY, assignments, user_constraints
+from scrabble_agent.tools.user_constraints import ReadThroughCache
+from scrabble_agent.tools.user_records import UserRecords
+
+
+@pytest.fixture
+def schedule(tmp_path, monkeypatch):
+    cache = ReadThroughCache(UserRecords(tmp_path / "users.db"))
+    monkeypatch.setattr(user_constraints, "user_records_cache", cache)
+    monkeypatch.setattr(assignments, "user_records_cache", cache)
+    monkeypatch.setattr(
+        critic, "load_duty_requirements", lambda: [{"duty_title": "Gate guard", "category": "guarding", "headcount": 1}]
+    )
+    constraints = {"fullname": "Eyal Cohen", "good_days": [], "bad_days": [], "other": []}
+    asyncio.run(cache.save("u1", constraints=constraints, duties={"01/06/2026": "Gate guard"}))
+    yield
+    cache.records.close()
+
+
+def check(role):
+    state = {"user_role": role, DUTY_HORIZON_KEY: {"start_date": "01/06/2026", "horizon_days": 120}}
+    return asyncio.run(critic.check_assignments_tool(SimpleNamespace(state=state))), state
+
+
+def test_only_the_admin_can_check(schedule):
+    result, state = check("system_user")
+    assert result["status"] == "error"
+    assert "critic_report" not in state
+
+
+def test_state_keeps_only_the_summary(schedule):
+    result, state = check("system_admin")
+    assert result["status"] == "success"
+    assert sum(result["hard_violation_counts"].values()) > critic.MAX_REPORTED_VIOLATIONS
+    assert len(state["critic_report"]["hard_violations"]) == critic.MAX_REPORTED_VIOLATIONS
@@ -0,0 +1,28 @@
+from datetime import date
+
+import pytest
+
+from scrabble_agent.scheduling.dates import parse_date, parse_date_entry
+from scrabble_agent.sub_agents.chatbot_agent.agent import validate_dates_tool
+
+
+def test_parse_date_accepts_the_entry_formats():
+    for text in ("02/06/2026", "2/6/2026", "02.06.2026"):
+        assert parse_date(text) == parse_date_entry(text)[0] == date(2026, 6, 2)
+
+
+def test_parse_date_explains_impossible_dates():
+    with pytest.raises(ValueError, match="February 2026 has only 28 days"):
+        parse_date("31/02/2026")
+    with pytest.raises(ValueError):
+        parse_date("02/06/2026 - 04/06/2026")
+
+
+def test_validate_dates_returns_one_result_per_entry():
+    result = validate_dates_tool(["05.06.2026", "04-05/06/2026", "31/06/2026"], "")
+    assert result["status"] == "error"
+    assert [entry.get("normalized") for entry in result["results"]] == [
+        "05/06/2026",
+        "04/06/2026 - 05/06/2026",
+        None,
+    ]
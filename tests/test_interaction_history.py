@@ -0,0 +1,31 @@
+import asyncio
+import gc
+
+from google.adk.sessions import InMemorySessionService
+
+from utils import _interaction_histories, add_user_query_to_history, create_session_with_history
+
+
+def test_history_is_shared_with_the_session_state():
+    async def run():
+        service = InMemorySessionService()
+        session = await create_session_with_history(service, "app", "user_1", {"user_name": "User"})
+        add_user_query_to_history(service, "app", "user_1", session.id, "hello")
+        stored = await service.get_session(app_name="app", user_id="user_1", session_id=session.id)
+        return [entry["query"] for entry in stored.state["interaction_history"]]
+
+    assert asyncio.run(run()) == ["hello"]
+
+
+def test_history_is_dropped_from_the_registry_with_its_session():
+    async def run():
+        service = InMemorySessionService()
+        session = await create_session_with_history(service, "app", "user_1", {"user_name": "User"})
+        key = ("app", "user_1", session.id)
+        assert key in _interaction_histories
+        await service.delete_session(app_name="app", user_id="user_1", session_id=session.id)
+        del session
+        gc.collect()
+        return key
+
+    assert asyncio.run(run()) not in _interaction_histories
@@ -0,0 +1,102 @@
+import asyncio
+import socket
+from email import message_from_bytes
+from types import SimpleNamespace
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from scrabble_agent.tools import outbox
+from scrabble_agent.tools.outbox import FAILED, PENDING, SENT, ReportOutbox
+
+
+class Inbox:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, message_from_bytes(envelope.content)))
+        return "250 Message accepted for delivery"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_port(monkeypatch):
+    port = free_port()
+    monkeypatch.setattr(outbox, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(outbox, "SMTP_PORT", port)
+    return port
+
+
+@pytest.fixture
+def smtp_server(smtp_port):
+    inbox = Inbox()
+    controller = Controller(inbox, hostname="127.0.0.1", port=smtp_port)
+    controller.start()
+    yield inbox
+    controller.stop()
+
+
+def test_reports_reach_every_admin_in_one_email(tmp_path, smtp_server):
+    async def run():
+        reports = ReportOutbox(db_path=tmp_path / "outbox.db", admins=["a@localhost", "b@localhost"])
+        first = await reports.enqueue("u1", "Eyal Cohen", "Wants 02/06/2026 off")
+        second = await reports.enqueue("u2", "Dana Levi", "Wants kitchen duty")
+        await reports.stop()
+        sent = await reports.deliver_due()
+        statuses = [await reports.status(first), await reports.status(second)]
+        reports.close()
+        return first, second, sent, statuses
+
+    first, second, sent, statuses = asyncio.run(run())
+    assert sent == 2
+    assert sorted(rcpt for rcpts, _ in smtp_server.messages for rcpt in rcpts) == ["a@localhost", "b@localhost"]
+    for _, message in smtp_server.messages:
+        body = message.get_payload()
+        assert first in body and second in body
+        assert message["Subject"] == "ScrabbleAI: 2 user reports"
+    assert {delivery["status"] for status in statuses for delivery in status} == {SENT}
+
+
+def test_failed_delivery_is_retried_then_given_up(tmp_path, smtp_port):
+    async def run():
+        reports = ReportOutbox(db_path=tmp_path / "outbox.db", admins=["a@localhost"], retry_delay=0, max_attempts=2)
+        ticket = await reports.enqueue("u1", "Eyal Cohen", "Wants 02/06/2026 off")
+        await reports.stop()
+        await reports.deliver_due()
+        after_first = await reports.status(ticket)
+        await reports.deliver_due()
+        after_second = await reports.status(ticket)
+        reports.close()
+        return after_first, after_second
+
+    after_first, after_second = asyncio.run(run())
+    assert (after_first[0]["status"], after_first[0]["attempts"]) == (PENDING, 1)
+    assert (after_second[0]["status"], after_second[0]["attempts"]) == (FAILED, 2)
+
+
+def test_report_is_only_sent_after_the_user_saw_the_draft(tmp_path, monkeypatch):
+    reports = ReportOutbox(db_path=tmp_path / "outbox.db", admins=["a@localhost"])
+    monkeypatch.setattr(outbox, "report_outbox", reports)
+    state = {"user_id": "u1", "user_name": "Eyal Cohen"}
+
+    async def run():
+        drafting_turn = SimpleNamespace(state=state, invocation_id="turn_1")
+        outbox.draft_report_tool("Wants 02/06/2026 off", drafting_turn)
+        same_turn = await outbox.send_report_tool(drafting_turn)
+        next_turn = await outbox.send_report_tool(SimpleNamespace(state=state, invocation_id="turn_2"))
+        await reports.stop()
+        queued = await reports.status(next_turn["ticket"])
+        reports.close()
+        return same_turn, next_turn, queued
+
+    same_turn, next_turn, queued = asyncio.run(run())
+    assert same_turn["status"] == "error"
+    assert next_turn["status"] == "queued"
+    assert len(queued) == 1
+    assert state[outbox.REPORT_DRAFT_KEY] is None
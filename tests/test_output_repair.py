@@ -0,0 +1,98 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+from scrabble_agent.output_repair import FAILED, REPAIRED, REPROMPTED, StructuredOutput, repair_json
+from scrabble_agent.sub_agents.chatbot_agent.agent import Chatbot__Output_Schema, coerce_chatbot_output
+
+
+def test_repair_json_keeps_the_strings_as_written():
+    text = '{"fullname": "A B", "other": ["meeting, note: 10am", "no work, ]ok",],}'
+    assert repair_json(text) == {"fullname": "A B", "other": ["meeting, note: 10am", "no work, ]ok"]}
+
+
+def test_repair_json_fixes_keys_quotes_literals_and_brackets():
+    text = "Sure! ```json\n{fullname: 'Eyal Cohen', good_days: ['01/06/2026',], sick: True, other: None"
+    assert repair_json(text) == {"fullname": "Eyal Cohen", "good_days": ["01/06/2026"], "sick": True, "other": None}
+
+
+def test_repair_json_cuts_the_text_after_the_object():
+    assert repair_json('{"a": "}"} and more {"b": 1}') == {"a": "}"}
+
+
+def test_repair_json_rejects_text_without_an_object():
+    with pytest.raises(ValueError):
+        repair_json("I need the dates you can't work on.")
+
+
+def test_coerce_chatbot_output_maps_the_model_shapes():
+    data = {
+        "good_days": "01/06/2026",
+        "bad_days": [{"02/06/2026": "sick day"}, "03/06/2026: wedding", {"date": "04/06/2026", "reason": "exam"}],
+        "other": "prefers mornings",
+    }
+    coerced = coerce_chatbot_output(data, {"user_name": "Eyal Cohen"})
+    assert Chatbot__Output_Schema.model_validate(coerced).model_dump() == {
+        "fullname": "Eyal Cohen",
+        "good_days": ["01/06/2026"],
+        "bad_days": [
+            {"date": "02/06/2026", "reason": "sick day"},
+            {"date": "03/06/2026", "reason": "wedding"},
+            {"date": "04/06/2026", "reason": "exam"},
+        ],
+        "other": ["prefers mornings"],
+    }
+
+
+def test_coerce_chatbot_output_leaves_a_missing_reason_to_fail_validation():
+    coerced = coerce_chatbot_output({"fullname": "Eyal Cohen", "bad_days": ["02/06/2026"]}, {})
+    with pytest.raises(ValueError):
+        Chatbot__Output_Schema.model_validate(coerced)
+
+
+class RetryModel:
+    def __init__(self, text):
+        self.text = text
+        self.calls = []
+
+    async def generate_content_async(self, llm_request, stream=False):
+        self.calls.append(stream)
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=self.text)]))
+
+
+def run_after_model(response_parts, retry_text="{}"):
+    output = StructuredOutput(Chatbot__Output_Schema, coerce_chatbot_output, agent_name="chatbot_agent")
+    model = RetryModel(retry_text)
+    output._agent = SimpleNamespace(canonical_model=model)
+    context = SimpleNamespace(invocation_id="invocation", state={"user_name": "Eyal Cohen"})
+    response = LlmResponse(content=types.Content(role="model", parts=response_parts))
+    output.before_model(context, LlmRequest(contents=[]))
+    asyncio.run(output.after_model(context, response))
+    return output, model, response
+
+
+def test_repair_keeps_the_function_calls():
+    call = types.Part(function_call=types.FunctionCall(name="validate_dates_tool", args={"dates": []}))
+    output, model, response = run_after_model([types.Part(text='{"fullname": "Eyal Cohen",}'), call])
+    assert output.counts[REPAIRED] == 1
+    assert model.calls == []
+    assert json.loads(response.content.parts[0].text)["fullname"] == "Eyal Cohen"
+    assert response.content.parts[1].function_call.name == "validate_dates_tool"
+
+
+def test_failed_repair_asks_the_model_once_without_streaming():
+    retry = '{"fullname": "Eyal Cohen", "bad_days": [{"date": "02/06/2026", "reason": "sick"}]}'
+    output, model, response = run_after_model([types.Part(text='{"bad_days": ["02/06/2026"]}')], retry)
+    assert model.calls == [False]
+    assert output.counts[REPROMPTED] == 1
+    assert json.loads(response.content.parts[0].text)["bad_days"] == [{"date": "02/06/2026", "reason": "sick"}]
+
+
+def test_failed_retry_keeps_the_response():
+    output, _, response = run_after_model([types.Part(text='{"bad_days": ["02/06/2026"]}')], "not json")
+    assert output.counts[FAILED] == 1
+    assert response.content.parts[0].text == '{"bad_days": ["02/06/2026"]}'
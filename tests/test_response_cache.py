@@ -0,0 +1,76 @@
+import asyncio
+from types import SimpleNamespace
+from typing import AsyncGenerator
+
+from google.adk.agents import Agent
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from scrabble_agent.response_cache import ResponseCache
+
+
+def content(role, text):
+    return types.Content(role=role, parts=[types.Part(text=text)])
+
+
+QUERY = content("user", "What are my duties next week?")
+
+
+def key(contents, state=None):
+    context = SimpleNamespace(user_content=QUERY, state=state or {"user_name": "Eyal Cohen"})
+    return ResponseCache().key("chatbot_agent", ("user_name",), context, LlmRequest(contents=contents))
+
+
+def test_same_request_has_the_same_key():
+    earlier = [content("user", "Hello there my friend"), content("model", "Hello Eyal Cohen")]
+    assert key([*earlier, QUERY]) == key([*earlier, QUERY])
+
+
+def test_repeated_query_has_the_same_key_later_in_the_conversation():
+    earlier = [content("user", "I can't work on 05/06/2026"), content("model", "Saved.")]
+    assert key([QUERY]) == key([QUERY, content("model", "Next week..."), *earlier, QUERY])
+
+
+def test_key_depends_on_the_state_and_the_tool_results():
+    assert key([QUERY]) != key([QUERY], state={"user_name": "Dana Levi"})
+    assert key([QUERY]) != key([QUERY, content("model", "calling user_duties_tool")])
+
+
+def test_short_queries_are_not_cached():
+    context = SimpleNamespace(user_content=content("user", "ok"), state={})
+    assert ResponseCache().key("chatbot_agent", (), context, LlmRequest(contents=[])) is None
+
+
+class CountingLlm(BaseLlm):
+    calls: int = 0
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        self.calls += 1
+        yield LlmResponse(content=content("model", f"Answer {self.calls}"))
+
+
+def test_repeated_query_is_served_from_the_cache():
+    model = CountingLlm(model="counting")
+    agent = Agent(name="chatbot_agent", model=model, instruction="Answer {user_name} briefly.")
+    cache = ResponseCache()
+    cache.attach(agent)
+
+    async def run():
+        runner = Runner(agent=agent, app_name="app", session_service=InMemorySessionService())
+        session = await runner.session_service.create_session(
+            app_name="app", user_id="u1", state={"user_name": "Eyal Cohen"}
+        )
+        answers = []
+        for _ in range(2):
+            async for event in runner.run_async(user_id="u1", session_id=session.id, new_message=QUERY):
+                if event.is_final_response():
+                    answers.append(event.content.parts[0].text)
+        return answers
+
+    assert asyncio.run(run()) == ["Answer 1", "Answer 1"]
+    assert model.calls == 1
+    assert cache.metrics()["hits"] == 1
@@ -0,0 +1,34 @@
+import asyncio
+
+from scrabble_agent.sub_agents.security_agent.agent import _warning, hold_for_security_check, speculative_checks
+
+
+def run_held_tool(check_result):
+    async def run():
+        released = []
+
+        async def check():
+            await asyncio.sleep(0.01)
+            released.append("check")
+            return check_result
+
+        speculative_checks.set([asyncio.create_task(check())])
+        result = await hold_for_security_check(None, {}, None)
+        return result, released
+
+    return asyncio.run(run())
+
+
+def test_tool_waits_for_a_check_that_clears():
+    result, released = run_held_tool(None)
+    assert result is None
+    assert released == ["check"]
+
+
+def test_tool_is_skipped_when_the_check_finds_a_violation():
+    result, _ = run_held_tool(_warning("Only a system_admin may assign duties."))
+    assert result["status"] == "error"
+
+
+def test_tool_runs_right_away_without_pending_checks():
+    assert asyncio.run(hold_for_security_check(None, {}, None)) is None
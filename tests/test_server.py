@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from sqlite_session_service import SqliteSessionService
+from utils import create_session_with_history
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    service = SqliteSessionService(db_path=tmp_path / "sessions.db")
+    session = asyncio.run(create_session_with_history(service, server.APP_NAME, "u1", {"user_name": "Eyal Cohen"}))
+
+    async def run_turn(user_id, session_id, message, on_event=None):
+        return f"echo {message}"
+
+    monkeypatch.setattr(server, "session_service", service)
+    monkeypatch.setattr(server, "run_turn", run_turn)
+    yield TestClient(server.app), session.id
+    asyncio.run(service.close())
+
+
+def test_invalid_frames_are_rejected_and_the_socket_stays_open(client):
+    client, session_id = client
+    with client.websocket_connect(f"/sessions/{session_id}/ws?user_id=u1") as websocket:
+        for frame in ('{"text": "hello"}', '["hello"]', "hello", '{"message": 5}'):
+            websocket.send_text(frame)
+            assert websocket.receive_json()["error"] == "Invalid message", frame
+        websocket.send_text('{"message": "hello"}')
+        assert websocket.receive_json() == {"done": True, "response": "echo hello"}
@@ -0,0 +1,121 @@
+from datetime import date, timedelta
+
+from scrabble_agent.scheduling import DutySolver, repair_assignments, solve_assignments
+from scrabble_agent.scheduling.dates import format_date
+
+START = date(2026, 6, 1)  # A Monday
+
+
+def day(offset):
+    return format_date(START + timedelta(days=offset))
+
+
+def user(user_id, bad_days=(), good_days=(), preferences=None):
+    return {
+        "user_id": user_id,
+        "constraints": {
+            "fullname": user_id,
+            "good_days": list(good_days),
+            "bad_days": [{"date": text, "reason": "busy"} for text in bad_days],
+            "other": [],
+        },
+        "preferences": preferences or [],
+    }
+
+
+GUARDING = {"duty_title": "Gate guard", "category": "guarding"}
+CLEANING = {"duty_title": "Kitchen cleaning", "category": "cleaning"}
+
+
+def test_solve_fills_every_slot_and_balances_the_load():
+    users = [user("a"), user("b"), user("c")]
+    result = DutySolver(users, [GUARDING], START, horizon_days=6).solve()
+
+    assert result["unfilled"] == []
+    assert result["stats"]["assigned_duties"] == 6
+    assert result["stats"]["max_load"] == result["stats"]["min_load"] == 2
+
+
+def test_solve_never_assigns_a_bad_day():
+    users = [user("a", bad_days=[day(0), day(1)]), user("b")]
+    result = DutySolver(users, [GUARDING], START, horizon_days=3).solve()
+
+    assert day(0) not in result["assignments"].get("a", {})
+    assert day(1) not in result["assignments"].get("a", {})
+    assert result["assignments"]["b"][day(0)] == "Gate guard"
+
+
+def test_solve_reports_slots_nobody_can_take():
+    users = [user("a", bad_days=[day(1)])]
+    result = DutySolver(users, [{**GUARDING, "headcount": 2}], START, horizon_days=2).solve()
+
+    assert result["unfilled"] == [
+        {"date": day(0), "duty_title": "Gate guard", "missing": 1},
+        {"date": day(1), "duty_title": "Gate guard", "missing": 2},
+    ]
+
+
+def test_solve_follows_good_days_and_preferences():
+    users = [
+        user("a", good_days=[day(2)]),
+        user("b", preferences=[{"category": "cleaning", "preference": "avoid"}]),
+        user("c", preferences=[{"category": "cleaning", "preference": "prefer"}]),
+    ]
+    result = DutySolver(users, [GUARDING, CLEANING], START, horizon_days=4).solve()
+
+    assert day(2) in result["assignments"]["a"]
+    assert "Kitchen cleaning" not in result["assignments"]["b"].values()
+    assert "Gate guard" not in result["assignments"]["c"].values()
+
+
+def test_solve_runs_duties_on_their_weekdays_only():
+    result = DutySolver([user("a")], [{**GUARDING, "weekdays": ["Monday"]}], START, horizon_days=7).solve()
+
+    assert result["assignments"] == {"a": {day(0): "Gate guard"}}
+
+
+def test_solve_reports_invalid_dates():
+    result = DutySolver([user("a", bad_days=["31/02/2026"])], [GUARDING], START, horizon_days=1).solve()
+
+    assert result["invalid_dates"] == [{"user_id": "a", "date": "31/02/2026"}]
+
+
+def test_solve_is_deterministic():
+    users = [user(f"user_{index}", bad_days=[day(index % 5)]) for index in range(8)]
+    requirements = [{**GUARDING, "headcount": 2}, CLEANING]
+
+    first = solve_assignments(users, requirements, start_date=START, horizon_days=10)
+    second = solve_assignments(users, requirements, start_date=START, horizon_days=10)
+    assert first["assignments"] == second["assignments"]
+
+
+def test_repair_keeps_frozen_duties_and_reports_their_conflicts():
+    previous = {"a": {day(0): "Gate guard", day(3): "Gate guard"}, "b": {day(1): "Gate guard", day(2): "Gate guard"}}
+    # a can't work on the 1st and the 4th anymore, the 1st is frozen
+    users = [user("a", bad_days=[day(0), day(3)]), user("b")]
+
+    result = repair_assignments(
+        users, [GUARDING], previous, ["a"], start_date=START, horizon_days=4, frozen_until=START
+    )
+
+    assert result["assignments"]["a"] == {day(0): "Gate guard"}
+    assert result["frozen_conflicts"] == [{"user_id": "a", "date": day(0), "duty_title": "Gate guard"}]
+    assert result["assignments"]["b"] == {day(1): "Gate guard", day(2): "Gate guard", day(3): "Gate guard"}
+    assert result["changes"] == [
+        {"user_id": "a", "date": day(3), "before": "Gate guard", "after": None},
+        {"user_id": "b", "date": day(3), "before": None, "after": "Gate guard"},
+    ]
+
+
+def test_repair_keeps_the_duties_of_unaffected_users():
+    previous = {"a": {day(2): "Gate guard"}, "b": {day(3): "Gate guard"}, "c": {day(4): "Gate guard"}}
+    users = [user("a", bad_days=[day(2)]), user("b"), user("c")]
+
+    result = repair_assignments(
+        users, [GUARDING], previous, ["a"], start_date=START, horizon_days=5, frozen_until=START + timedelta(days=1)
+    )
+
+    assert result["assignments"]["b"][day(3)] == "Gate guard"
+    assert result["assignments"]["c"][day(4)] == "Gate guard"
+    assert day(2) not in result["assignments"].get("a", {})
+    assert result["frozen_conflicts"] == []
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from sqlite_session_service import SqliteSessionService
+from utils import add_user_query_to_history, create_session_with_history
+
+
+def test_get_session_returns_the_loaded_history(tmp_path):
+    async def run():
+        service = SqliteSessionService(db_path=tmp_path / "sessions.db")
+        session = await create_session_with_history(service, "app", "user_1", {"user_name": "User"})
+        add_user_query_to_history(service, "app", "user_1", session.id, "hello")
+        service.clear_cache()
+        stored = await service.get_session(app_name="app", user_id="user_1", session_id=session.id)
+        await service.close()
+        return stored.state["interaction_history"]
+
+    history = asyncio.run(run())
+    assert history._loaded
+    assert [entry["query"] for entry in history] == ["hello"]
+
+
+def test_failed_flush_keeps_the_batch(tmp_path, monkeypatch):
+    async def run():
+        service = SqliteSessionService(db_path=tmp_path / "sessions.db", flush_interval=60)
+        session = await create_session_with_history(service, "app", "user_1", {"user_name": "User"})
+        add_user_query_to_history(service, "app", "user_1", session.id, "first")
+
+        write_batch = service._write_batch
+
+        def fail_once(*batch):
+            monkeypatch.setattr(service, "_write_batch", write_batch)
+            raise RuntimeError("disk I/O error")
+
+        monkeypatch.setattr(service, "_write_batch", fail_once)
+        with pytest.raises(RuntimeError):
+            service.flush()
+        add_user_query_to_history(service, "app", "user_1", session.id, "second")
+
+        service.clear_cache()
+        stored = await service.get_session(app_name="app", user_id="user_1", session_id=session.id)
+        await service.close()
+        return [entry["query"] for entry in stored.state["interaction_history"]]
+
+    assert asyncio.run(run()) == ["first", "second"]
+
+
+def test_lease_is_held_until_released_or_expired(tmp_path):
+    async def run():
+        service = SqliteSessionService(db_path=tmp_path / "sessions.db")
+        key = ("app", "user_1", "session_1")
+        results = [
+            await service.acquire_lease(*key, "worker-0", 30),
+            await service.acquire_lease(*key, "worker-1", 30),
+            await service.acquire_lease(*key, "worker-0", 30),
+        ]
+        await service.release_lease(*key, "worker-1")
+        results.append(await service.acquire_lease(*key, "worker-1", 30))
+        await service.release_lease(*key, "worker-0")
+        results.append(await service.acquire_lease(*key, "worker-1", 0))
+        results.append(await service.acquire_lease(*key, "worker-0", 30))
+        await service.close()
+        return results
+
+    assert asyncio.run(run()) == [True, False, True, False, True, True]
+
+
+def test_taking_over_a_lease_reloads_the_history(tmp_path):
+    async def run():
+        first = SqliteSessionService(db_path=tmp_path / "sessions.db")
+        second = SqliteSessionService(db_path=tmp_path / "sessions.db")
+        session = await create_session_with_history(first, "app", "user_1", {"user_name": "User"})
+        key = ("app", "user_1", session.id)
+
+        await second.acquire_lease(*key, "worker-1", 30)
+        await second.get_session(app_name="app", user_id="user_1", session_id=session.id)
+        await second.release_lease(*key, "worker-1")
+
+        await first.acquire_lease(*key, "worker-0", 30)
+        add_user_query_to_history(first, "app", "user_1", session.id, "hello")
+        first.flush()
+        await first.release_lease(*key, "worker-0")
+
+        await second.acquire_lease(*key, "worker-1", 30)
+        stored = await second.get_session(app_name="app", user_id="user_1", session_id=session.id)
+        await first.close()
+        await second.close()
+        return [entry["query"] for entry in stored.state["interaction_history"]]
+
+    assert asyncio.run(run()) == ["hello"]
@@ -0,0 +1,81 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from scrabble_agent.sub_agents.chatbot_agent import agent as chatbot
+from scrabble_agent.tools import user_constraints
+from scrabble_agent.tools.user_constraints import ReadThroughCache
+from scrabble_agent.tools.user_records import UserRecords
+
+CONSTRAINTS = {
+    "fullname": "Eyal Cohen",
+    "good_days": ["01/06/2026"],
+    "bad_days": [{"date": "02/06/2026", "reason": "sick day"}],
+    "other": [],
+}
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ReadThroughCache(UserRecords(tmp_path / "users.db"))
+    monkeypatch.setattr(user_constraints, "user_records_cache", cache)
+    yield cache
+    cache.records.close()
+
+
+def reply(state, output):
+    state["chatbot_output_schema"] = output
+    asyncio.run(chatbot.save_chatbot_output_callback(SimpleNamespace(state=state)))
+
+
+def test_valid_output_is_saved(cache):
+    reply({"user_id": "u1", "user_name": "Eyal Cohen"}, '{"good_days": ["01/06/2026"], "bad_days": ["02/06/2026: sick day"]}')
+    assert asyncio.run(cache.get("constraints", "u1")) == CONSTRAINTS
+
+
+def test_question_leaves_the_saved_constraints(cache):
+    state = {"user_id": "u1", "user_name": "Eyal Cohen"}
+    reply(state, '{"good_days": ["01/06/2026"], "bad_days": [{"date": "02/06/2026", "reason": "sick day"}]}')
+    reply(state, "Eyal Cohen, why can't you work on the 5th?")
+    reply(state, '{"bad_days": [{"date": "05/06/2026"}]}')
+    assert asyncio.run(cache.get("constraints", "u1")) == CONSTRAINTS
+    assert state["saved_chatbot_output"] == CONSTRAINTS
+
+
+def test_cache_reads_what_another_worker_wrote(tmp_path):
+    async def run():
+        worker_a = ReadThroughCache(UserRecords(tmp_path / "users.db"))
+        worker_b = ReadThroughCache(UserRecords(tmp_path / "users.db"))
+        await worker_a.save("u1", user_name="Eyal Cohen", duties={"02/06/2026": "Gate guard"})
+        before = await worker_b.get("duties", "u1")
+        names = await worker_b.names()
+        await worker_a.save("u1", user_name="Eyal Levi", duties={"02/06/2026": "Kitchen cleaning"})
+        after = await worker_b.get("duties", "u1")
+        names = await worker_b.names()
+        worker_a.records.close()
+        worker_b.records.close()
+        return before, after, names.lookup("Eyal Levi"), worker_b.reads
+
+    before, after, user_ids, reads = asyncio.run(run())
+    assert before == {"02/06/2026": "Gate guard"}
+    assert after == {"02/06/2026": "Kitchen cleaning"}
+    assert user_ids == ["u1"]
+    assert reads == 2
+
+
+def test_cache_is_cleared_when_the_log_is_behind(tmp_path, monkeypatch):
+    monkeypatch.setattr("scrabble_agent.tools.user_records.USER_CHANGES_KEPT", 2)
+
+    async def run():
+        worker_a = ReadThroughCache(UserRecords(tmp_path / "users.db"))
+        worker_b = ReadThroughCache(UserRecords(tmp_path / "users.db"))
+        await worker_a.save("u1", duties={"02/06/2026": "Gate guard"})
+        await worker_b.get("duties", "u1")
+        await worker_a.save_all("duties", {f"u{index}": {"03/06/2026": "Gate guard"} for index in range(1, 6)})
+        after = await worker_b.get("duties", "u1")
+        worker_a.records.close()
+        worker_b.records.close()
+        return after
+
+    assert asyncio.run(run()) == {"03/06/2026": "Gate guard"}
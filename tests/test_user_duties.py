@@ -0,0 +1,79 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from scrabble_agent.sub_agents.supreme_agent import agent as supreme
+from scrabble_agent.tools import assignments, user_constraints, user_duties
+from scrabble_agent.tools.user_constraints import ReadThroughCache
+from scrabble_agent.tools.user_records import UserRecords
+
+
+@pytest.fixture
+def directory(tmp_path, monkeypatch):
+    records = UserRecords(tmp_path / "users.db")
+    for user_id, name in (("u1", "Eyal Cohen"), ("u2", "Eyal Cohen"), ("u3", "Dana Levi")):
+        asyncio.run(records.save(user_id, user_role="system_user", user_name=name))
+    # A new process, its name index is read from the Database
+    cache = ReadThroughCache(records)
+    for module in (user_constraints, user_duties, assignments, supreme):
+        monkeypatch.setattr(module, "user_records_cache", cache)
+    asyncio.run(
+        assignments.save_assignments(
+            {"u1": {"02/06/2026": "Gate guard"}, "u2": {"03/06/2026": "Kitchen cleaning"}, "u3": {"01/06/2026": "Gate guard"}}
+        )
+    )
+    yield cache
+    records.close()
+
+
+def fetch(name, **state):
+    return asyncio.run(user_duties.user_duties_tool(name, SimpleNamespace(state=state)))
+
+
+def test_user_sees_only_his_own_duties_when_names_collide(directory):
+    result = fetch("eyal cohen", user_id="u1", user_role="system_user", user_name="Eyal Cohen")
+    assert result["status"] == "success"
+    assert [(user["user_id"], user["duties"]) for user in result["users"]] == [
+        ("u1", [{"date": "02/06/2026", "duty_title": "Gate guard"}])
+    ]
+
+
+def test_user_cannot_view_another_user(directory):
+    result = fetch("Dana Levi", user_id="u1", user_role="system_user", user_name="Dana Levi")
+    assert result["status"] == "error"
+
+
+def test_admin_sees_every_user_with_the_name(directory):
+    result = fetch("Eyal Cohen", user_id="u3", user_role="system_admin")
+    assert [user["user_id"] for user in result["users"]] == ["u1", "u2"]
+
+
+def test_admin_gets_similar_names_for_an_unknown_name(directory):
+    result = fetch("Dana Levy", user_id="u3", user_role="system_admin")
+    assert result["status"] == "not_found"
+    assert result["similar_names"][0]["user_id"] == "u3"
+
+
+def test_admin_change_is_stored(directory):
+    context = SimpleNamespace(state={"user_id": "u3", "user_role": "system_admin"})
+    result = asyncio.run(supreme.change_assignment_tool("u1", "2/6/2026", "Kitchen cleaning", context))
+    assert result["status"] == "success"
+    duties = fetch("Dana Levi", user_id="u3", user_role="system_admin")
+    assert fetch("Eyal Cohen", user_id="u1", user_role="system_user")["users"][0]["duties"] == [
+        {"date": "02/06/2026", "duty_title": "Kitchen cleaning"}
+    ]
+    assert duties["users"][0]["duties"] == [{"date": "01/06/2026", "duty_title": "Gate guard"}]
+
+
+def test_user_cannot_change_assignments(directory):
+    context = SimpleNamespace(state={"user_id": "u1", "user_role": "system_user"})
+    assert asyncio.run(supreme.change_assignment_tool("u1", "02/06/2026", "", context))["status"] == "error"
+
+
+def test_name_index_follows_the_writes(directory):
+    assert fetch("Dana Levi", user_id="u3", user_role="system_admin")["status"] == "success"
+    asyncio.run(directory.save("u3", user_name="Dana Cohen"))
+    asyncio.run(directory.save("u4", user_name="Dana Levi"))
+    assert [user["user_id"] for user in fetch("Dana Levi", user_id="u3", user_role="system_admin")["users"]] == ["u4"]
+    assert fetch("Dana Cohen", user_id="u3", user_role="system_user")["status"] == "success"
@@ -1,6 +1,200 @@
+import asyncio
+import os
+import time
+import weakref
 from datetime import datetime
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.events import Event
 from google.genai import types
 
+from scrabble_agent.sub_agents.security_agent.agent import speculative_checks
+from scrabble_agent.telemetry import TURN_FIRST_TOKEN, TURN_LATENCY, HopRecorder, tracer
+
+# Token budget of the {interaction_history} prompt slot, and how many of the
+# latest turns are always kept verbatim within it
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))
+HISTORY_VERBATIM_TURNS = int(os.getenv("HISTORY_VERBATIM_TURNS", "10"))
+# "sse" streams the agents' response text as it is generated, "none" waits for whole responses
+STREAMING_MODE = os.getenv("STREAMING_MODE", "sse")
+# Share of the budget reserved for the summary of older turns
+HISTORY_SUMMARY_SHARE = 0.25
+# Characters kept from every older turn in the summary
+SUMMARY_LINE_CHARS = 80
+
+_encoding = None
+
+
+def count_tokens(text):
+    """Count the tokens in a text with tiktoken, or estimate them if it is unavailable."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            # No tiktoken or no cached encoding, roughly 4 characters per token
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4)
+
+
+class InteractionHistory:
+    """Append-only interaction history, shared by reference with the session state.
+
+    The same instance is stored in state['interaction_history'] and in a
+    registry keyed by session, so appending an entry is O(1) and never copies
+    or recreates the session. Sessions are deep-copied on every get_session,
+    so the history copies itself by reference; entries must not be mutated
+    once appended. The registry only holds weak references, the session
+    state keeps the history alive until the session is deleted.
+    """
+
+    def __init__(self, entries=None, token_budget=None, verbatim_turns=None):
+        self._entries = []
+        self._tokens = []
+        self.token_budget = token_budget or HISTORY_TOKEN_BUDGET
+        self.verbatim_turns = verbatim_turns or HISTORY_VERBATIM_TURNS
+
+        # Rolling summary of the entries before self._summarized
+        self._summarized = 0
+        self._summary_lines = []
+        self._summary_tokens = 0
+        self._dropped_turns = {}
+        self._rendered = None
+
+        for entry in entries or []:
+            self.append(entry)
+
+    def append(self, entry):
+        """Append an entry to the history."""
+        self._entries.append(entry)
+        self._tokens.append(count_tokens(str(entry)))
+        self._rendered = None
+
+    def read(self, cursor=0, limit=None):
+        """Read entries starting at a cursor.
+
+        Args:
+            cursor: The index of the first entry to read
+            limit: The maximum number of entries to read, all if None
+
+        Returns:
+            A tuple of the entries read and the cursor to continue from
+        """
+        end = len(self._entries) if limit is None else min(cursor + limit, len(self._entries))
+        return self._entries[cursor:end], end
+
+    def copy(self):
+        """Return the entries as a plain list."""
+        return list(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __getitem__(self, index):
+        return self._entries[index]
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def _fold(self, entry):
+        """Fold an entry that left the verbatim window into the summary."""
+        text = entry.get("query") or entry.get("response") or ""
+        if len(text) > SUMMARY_LINE_CHARS:
+            text = text[:SUMMARY_LINE_CHARS] + "..."
+        author = entry.get("agent", "user" if entry.get("action") == "user_query" else entry.get("action"))
+        line = f"{entry.get('timestamp', '')} {author}: {text}"
+        self._summary_lines.append((line, count_tokens(line), author))
+        self._summary_tokens += self._summary_lines[-1][1]
+
+        # Keep the summary within its share of the budget, oldest lines go first
+        summary_budget = int(self.token_budget * HISTORY_SUMMARY_SHARE)
+        dropped = 0
+        while self._summary_tokens > summary_budget and dropped < len(self._summary_lines) - 1:
+            _, tokens, author = self._summary_lines[dropped]
+            self._summary_tokens -= tokens
+            self._dropped_turns[author] = self._dropped_turns.get(author, 0) + 1
+            dropped += 1
+        del self._summary_lines[:dropped]
+
+    def window(self):
+        """Return the start of the verbatim window, folding older entries into the summary.
+
+        The window holds at most verbatim_turns entries and fits in the budget
+        left after the summary. Entries are only folded once, so the summary is
+        updated incrementally as the history grows.
+        """
+        verbatim_budget = self.token_budget - int(self.token_budget * HISTORY_SUMMARY_SHARE)
+        start = max(self._summarized, len(self._entries) - self.verbatim_turns)
+        tokens = sum(self._tokens[start:])
+        while tokens > verbatim_budget and start < len(self._entries) - 1:
+            tokens -= self._tokens[start]
+            start += 1
+
+        for entry in self._entries[self._summarized : start]:
+            self._fold(entry)
+        self._summarized = start
+        return start
+
+    def __str__(self):
+        """Render the history for the {interaction_history} prompt slot."""
+        if self._rendered is None:
+            start = self.window()
+            recent = str(self._entries[start:])
+            if not self._summary_lines:
+                self._rendered = recent
+            else:
+                summary = [f"Summary of {start} earlier interactions:"]
+                if self._dropped_turns:
+                    counts = ", ".join(f"{count} by {author}" for author, count in self._dropped_turns.items())
+                    summary.append(f"Oldest interactions omitted: {counts}")
+                summary.extend(line for line, _, _ in self._summary_lines)
+                self._rendered = "\n".join(summary) + f"\nRecent interactions:\n{recent}"
+        return self._rendered
+
+    __repr__ = __str__
+
+
+# Interaction histories by (app_name, user_id, session_id), an entry is
+# dropped once its session is deleted and nothing else references the history
+_interaction_histories = weakref.WeakValueDictionary()
+
+
+async def create_session_with_history(session_service, app_name, user_id, state, session_id=None):
+    """Create a session whose interaction history supports O(1) appends.
+
+    Any list already in state['interaction_history'] becomes the first
+    entries of the history. Session services that store the history
+    themselves provide get_interaction_history, and keep it for us.
+
+    Returns:
+        The created session
+    """
+    history = InteractionHistory(state.get("interaction_history"))
+    session = await session_service.create_session(
+        app_name=app_name,
+        user_id=user_id,
+        session_id=session_id,
+        state={**state, "interaction_history": history},
+    )
+    if not hasattr(session_service, "get_interaction_history"):
+        _interaction_histories[(app_name, user_id, session.id)] = history
+    return session
+
+
+def get_interaction_history(app_name, user_id, session_id, session_service=None):
+    """Get the interaction history of a session created with create_session_with_history."""
+    history = _interaction_histories.get((app_name, user_id, session_id))
+    if history is None and hasattr(session_service, "get_interaction_history"):
+        history = session_service.get_interaction_history(app_name, user_id, session_id)
+    return history
+
+
 def update_interaction_history(session_service, app_name, user_id, session_id, entry):
     """Add an entry to the interaction history in state.
 
@@ -14,13 +208,10 @@ def update_interaction_history(session_service, app_name, user_id, session_id, e
             - other keys are flexible depending on the action type
     """
     try:
-        # Get current session
-        session = session_service.get_session(
-            app_name=app_name, user_id=user_id, session_id=session_id
-        )
-
-        # Get current interaction history
-        interaction_history = session.state.get("interaction_history", [])
+        # Get the interaction history shared with the session state
+        interaction_history = get_interaction_history(app_name, user_id, session_id, session_service)
+        if interaction_history is None:
+            raise KeyError(f"session {session_id} was not created with create_session_with_history")
 
         # Add timestamp if not already present
         if "timestamp" not in entry:
@@ -28,18 +219,6 @@ def update_interaction_history(session_service, app_name, user_id, session_id, e
 
         # Add the entry to interaction history
         interaction_history.append(entry)
-
-        # Create updated state
-        updated_state = session.state.copy()
-        updated_state["interaction_history"] = interaction_history
-
-        # Create a new session with updated state
-        session_service.create_session(
-            app_name=app_name,
-            user_id=user_id,
-            session_id=session_id,
-            state=updated_state,
-        )
     except Exception as e:
         print(f"Error updating interaction history: {e}")
 
@@ -75,13 +254,30 @@ def add_agent_response_to_history(
     )
 
 
-async def process_agent_response(event):
-    """Process and display agent response events."""
-    print(f"Event ID: {event.id}, Author: {event.author}")
+def event_text(event):
+    """The text of an event's parts."""
+    if not event.content or not event.content.parts:
+        return ""
+    return "".join(part.text for part in event.content.parts if part.text)
+
+
+async def process_agent_response(event, display=True):
+    """Process and display agent response events.
+
+    The text of a partial (streamed) event is printed as it arrives, a partial
+    event has no final response.
+    """
+    if event.partial:
+        if display:
+            print(event_text(event), end="", flush=True)
+        return None
+
+    if display:
+        print(f"Event ID: {event.id}, Author: {event.author}")
 
     # Check for specific parts first
     has_specific_part = False
-    if event.content and event.content.parts:
+    if display and event.content and event.content.parts:
         for part in event.content.parts:
             if hasattr(part, "text") and part.text and not part.text.isspace():
                 print(f"  Text: '{part.text.strip()}'")
@@ -100,23 +296,112 @@ async def process_agent_response(event):
     return final_response
 
 
-async def call_agent_async(runner, user_id, session_id, query):
-    """Call the agent asynchronously with the user's query."""
+async def call_agent_async(runner, user_id, session_id, query, on_event=None, display=True, stream=None):
+    """Call the agent asynchronously with the user's query.
+
+    When streaming, the agents' response text is forwarded in partial events
+    as it is generated, followed by the event of the whole response.
+
+    When the security check of the query runs concurrently with the agents
+    (SECURITY_MODE=speculative), their events are held until it clears, and
+    the agents are cancelled if the query violates a rule. Tools that write or
+    send anything wait for the check too, see hold_for_security_check.
+
+    Args:
+        runner: The runner of the root agent
+        user_id: The user ID
+        session_id: The session ID
+        query: The user's query
+        on_event: Optional async callback, awaited with every event and its
+            final response text (None for intermediate and partial events)
+        display: Whether to print the events
+        stream: Whether to stream partial responses, defaults to STREAMING_MODE
+    """
     content = types.Content(role="user", parts=[types.Part(text=query)]) # allows Role-based message handling
     final_response_text = None
     agent_name = None
-    
-    try:
-        async for event in runner.run_async(user_id=user_id, session_id=session_id, new_message=content):
-            # Capture the agent name from the event if available
-            if event.author:
-                agent_name = event.author
-
-            response = await process_agent_response(event)
-            if response:
-                final_response_text = response
-    except Exception as e:
-        print(f"ERROR during agent run: {e}")
+    events = asyncio.Queue()
+    checks = []
+    violated = False
+    started = time.perf_counter()
+    answered = False
+    streaming = False
+    if stream is None:
+        stream = STREAMING_MODE == "sse"
+    run_config = RunConfig(streaming_mode=StreamingMode.SSE if stream else StreamingMode.NONE)
+
+    async def run_agent():
+        # Security checks started by the agents' callbacks are collected in checks
+        speculative_checks.set(checks)
+        # Hops are timed as the events are produced, holding them for the security check is not counted
+        hops = HopRecorder()
+        try:
+            async for event in runner.run_async(
+                user_id=user_id, session_id=session_id, new_message=content, run_config=run_config
+            ):
+                hops.record(event)
+                events.put_nowait(event)
+        finally:
+            hops.finish()
+            events.put_nowait(None)
+
+    async def emit(event):
+        nonlocal final_response_text, agent_name, answered, streaming
+        # Capture the agent name from the event if available
+        if event.author:
+            agent_name = event.author
+
+        if not answered and event_text(event):
+            # The perceived latency, what the user waits before reading anything
+            TURN_FIRST_TOKEN.observe(time.perf_counter() - started)
+            answered = True
+
+        if event.partial:
+            if display and not streaming:
+                print(f"  {event.author}: ", end="")
+            streaming = True
+            response = await process_agent_response(event, display)
+        elif streaming:
+            # The whole response was already printed as it streamed
+            if display:
+                print()
+            streaming = False
+            response = await process_agent_response(event, display=False)
+        else:
+            response = await process_agent_response(event, display)
+        if response:
+            final_response_text = response
+        if on_event:
+            await on_event(event, response)
+
+    with tracer.start_as_current_span("turn", attributes={"scrabble.user_id": user_id, "scrabble.session_id": session_id}) as span:
+        # The runner's spans and the hop spans are children of the turn
+        agent_task = asyncio.create_task(run_agent())
+        try:
+            while (event := await events.get()) is not None:
+                if not checks:
+                    await emit(event)
+                    continue
+
+                # Hold the response until the security check clears
+                warnings = [warning for warning in [await check for check in checks] if warning is not None]
+                if warnings:
+                    violated = True
+                    agent_task.cancel()
+                    await emit(Event(author="security_agent", invocation_id=event.invocation_id, content=warnings[0]))
+                    break
+                await emit(event)
+            if not violated:
+                await agent_task
+        except Exception as e:
+            span.record_exception(e)
+            print(f"ERROR during agent run: {e}")
+        finally:
+            agent_task.cancel()
+            for check in checks:
+                check.cancel()
+            span.set_attribute("scrabble.violated", violated)
+            TURN_LATENCY.observe(time.perf_counter() - started)
 
     # Add the agent response to interaction history if we got a final response
     if final_response_text and agent_name: